@@ -0,0 +1,44 @@
+# Public API, name -> (submodule, attribute). Submodules are imported on first
+# access so that importing the package stays cheap.
+_lazy_attributes = {
+    "tokenize": ("cache", "tokenize"),
+    "parse": ("cache", "parse"),
+    "compile": ("compiler", "compile_filter"),
+    "compile_columnar": ("columnar", "compile_columnar"),
+    "evaluate_columns": ("columnar", "evaluate_columns"),
+    "to_sql": ("sql", "to_sql"),
+    "SqlTranslator": ("sql", "SqlTranslator"),
+    "optimize": ("optimizer", "optimize"),
+    "normalize": ("normalize", "normalize"),
+    "canonical_hash": ("normalize", "canonical_hash"),
+    "IndexedStore": ("index", "IndexedStore"),
+    "tokenize_many": ("batch", "tokenize_many"),
+    "parse_many": ("batch", "parse_many"),
+    "aparse": ("aio", "aparse"),
+    "Limits": ("limits", "Limits"),
+    "dumps": ("serialize", "dumps"),
+    "loads": ("serialize", "loads"),
+    "compile_json": ("jsonbytes", "compile_json"),
+    "filter_stream": ("stream", "filter_stream"),
+    "compile_with_schema": ("schema", "compile_with_schema"),
+    "SubscriptionMatcher": ("subscriptions", "SubscriptionMatcher"),
+    "compile_path": ("patch", "compile_path"),
+    "apply_patch": ("patch", "apply_patch"),
+    "ResultCache": ("result_cache", "ResultCache"),
+    "validate": ("validate", "validate"),
+}
+
+__all__ = list(_lazy_attributes)
+
+def __getattr__(name :str):
+    try:
+        module_name, attribute = _lazy_attributes[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    from importlib import import_module
+    value = getattr(import_module(f".{module_name}", __name__), attribute)
+    globals()[name] = value
+    return value
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,137 @@
+import asyncio
+import atexit
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, TYPE_CHECKING
+from . import cache
+from .lexer import Lexer
+from .parser import Parser, Node
+if TYPE_CHECKING:
+    from .limits import Limits
+
+@dataclass(frozen=True)
+class AsyncParserMetrics():
+    inline: int             # parsed on the event loop
+    offloaded: int          # parsed on the executor
+    coalesced: int          # served by an identical parse already in flight
+    rejected: int           # refused because the queue was full
+    running: int            # parses currently on the executor
+    queued: int             # parses waiting for an executor slot
+    max_queued: int         # highest queued seen
+
+def _parse(filter_str :str, limits :Optional["Limits"]) -> Node:
+    # Runs in the executor, possibly in another process
+    tokens = Lexer(filter_str, Lexer.Engine.Regex)
+    if limits is not None:
+        from .limits import limit_tokens
+        tokens = limit_tokens(filter_str, tokens, limits)
+    return Parser(tokens).parse()
+
+class AsyncParser():
+    """Parse filters from asyncio code without blocking the event loop.
+
+    Filters shorter than threshold are parsed inline through the parse cache,
+    longer ones on the executor (a process pool by default, created on first
+    use). Concurrent calls for the same filter share one parse. At most
+    max_running parses run on the executor at a time, the rest wait in a queue
+    of at most max_queued, beyond which parse() raises asyncio.QueueFull.
+    The Limits set with cache.configure() apply on the executor as inline.
+
+    An AsyncParser may be used from successive event loops, e.g. several
+    asyncio.run() calls; the executor slots and in flight parses belong to the
+    loop that is running.
+    """
+
+    def __init__(
+        self, threshold :int = 4096, executor :Optional[Executor] = None,
+        max_running :int = 4, max_queued :Optional[int] = None
+    ):
+        self.threshold = threshold
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._loop :Optional[asyncio.AbstractEventLoop] = None
+        self._slots :Optional[asyncio.Semaphore] = None
+        self._in_flight :dict[str, asyncio.Future] = {}
+        self._inline = 0
+        self._offloaded = 0
+        self._coalesced = 0
+        self._rejected = 0
+        self._running = 0
+        self._queued = 0
+        self._max_queued = 0
+
+    async def parse(self, filter_str :str) -> Node:
+        if len(filter_str) < self.threshold:
+            self._inline += 1
+            return cache.parse(filter_str)
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Semaphores and futures are bound to the loop they were used on
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_running)
+            self._in_flight = {}
+            self._running = self._queued = 0
+        future = self._in_flight.get(filter_str)
+        if future is not None:
+            self._coalesced += 1
+        else:
+            if self.max_queued is not None and self._queued + self._running >= self.max_running + self.max_queued:
+                self._rejected += 1
+                raise asyncio.QueueFull()
+            self._queued += 1
+            self._max_queued = max(self._max_queued, self._queued)
+            future = asyncio.ensure_future(self._offload(filter_str))
+            in_flight = self._in_flight
+            in_flight[filter_str] = future
+            future.add_done_callback(lambda _: in_flight.pop(filter_str, None))
+        # One caller giving up must not cancel the parse for the others
+        return await asyncio.shield(future)
+
+    async def _offload(self, filter_str :str) -> Node:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.max_running)
+        slots = self._slots
+        try:
+            await slots.acquire()
+        finally:
+            self._queued -= 1
+        self._running += 1
+        try:
+            self._offloaded += 1
+            limits = cache._default_cache.limits
+            return await asyncio.get_running_loop().run_in_executor(self._executor, _parse, filter_str, limits)
+        finally:
+            self._running -= 1
+            slots.release()
+
+    def metrics(self) -> AsyncParserMetrics:
+        return AsyncParserMetrics(
+            self._inline, self._offloaded, self._coalesced, self._rejected,
+            self._running, self._queued, self._max_queued
+        )
+
+    def close(self):
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def __aenter__(self) -> "AsyncParser":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+_default_parser :Optional[AsyncParser] = None
+
+async def aparse(filter_str :str) -> Node:
+    """Parse a filter with a shared AsyncParser using the default settings.
+
+    Its process pool is shut down when the interpreter exits.
+    """
+    global _default_parser
+    if _default_parser is None:
+        _default_parser = AsyncParser()
+        atexit.register(_default_parser.close)
+    return await _default_parser.parse(filter_str)
@@ -0,0 +1,154 @@
+import os
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Optional, Union, TYPE_CHECKING
+from . import cache
+from .lexer import Lexer
+from .parser import Parser, Node
+from .compact import CompactTokens, tokenize_compact
+from .err_strings import error_position
+if TYPE_CHECKING:
+    from .limits import Limits
+
+@dataclass(frozen=True)
+class FilterError():
+    # A filter of a batch that failed to lex or parse
+    message: str
+    position: Optional[int]
+
+def _error(e :ValueError) -> FilterError:
+    message = str(e)
+    return FilterError(message, error_position(message))
+
+def _tokenize_batch(filters :list[str]) -> list:
+    # Runs in the worker: only the offset arrays travel back, the caller
+    # already has the filter strings
+    results = []
+    for filter_str in filters:
+        try:
+            tokens = tokenize_compact(filter_str)
+        except ValueError as e:
+            results.append(_error(e))
+        else:
+            results.append((tokens.kinds.tobytes(), tokens.starts, tokens.ends))
+    return results
+
+def _parse_batch(filters :list[str], limits :Optional["Limits"] = None) -> list:
+    if limits is not None:
+        from .limits import limit_tokens
+    results = []
+    for filter_str in filters:
+        try:
+            tokens = Lexer(filter_str, Lexer.Engine.Regex)
+            if limits is not None:
+                tokens = limit_tokens(filter_str, tokens, limits)
+            results.append(Parser(tokens).parse())
+        except ValueError as e:
+            results.append(_error(e))
+    return results
+
+def _compact_tokens(filter_str :str, result) -> Union[CompactTokens, FilterError]:
+    if type(result) is FilterError:
+        return result
+    kinds, starts, ends = result
+    return CompactTokens(filter_str, array("B", kinds), starts, ends)
+
+def _run_many(
+    filters :Iterable[str], work :Callable[[list[str]], list], build :Callable,
+    workers :Optional[int], chunksize :int, cache_size :int, executor :Optional[Executor]
+) -> Iterator:
+    if chunksize < 1:
+        raise ValueError("chunksize must be at least 1")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    filters = iter(filters)
+    # Results of recently seen filters, so repeated inputs are not dispatched again
+    recent :OrderedDict = OrderedDict()
+
+    def next_chunk():
+        chunk = list(islice(filters, chunksize))
+        if not chunk:
+            return None
+        # Results already known are captured now, they may be evicted before
+        # the chunk's own results arrive
+        known, unique = {}, []
+        for filter_str in dict.fromkeys(chunk):
+            if filter_str in recent:
+                known[filter_str] = recent[filter_str]
+            else:
+                unique.append(filter_str)
+        return chunk, known, unique
+
+    def finish(chunk :list[str], known :dict, unique :list[str], results :list) -> Iterator:
+        known.update(zip(unique, results))
+        for filter_str in chunk:
+            yield build(filter_str, known[filter_str])
+        for filter_str, result in known.items():
+            recent[filter_str] = result
+            recent.move_to_end(filter_str)
+        while len(recent) > cache_size:
+            recent.popitem(last=False)
+
+    if executor is None and workers <= 1:
+        while (batch := next_chunk()) is not None:
+            chunk, known, unique = batch
+            yield from finish(chunk, known, unique, work(unique))
+        return
+
+    owned = executor is None
+    if owned:
+        executor = ProcessPoolExecutor(workers)
+    try:
+        # Keep a couple of chunks per worker in flight so memory stays bounded
+        pending :deque = deque()
+
+        def submit() -> bool:
+            batch = next_chunk()
+            if batch is None:
+                return False
+            chunk, known, unique = batch
+            pending.append((chunk, known, unique, executor.submit(work, unique) if unique else None))
+            return True
+
+        for _ in range(2 * max(1, workers)):
+            if not submit():
+                break
+        while pending:
+            chunk, known, unique, future = pending.popleft()
+            results = [] if future is None else future.result()
+            submit()
+            yield from finish(chunk, known, unique, results)
+    finally:
+        if owned:
+            executor.shutdown(cancel_futures=True)
+
+def tokenize_many(
+    filters :Iterable[str], workers :Optional[int] = None, chunksize :int = 256,
+    cache_size :int = 4096, executor :Optional[Executor] = None
+) -> Iterator[Union[CompactTokens, FilterError]]:
+    """Lex many filters across a process pool.
+
+    Results are yielded lazily in input order: a CompactTokens per filter or a
+    FilterError carrying the message and position. Identical filters are only
+    lexed once while they are among the last cache_size distinct inputs.
+    workers=1 lexes in this process.
+    """
+    return _run_many(filters, _tokenize_batch, _compact_tokens, workers, chunksize, cache_size, executor)
+
+def parse_many(
+    filters :Iterable[str], workers :Optional[int] = None, chunksize :int = 256,
+    cache_size :int = 4096, executor :Optional[Executor] = None
+) -> Iterator[Union[Node, FilterError]]:
+    """Parse many filters across a process pool, see tokenize_many.
+
+    The Limits set with cache.configure() apply in the workers.
+    """
+    work = _parse_batch
+    limits = cache._default_cache.limits
+    if limits is not None:
+        work = partial(_parse_batch, limits=limits)
+    return _run_many(filters, work, lambda _, result: result, workers, chunksize, cache_size, executor)
@@ -0,0 +1,245 @@
+"""Throughput benchmark for the lexer and parser.
+
+    python -m scim_filter_parser.benchmark --output results.json
+    python -m scim_filter_parser.benchmark --baseline baseline.json
+    python -m scim_filter_parser.benchmark --loop-latency
+
+Every workload is run through each stage, reporting tokens/sec for stages
+that build tokens, filters/sec, p50/p99 latency per filter and peak traced
+memory. With --baseline the run is compared against an earlier --output file
+and the exit status is 1 when the throughput or median latency of any stage
+got worse than the threshold.
+--loop-latency also reports how late an asyncio event loop wakes up while a
+burst of large filters is parsed inline and through aio.AsyncParser.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Optional
+from .lexer import Lexer
+from .parser import Parser
+from .aio import AsyncParser
+from .validate import validate
+
+_default_queries = os.path.join("reference", "example_querys.txt")
+
+def deep_nesting(depth :int = 40) -> list[str]:
+    return [
+        "filter=" + "(" * d + 'userName eq "bjensen"' + ")" * d
+        for d in range(1, depth + 1, max(1, depth // 10))
+    ]
+
+def long_or_chain(terms :int = 500) -> list[str]:
+    return ["filter=" + " or ".join(f'id eq "2819c223-7f76-453a-919d-{i:012d}"' for i in range(terms))]
+
+def long_string_literals(length :int = 10000) -> list[str]:
+    return [f'filter=description co "{"x" * length}"', f'filter=title eq "{"y" * length}" and active eq true']
+
+def urn_attribute_paths(terms :int = 50) -> list[str]:
+    paths = [
+        "urn:ietf:params:scim:schemas:core:2.0:User:userName",
+        "urn:ietf:params:scim:schemas:core:2.0:User:name.familyName",
+        "urn:ietf:params:scim:schemas:extension:enterprise:2.0:User:employeeNumber",
+        "urn:ietf:params:scim:schemas:extension:enterprise:2.0:User:manager.value",
+    ]
+    return ["filter=" + " and ".join(f'{paths[i % len(paths)]} sw "{i}"' for i in range(terms))]
+
+def value_paths(terms :int = 100) -> list[str]:
+    return ["filter=" + " or ".join(
+        f'emails[type eq "work" and value co "@example{i}.com"] and ims[type eq "xmpp" and value pr]'
+        for i in range(terms)
+    )]
+
+def reference_queries(path :Optional[str] = _default_queries) -> list[str]:
+    if path is None or not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [line for line in f.read().splitlines() if line]
+
+def stages() -> dict[str, Callable[[str], Optional[int]]]:
+    # Each stage returns the number of tokens it processed, None if it builds none
+    def lex_character(filter_str :str) -> int:
+        return sum(1 for _ in Lexer(filter_str, Lexer.Engine.Character))
+
+    def lex_regex(filter_str :str) -> int:
+        return sum(1 for _ in Lexer(filter_str, Lexer.Engine.Regex))
+
+    def parse(filter_str :str) -> int:
+        tokens = tuple(Lexer(filter_str, Lexer.Engine.Regex))
+        Parser(tokens).parse()
+        return len(tokens)
+
+    def validate_only(filter_str :str) -> None:
+        # No tokens are built, only filters/sec is reported
+        validate(filter_str)
+
+    return {"lex_character": lex_character, "lex_regex": lex_regex, "parse": parse, "validate": validate_only}
+
+def _percentile(sorted_values :list[float], percentile :float) -> float:
+    index = min(len(sorted_values) - 1, int(round(percentile / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def measure(stage :Callable[[str], Optional[int]], filters :list[str], min_time :float = 0.2) -> dict:
+    latencies = []
+    tokens = 0
+    counted = False
+    started = time.perf_counter()
+    while True:
+        for filter_str in filters:
+            t0 = time.perf_counter()
+            count = stage(filter_str)
+            latencies.append(time.perf_counter() - t0)
+            if count is not None:
+                tokens += count
+                counted = True
+        if time.perf_counter() - started >= min_time:
+            break
+    total = sum(latencies)
+    tracemalloc.start()
+    for filter_str in filters:
+        stage(filter_str)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    latencies.sort()
+    return {
+        "filters": len(latencies),
+        "tokens_per_sec": tokens / total if counted else None,
+        "filters_per_sec": len(latencies) / total,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "peak_memory_bytes": peak,
+    }
+
+async def _loop_lag(parse :Callable, filters :list[str], interval :float) -> list[float]:
+    # Wake up every interval while filters are parsed concurrently and record
+    # how late each wake up was
+    lags = []
+    done = False
+
+    async def ticker():
+        loop = asyncio.get_running_loop()
+        while not done:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            lags.append(max(0.0, loop.time() - expected))
+
+    tick = asyncio.ensure_future(ticker())
+    await asyncio.sleep(interval)
+    await asyncio.gather(*(parse(filter_str) for filter_str in filters))
+    done = True
+    await tick
+    return sorted(lags)
+
+def loop_latency(filters :list[str], threshold :int = 4096, interval :float = 0.001) -> dict:
+    """p50/p99 event loop lag in ms while filters are parsed inline and with AsyncParser."""
+    async def inline(filter_str :str):
+        return Parser(Lexer(filter_str, Lexer.Engine.Regex)).parse()
+
+    async def offloaded() -> list[float]:
+        async with AsyncParser(threshold) as parser:
+            # Start the workers before measuring
+            await parser.parse("filter=" + " or ".join(["a pr"] * threshold))
+            return await _loop_lag(parser.parse, filters, interval)
+
+    results = {}
+    for name, lags in (
+        ("inline", asyncio.run(_loop_lag(inline, filters, interval))),
+        ("async", asyncio.run(offloaded())),
+    ):
+        results[name] = {
+            "p50_ms": _percentile(lags, 50) * 1000 if lags else 0.0,
+            "p99_ms": _percentile(lags, 99) * 1000 if lags else 0.0,
+        }
+    return results
+
+def workloads(queries_path :Optional[str] = _default_queries, scale :float = 1.0) -> dict[str, list[str]]:
+    def scaled(n :int) -> int:
+        return max(1, int(n * scale))
+
+    result = {
+        "deep_nesting": deep_nesting(scaled(40)),
+        "long_or_chain": long_or_chain(scaled(500)),
+        "long_string_literals": long_string_literals(scaled(10000)),
+        "urn_attribute_paths": urn_attribute_paths(scaled(50)),
+        "value_paths": value_paths(scaled(100)),
+    }
+    queries = reference_queries(queries_path)
+    if queries:
+        result["reference_queries"] = queries
+    return result
+
+def run(queries_path :Optional[str] = _default_queries, scale :float = 1.0, min_time :float = 0.2) -> dict:
+    results = {}
+    for workload, filters in workloads(queries_path, scale).items():
+        for stage_name, stage in stages().items():
+            results[f"{workload}/{stage_name}"] = measure(stage, filters, min_time)
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "results": results,
+    }
+
+def compare(current :dict, baseline :dict, threshold :float = 0.1) -> list[str]:
+    """Return a description of every benchmark that regressed beyond threshold."""
+    regressions = []
+    for name, base in baseline["results"].items():
+        result = current["results"].get(name)
+        if result is None:
+            continue
+        if result["filters_per_sec"] < base["filters_per_sec"] * (1 - threshold):
+            regressions.append(
+                f"{name}: filters/sec {base['filters_per_sec']:.1f} -> {result['filters_per_sec']:.1f}"
+            )
+        # p99 of short runs is dominated by outliers, gate on the median
+        if result["p50_ms"] > base["p50_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p50 {base['p50_ms']:.3f}ms -> {result['p50_ms']:.3f}ms")
+    return regressions
+
+def _format(report :dict) -> str:
+    lines = [f"{'benchmark':<40} {'tokens/s':>12} {'filters/s':>12} {'p50 ms':>9} {'p99 ms':>9} {'peak KiB':>9}"]
+    for name, r in report["results"].items():
+        tokens_per_sec = "-" if r["tokens_per_sec"] is None else f"{r['tokens_per_sec']:.0f}"
+        lines.append(
+            f"{name:<40} {tokens_per_sec:>12} {r['filters_per_sec']:>12.1f}"
+            f" {r['p50_ms']:>9.3f} {r['p99_ms']:>9.3f} {r['peak_memory_bytes'] / 1024:>9.1f}"
+        )
+    return "\n".join(lines)
+
+def main(argv :Optional[list[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(prog="python -m scim_filter_parser.benchmark", description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--queries", default=_default_queries, help="file with one filter per line")
+    arg_parser.add_argument("--scale", type=float, default=1.0, help="size multiplier for synthetic workloads")
+    arg_parser.add_argument("--min-time", type=float, default=0.2, help="seconds to run each benchmark")
+    arg_parser.add_argument("--output", help="write results as JSON to this file")
+    arg_parser.add_argument("--baseline", help="JSON results to compare against")
+    arg_parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown, 0.1 is 10%%")
+    arg_parser.add_argument("--loop-latency", action="store_true", help="measure event loop lag under a burst of large filters")
+    args = arg_parser.parse_args(argv)
+
+    report = run(args.queries, args.scale, args.min_time)
+    print(_format(report))
+    if args.loop_latency:
+        large = long_or_chain(max(1, int(500 * args.scale))) + value_paths(max(1, int(100 * args.scale)))
+        # Distinct filters, so that the async run cannot coalesce them
+        burst = [f"{f} and burst{i} pr" for i in range(8) for f in large]
+        report["loop_latency"] = loop_latency(burst)
+        for name, r in report["loop_latency"].items():
+            print(f"event loop lag, {name:<8} p50 {r['p50_ms']:.3f}ms p99 {r['p99_ms']:.3f}ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, TYPE_CHECKING
+from .lazy import LazyProgram
+from .lexer import Lexer, Token, StringLiteralToken, NumericLiteralToken
+from .parser import Parser, Node
+if TYPE_CHECKING:
+    from .limits import Limits
+
+# Comparison values as the lexer sees them: a quoted string ending at the first
+# unescaped quote, or digits followed by a delimiter. Matches are checked against
+# the lexer output before a template is stored.
+literal_program = LazyProgram(
+    r'(?<=\s)(?:(?P<string>"(?:[^"]|(?<=\\)")*(?<!\\)")|(?P<number>\d+)(?=[ )\]]|\Z))'
+)
+
+# Set by instrumentation.set_observer, limits and instrumentation are only
+# imported when used
+_observer = None
+
+# Token tuples and parse trees share one LRU order and bound, keyed on
+# (kind, filter)
+_token_entry = 0
+_node_entry = 1
+
+_string_placeholder = "\x00"
+_number_placeholder = "\x01"
+_no_template = ()
+_literal_classes = {
+    "string": StringLiteralToken,
+    "number": NumericLiteralToken,
+}
+
+@dataclass(frozen=True)
+class CacheInfo():
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: int
+    currsize: int
+
+class ParseCache():
+    """Bounded LRU cache of token tuples and parse trees keyed on the raw filter.
+
+    maxsize bounds the token tuples and parse trees together, the least
+    recently used entry of either kind is evicted first.
+
+    In template mode the token stream is cached with its string and numeric
+    literals stripped out, so filters that only differ in those values share an
+    entry. Parse trees are then built from the cached tokens on every call.
+
+    With limits, filters are checked against them as they are lexed and parsed;
+    a filter served from the cache has passed them already.
+    """
+
+    def __init__(self, maxsize :int = 1024, template :bool = False, limits :Optional["Limits"] = None):
+        if maxsize < 1:
+            raise ValueError("Cache size must be at least 1")
+        self.maxsize = maxsize
+        self.template = template
+        self.limits = limits
+        self._lock = threading.Lock()
+        self._entries :OrderedDict = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def tokenize(self, filter_str :str) -> tuple[Token, ...]:
+        if self.template:
+            return self._tokenize_template(filter_str)
+        tokens = self._get(_token_entry, filter_str)
+        if tokens is None:
+            tokens = self._lex(filter_str)
+            self._put(_token_entry, filter_str, tokens)
+        return tokens
+
+    def parse(self, filter_str :str) -> Node:
+        if self.template:
+            return _parse(filter_str, self._tokenize_template(filter_str))
+        node = self._get(_node_entry, filter_str)
+        if node is None:
+            tokens = self._peek(_token_entry, filter_str)
+            if tokens is None:
+                tokens = self._lex(filter_str, lazy=True)
+            node = _parse(filter_str, tokens)
+            self._put(_node_entry, filter_str, node)
+        return node
+
+    def cache_info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(
+                self._hits, self._misses, self._evictions,
+                self.maxsize, len(self._entries)
+            )
+
+    def cache_clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = self._evictions = 0
+
+    def _get(self, kind :int, key):
+        entry = (kind, key)
+        with self._lock:
+            value = self._entries.get(entry)
+            if value is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._entries.move_to_end(entry)
+        if _observer is not None:
+            _observer.cache_lookup(value is not None)
+        return value
+
+    def _peek(self, kind :int, key):
+        with self._lock:
+            return self._entries.get((kind, key))
+
+    def _put(self, kind :int, key, value):
+        entry = (kind, key)
+        with self._lock:
+            entries = self._entries
+            entries[entry] = value
+            entries.move_to_end(entry)
+            while len(entries) > self.maxsize:
+                entries.popitem(last=False)
+                self._evictions += 1
+
+    def _lex(self, filter_str :str, lazy :bool = False):
+        # lazy returns a token iterator for the parser to pull from
+        tokens = Lexer(filter_str, Lexer.Engine.Regex)
+        if self.limits is not None:
+            from .limits import limit_tokens
+            tokens = limit_tokens(filter_str, tokens, self.limits)
+        if _observer is not None:
+            from .instrumentation import observed_lex
+            return observed_lex(filter_str, tokens, _observer)
+        return tokens if lazy else tuple(tokens)
+
+    def _tokenize_template(self, filter_str :str) -> tuple[Token, ...]:
+        if _string_placeholder in filter_str or _number_placeholder in filter_str:
+            return self._tokenize_raw(filter_str)
+        literals = list(literal_program.finditer(filter_str))
+        if not literals:
+            return self._tokenize_raw(filter_str)
+        parts = []
+        last = 0
+        for match in literals:
+            parts.append(filter_str[last:match.start()])
+            parts.append(_string_placeholder if match.lastgroup == "string" else _number_placeholder)
+            last = match.end()
+        parts.append(filter_str[last:])
+        key = "".join(parts)
+
+        skeleton = self._get(_token_entry, key)
+        if skeleton is None:
+            tokens = self._lex(filter_str)
+            # Only trust the template if the lexer agrees on every literal,
+            # otherwise remember that this template has to be lexed as is
+            skeleton = _make_skeleton(tokens, literals)
+            self._put(_token_entry, key, skeleton or _no_template)
+            if not skeleton:
+                self._put(_token_entry, filter_str, tokens)
+            return tokens
+        if skeleton is _no_template:
+            return self._tokenize_raw(filter_str, count=False)
+        tokens = _fill_skeleton(skeleton, literals)
+        if self.limits is not None:
+            # The cached skeleton passed, the new literals may not
+            from .limits import limit_tokens
+            tokens = tuple(limit_tokens(filter_str, tokens, self.limits))
+        return tokens
+
+    def _tokenize_raw(self, filter_str :str, count :bool = True) -> tuple[Token, ...]:
+        tokens = self._get(_token_entry, filter_str) if count else self._peek(_token_entry, filter_str)
+        if tokens is None:
+            tokens = self._lex(filter_str)
+            self._put(_token_entry, filter_str, tokens)
+        return tokens
+
+def _parse(filter_str :str, tokens) -> Node:
+    if _observer is None:
+        return Parser(tokens).parse()
+    from .instrumentation import observed_parse
+    return observed_parse(filter_str, tokens, _observer)
+
+def _make_skeleton(tokens :tuple[Token, ...], literals :list) -> Optional[tuple]:
+    # Each entry is (class, value, position in the template); literal values are None
+    skeleton = []
+    index = 0
+    shift = 0
+    for token in tokens:
+        cls = type(token)
+        if cls is StringLiteralToken or cls is NumericLiteralToken:
+            if index == len(literals):
+                return None
+            match = literals[index]
+            if (
+                match.start() != token.position
+                or match.end() != token.position + len(token.value)
+                or _literal_classes[match.lastgroup] is not cls
+            ):
+                return None
+            skeleton.append((cls, None, token.position - shift))
+            shift += len(token.value) - 1
+            index += 1
+        else:
+            skeleton.append((cls, token.value, token.position - shift))
+    if index != len(literals):
+        return None
+    return tuple(skeleton)
+
+def _fill_skeleton(skeleton :tuple, literals :list) -> tuple[Token, ...]:
+    tokens = []
+    index = 0
+    shift = 0
+    for cls, value, position in skeleton:
+        if value is None:
+            value = literals[index].group()
+            tokens.append(cls(value, position + shift))
+            shift += len(value) - 1
+            index += 1
+        else:
+            tokens.append(cls(value, position + shift))
+    return tuple(tokens)
+
+_default_cache = ParseCache()
+
+def configure(maxsize :int = 1024, template :bool = False, limits :Optional["Limits"] = None):
+    global _default_cache
+    _default_cache = ParseCache(maxsize=maxsize, template=template, limits=limits)
+
+def tokenize(filter_str :str) -> tuple[Token, ...]:
+    return _default_cache.tokenize(filter_str)
+
+def parse(filter_str :str) -> Node:
+    return _default_cache.parse(filter_str)
+
+def cache_info() -> CacheInfo:
+    return _default_cache.cache_info()
+
+def cache_clear():
+    _default_cache.cache_clear()
@@ -0,0 +1,262 @@
+from typing import Any, Callable, Iterable, Mapping, Union
+# numpy is imported on first use, importing this module stays cheap
+np = None
+from .cache import parse
+from .lexer import Token
+from .parser import Parser, Node, Present, AttrExp, LogExp, Not, ValuePath, In, Constant, expand_in
+from .compiler import literal_value
+from .operators import (
+    _and_op, _equal_op, _not_equal_op, _contains_op, _starts_with_op, _ends_with_op,
+    _greater_than_op, _greater_than_or_equal_op, _less_than_op, _less_than_or_equal_op
+)
+from .err_strings import _invalid_comparison
+
+def _require_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:  # pragma: no cover - exercised without numpy installed
+            raise ImportError("Columnar evaluation requires numpy, install scim-filter-parser[numpy]") from None
+        np = numpy
+
+class Columns():
+    """Case insensitive view over a mapping of attribute path to column.
+
+    Derived arrays (casefolded strings, numeric views, null masks) are computed
+    once per column and shared by every comparison in a filter.
+    """
+
+    def __init__(self, columns :Mapping[str, Any]):
+        _require_numpy()
+        self._columns = {path.casefold(): np.asarray(column) for path, column in columns.items()}
+        self.size = len(next(iter(self._columns.values()))) if self._columns else 0
+        self._derived :dict = {}
+
+    def get(self, attr_path :str):
+        return self._columns.get(attr_path.casefold())
+
+    def _memo(self, kind :str, attr_path :str, make :Callable):
+        key = (kind, attr_path.casefold())
+        value = self._derived.get(key)
+        if value is None:
+            value = self._derived[key] = make(self.get(attr_path))
+        return value
+
+    def strings(self, attr_path :str):
+        # (casefolded unicode array, mask of rows holding a string)
+        return self._memo("str", attr_path, _string_view)
+
+    def numbers(self, attr_path :str):
+        # (float array, mask of rows holding a number)
+        return self._memo("num", attr_path, _number_view)
+
+    def nulls(self, attr_path :str):
+        return self._memo("null", attr_path, _null_mask)
+
+    def present(self, attr_path :str):
+        return self._memo("pr", attr_path, _present_mask)
+
+def _is_str(value :Any) -> bool:
+    return type(value) is str
+
+def _is_number(value :Any) -> bool:
+    return type(value) is int or type(value) is float
+
+def _object_mask(column, func :Callable):
+    return np.frompyfunc(func, 1, 1)(column).astype(bool)
+
+def _casefold(column):
+    # str.casefold per value, like literals and compile_filter, np.char.lower
+    # does not fold e.g. "ß" to "ss"
+    return np.frompyfunc(str.casefold, 1, 1)(column).astype(str)
+
+def _string_view(column):
+    if column.dtype.kind == "U":
+        return _casefold(column), np.ones(len(column), dtype=bool)
+    if column.dtype.kind == "O":
+        valid = _object_mask(column, _is_str)
+        return _casefold(np.where(valid, column, "")), valid
+    return None, np.zeros(len(column), dtype=bool)
+
+def _number_view(column):
+    kind = column.dtype.kind
+    if kind in "iu":
+        return column, np.ones(len(column), dtype=bool)
+    if kind == "f":
+        return column, ~np.isnan(column)
+    if kind == "O":
+        valid = _object_mask(column, _is_number)
+        return np.where(valid, column, 0).astype(float), valid
+    return None, np.zeros(len(column), dtype=bool)
+
+def _null_mask(column):
+    kind = column.dtype.kind
+    if kind == "f":
+        return np.isnan(column)
+    if kind == "O":
+        return _object_mask(column, lambda v: v is None)
+    return np.zeros(len(column), dtype=bool)
+
+def _present_mask(column):
+    kind = column.dtype.kind
+    if kind == "U":
+        return column != ""
+    if kind == "O":
+        return _object_mask(column, lambda v: v is not None and v != "" and v != [] and v != {})
+    return ~_null_mask(column)
+
+_string_ops = {
+    _equal_op: lambda values, literal: values == literal,
+    _not_equal_op: lambda values, literal: values == literal,
+    _contains_op: lambda values, literal: np.char.find(values, literal) >= 0,
+    _starts_with_op: lambda values, literal: np.char.startswith(values, literal),
+    _ends_with_op: lambda values, literal: np.char.endswith(values, literal),
+    _greater_than_op: lambda values, literal: values > literal,
+    _greater_than_or_equal_op: lambda values, literal: values >= literal,
+    _less_than_op: lambda values, literal: values < literal,
+    _less_than_or_equal_op: lambda values, literal: values <= literal,
+}
+
+_number_ops = {
+    _equal_op: lambda values, literal: values == literal,
+    _not_equal_op: lambda values, literal: values == literal,
+    _greater_than_op: lambda values, literal: values > literal,
+    _greater_than_or_equal_op: lambda values, literal: values >= literal,
+    _less_than_op: lambda values, literal: values < literal,
+    _less_than_or_equal_op: lambda values, literal: values <= literal,
+}
+
+def _compile_attr_exp(node :AttrExp, prefix :str) -> Callable[[Columns], Any]:
+    attr_path = prefix + node.attr_path
+    op = node.op
+    literal = literal_value(node.value)
+    position = node.value.position
+    if type(literal) is str:
+        if op not in _string_ops:
+            raise ValueError(f"{_invalid_comparison} {position}")
+        compare = _string_ops[op]
+        literal = literal.casefold()
+
+        def match(columns :Columns):
+            values, valid = columns.strings(attr_path)
+            if values is None:
+                return valid
+            return valid & compare(values, literal)
+    elif type(literal) is int:
+        if op not in _number_ops:
+            raise ValueError(f"{_invalid_comparison} {position}")
+        compare = _number_ops[op]
+
+        def match(columns :Columns):
+            values, valid = columns.numbers(attr_path)
+            if values is None:
+                return valid
+            return valid & compare(values, literal)
+    elif type(literal) is bool:
+        if op != _equal_op and op != _not_equal_op:
+            raise ValueError(f"{_invalid_comparison} {position}")
+
+        def match(columns :Columns):
+            column = columns.get(attr_path)
+            if column.dtype.kind == "b":
+                return column if literal else ~column
+            return _object_mask(column, lambda v: v is literal)
+    else:
+        if op != _equal_op and op != _not_equal_op:
+            raise ValueError(f"{_invalid_comparison} {position}")
+
+        def match(columns :Columns):
+            return columns.nulls(attr_path)
+
+    def match_or_missing(columns :Columns):
+        if columns.get(attr_path) is None:
+            # A missing column is an attribute no resource has assigned
+            return np.full(columns.size, literal is None)
+        return match(columns)
+
+    if op == _not_equal_op:
+        return lambda columns: ~match_or_missing(columns)
+    return match_or_missing
+
+def _compile_present(node :Present, prefix :str) -> Callable[[Columns], Any]:
+    attr_path = prefix + node.attr_path
+
+    def match(columns :Columns):
+        if columns.get(attr_path) is None:
+            return np.zeros(columns.size, dtype=bool)
+        return columns.present(attr_path)
+    return match
+
+def _compile_and(funcs :list) -> Callable[[Columns], Any]:
+    def match(columns :Columns):
+        mask = funcs[0](columns)
+        for func in funcs[1:]:
+            if not mask.any():
+                break
+            mask = mask & func(columns)
+        return mask
+    return match
+
+def _compile_or(funcs :list) -> Callable[[Columns], Any]:
+    def match(columns :Columns):
+        mask = funcs[0](columns)
+        for func in funcs[1:]:
+            if mask.all():
+                break
+            mask = mask | func(columns)
+        return mask
+    return match
+
+def _compile_node(node :Node, prefix :str) -> Callable[[Columns], Any]:
+    cls = type(node)
+    if cls is AttrExp:
+        return _compile_attr_exp(node, prefix)
+    if cls is Present:
+        return _compile_present(node, prefix)
+    if cls is LogExp:
+        funcs = [_compile_node(operand, prefix) for operand in node.operands]
+        return _compile_and(funcs) if node.op == _and_op else _compile_or(funcs)
+    if cls is Not:
+        operand = _compile_node(node.operand, prefix)
+        return lambda columns: ~operand(columns)
+    if cls is ValuePath:
+        # Columns hold one value per resource, so a value path over a complex
+        # attribute reads the "attr.subAttr" columns
+        return _compile_node(node.filter, f"{prefix}{node.attr_path}.")
+    if cls is In:
+        return _compile_node(expand_in(node), prefix)
+    if cls is Constant and not prefix:
+        # Inside a value filter it would depend on the attribute having values
+        value = node.value
+        return lambda columns: np.full(columns.size, value)
+    raise TypeError(f"Cannot compile {cls.__name__}")
+
+def compile_columnar(filter :Union[str, Node, Iterable[Token]]) -> Callable[[Mapping[str, Any]], Any]:
+    """Compile a filter into a function from columns to a boolean mask.
+
+    Columns map attribute paths to equal length arrays. Strings may be unicode
+    or object arrays (None for unassigned), numbers integer, float (NaN for
+    unassigned) or object arrays. String comparisons are case insensitive.
+    """
+    _require_numpy()
+    if isinstance(filter, str):
+        node = parse(filter)
+    elif isinstance(filter, Node):
+        node = filter
+    else:
+        node = Parser(filter).parse()
+    func = _compile_node(node, "")
+
+    def evaluate(columns :Mapping[str, Any]):
+        view = columns if isinstance(columns, Columns) else Columns(columns)
+        return np.asarray(func(view), dtype=bool)
+    return evaluate
+
+def evaluate_columns(filter :Union[str, Node, Iterable[Token]], columns :Mapping[str, Any]):
+    return compile_columnar(filter)(columns)
+
+def filter_indices(filter :Union[str, Node, Iterable[Token]], columns :Mapping[str, Any]):
+    # compile_columnar loads numpy, np is only bound after it ran
+    mask = compile_columnar(filter)(columns)
+    return np.flatnonzero(mask)
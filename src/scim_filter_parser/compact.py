@@ -0,0 +1,127 @@
+from array import array
+from typing import Iterator
+from .lexer import (
+    Lexer, Token,
+    NumericLiteralToken, StringLiteralToken, TrueLiteralToken, FalseLiteralToken, NullLiteralToken,
+    PresenceOperatorToken, ComparisonOperatorToken, NotOperatorToken, LogicOperatorToken,
+    ComplexFilterGroupStartToken, ComplexFilterGroupEndToken,
+    PrecedenceGroupStartToken, PrecedenceGroupEndToken
+)
+
+# The kind of a token is its class' index in this tuple
+token_classes = (
+    Token,
+    ComparisonOperatorToken,
+    LogicOperatorToken,
+    PresenceOperatorToken,
+    NotOperatorToken,
+    StringLiteralToken,
+    NumericLiteralToken,
+    TrueLiteralToken,
+    FalseLiteralToken,
+    NullLiteralToken,
+    PrecedenceGroupStartToken,
+    PrecedenceGroupEndToken,
+    ComplexFilterGroupStartToken,
+    ComplexFilterGroupEndToken,
+)
+kind_codes = {cls: kind for kind, cls in enumerate(token_classes)}
+
+class TokenView():
+    """A token of a CompactTokens stream.
+
+    value is sliced from the filter when read. isinstance() checks and equality
+    with Token objects behave as for the token itself; use materialize() where
+    the exact type is needed, e.g. for the parser.
+    """
+    __slots__ = ("_tokens", "_index")
+
+    def __init__(self, tokens :"CompactTokens", index :int):
+        self._tokens = tokens
+        self._index = index
+
+    @property
+    def __class__(self):
+        return token_classes[self._tokens.kinds[self._index]]
+
+    @property
+    def value(self) -> str:
+        tokens = self._tokens
+        return tokens.filter_str[tokens.starts[self._index]:tokens.ends[self._index]]
+
+    @property
+    def position(self) -> int:
+        return self._tokens.starts[self._index]
+
+    def materialize(self) -> Token:
+        return self.__class__(self.value, self.position)
+
+    def __eq__(self, other):
+        if isinstance(other, (Token, TokenView)):
+            return (
+                self.__class__ is other.__class__
+                and self.position == other.position
+                and self.value == other.value
+            )
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((self.value, self.position))
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(value={self.value!r}, position={self.position!r})"
+
+class CompactTokens():
+    """Token stream as parallel arrays of kinds and [start, end) offsets."""
+    __slots__ = ("filter_str", "kinds", "starts", "ends")
+
+    def __init__(self, filter_str :str, kinds :array = None, starts :array = None, ends :array = None):
+        self.filter_str = filter_str
+        self.kinds = array("B") if kinds is None else kinds
+        self.starts = array("I") if starts is None else starts
+        self.ends = array("I") if ends is None else ends
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getitem__(self, index :int) -> TokenView:
+        if index < 0:
+            index += len(self.kinds)
+        if not 0 <= index < len(self.kinds):
+            raise IndexError("token index out of range")
+        return TokenView(self, index)
+
+    def __iter__(self) -> Iterator[TokenView]:
+        for index in range(len(self.kinds)):
+            yield TokenView(self, index)
+
+    def value(self, index :int) -> str:
+        return self.filter_str[self.starts[index]:self.ends[index]]
+
+    def materialize(self) -> tuple[Token, ...]:
+        filter_str = self.filter_str
+        return tuple(
+            token_classes[kind](filter_str[start:end], start)
+            for kind, start, end in zip(self.kinds, self.starts, self.ends)
+        )
+
+def tokenize_compact(filter_str :str) -> CompactTokens:
+    """Lex filter_str into a CompactTokens stream without a Token per token."""
+    tokens = CompactTokens(filter_str)
+    kinds, starts, ends = tokens.kinds, tokens.starts, tokens.ends
+    scan = Lexer(filter_str, Lexer.Engine.Regex)._scan_regex
+    while True:
+        try:
+            span = scan()
+        except StopIteration:
+            break
+        if type(span) is tuple:
+            cls, start_pos, end_pos = span
+            end_pos += 1
+        else:
+            cls, start_pos = type(span), span.position
+            end_pos = start_pos + len(span.value)
+        kinds.append(kind_codes[cls])
+        starts.append(start_pos)
+        ends.append(end_pos)
+    return tokens
@@ -0,0 +1,275 @@
+import json
+from typing import Any, Callable, Iterable, Union
+from .lexer import (
+    Token, ComparisonValueToken,
+    StringLiteralToken, NumericLiteralToken, TrueLiteralToken, FalseLiteralToken, NullLiteralToken
+)
+from . import cache
+from .cache import parse
+from .parser import Parser, Node, Present, AttrExp, LogExp, Not, ValuePath, In, Constant, split_attr_path
+from .operators import (
+    _and_op, _equal_op, _not_equal_op, _contains_op, _starts_with_op, _ends_with_op,
+    _greater_than_op, _greater_than_or_equal_op, _less_than_op, _less_than_or_equal_op
+)
+from .err_strings import _invalid_comparison
+
+_missing = object()
+
+def literal_value(token :ComparisonValueToken) -> Any:
+    # Turn a comparison value token into the Python value it stands for
+    cls = type(token)
+    if cls is StringLiteralToken:
+        try:
+            return json.loads(token.value)
+        except ValueError:
+            # The lexer does not validate escapes, keep the raw contents
+            return token.value[1:-1]
+    if cls is NumericLiteralToken:
+        return int(token.value)
+    if cls is TrueLiteralToken:
+        return True
+    if cls is FalseLiteralToken:
+        return False
+    if cls is NullLiteralToken:
+        return None
+    raise ValueError(f"{_invalid_comparison} {token.position}")
+
+def lookup(container :dict, name :str) -> Any:
+    # SCIM attribute names are case insensitive, try the exact spelling first
+    value = container.get(name, _missing)
+    if value is not _missing:
+        return value
+    folded = name.casefold()
+    for key, value in container.items():
+        if type(key) is str and key.casefold() == folded:
+            return value
+    return None
+
+def compile_getter(attr_path :str) -> Callable[[dict], Any]:
+    """Return a function resolving attr_path on a resource.
+
+    Attributes qualified with a schema URN are looked up inside the extension
+    object named by the URN and on the resource itself otherwise. Sub-attributes
+    of multi-valued attributes resolve to a list with one entry per value.
+    """
+    uri, name, sub_attr = split_attr_path(attr_path)
+
+    def get_attr(resource :dict) -> Any:
+        container = resource
+        if uri is not None:
+            extension = lookup(resource, uri)
+            if type(extension) is dict:
+                container = extension
+        return lookup(container, name)
+
+    if uri is None and sub_attr is None:
+        return lambda resource: lookup(resource, name)
+    if sub_attr is None:
+        return get_attr
+
+    def get_sub_attr(resource :dict) -> Any:
+        value = get_attr(resource)
+        if type(value) is dict:
+            return lookup(value, sub_attr)
+        if type(value) is list:
+            return [lookup(v, sub_attr) for v in value if type(v) is dict]
+        return None
+    return get_sub_attr
+
+def is_present(value :Any) -> bool:
+    if value is None or value == "":
+        return False
+    if type(value) is list:
+        return any(is_present(v) for v in value)
+    if type(value) is dict:
+        return any(is_present(v) for v in value.values())
+    return True
+
+def _is_number(value :Any) -> bool:
+    return (type(value) is int or type(value) is float)
+
+def compile_test(op :str, literal :Any, position :int) -> Callable[[Any], bool]:
+    """Return a predicate applying op with a fixed literal to a single value.
+
+    Strings are compared case insensitively (caseExact=false), numbers by value.
+    """
+    if type(literal) is str:
+        literal = literal.casefold()
+        if op == _equal_op or op == _not_equal_op:
+            return lambda v: type(v) is str and v.casefold() == literal
+        if op == _contains_op:
+            return lambda v: type(v) is str and literal in v.casefold()
+        if op == _starts_with_op:
+            return lambda v: type(v) is str and v.casefold().startswith(literal)
+        if op == _ends_with_op:
+            return lambda v: type(v) is str and v.casefold().endswith(literal)
+        if op == _greater_than_op:
+            return lambda v: type(v) is str and v.casefold() > literal
+        if op == _greater_than_or_equal_op:
+            return lambda v: type(v) is str and v.casefold() >= literal
+        if op == _less_than_op:
+            return lambda v: type(v) is str and v.casefold() < literal
+        if op == _less_than_or_equal_op:
+            return lambda v: type(v) is str and v.casefold() <= literal
+    elif type(literal) is int:
+        if op == _equal_op or op == _not_equal_op:
+            return lambda v: _is_number(v) and v == literal
+        if op == _greater_than_op:
+            return lambda v: _is_number(v) and v > literal
+        if op == _greater_than_or_equal_op:
+            return lambda v: _is_number(v) and v >= literal
+        if op == _less_than_op:
+            return lambda v: _is_number(v) and v < literal
+        if op == _less_than_or_equal_op:
+            return lambda v: _is_number(v) and v <= literal
+    elif type(literal) is bool:
+        if op == _equal_op or op == _not_equal_op:
+            return lambda v: v is literal
+    elif literal is None:
+        if op == _equal_op or op == _not_equal_op:
+            return lambda v: v is None
+    # Substring matching on non-strings and ordering of booleans or null
+    raise ValueError(f"{_invalid_comparison} {position}")
+
+def membership_key(value :Any) -> Any:
+    # Values that an eq test treats as equal share a key, other values give None
+    cls = type(value)
+    if cls is str:
+        return (str, value.casefold())
+    if cls is int or cls is float:
+        return (int, value)
+    if cls is bool or value is None:
+        return (bool, value)
+    return None
+
+def membership_keys(value :Any) -> set:
+    # Keys of everything an eq test compares against, one per value of a list
+    if type(value) is list:
+        keys = {membership_key(v.get("value") if type(v) is dict else v) for v in value}
+        if not value:
+            # An empty list is as good as an unassigned attribute
+            keys.add(membership_key(None))
+    else:
+        keys = {membership_key(value)}
+    keys.discard(None)
+    return keys
+
+def _compile_in(node :In) -> Callable[[dict], bool]:
+    # Same as an "or" of eq tests on attr_path, with a single lookup
+    get = compile_getter(node.attr_path)
+    keys = frozenset(membership_key(literal_value(value)) for value in node.values)
+
+    def match(resource :dict) -> bool:
+        value = get(resource)
+        if type(value) is list:
+            for v in value:
+                if type(v) is dict:
+                    v = v.get("value")
+                if membership_key(v) in keys:
+                    return True
+            return not value and (bool, None) in keys
+        return membership_key(value) in keys
+    return match
+
+def compile_comparison(get :Callable[[dict], Any], test :Callable[[Any], bool], negate :bool = False) -> Callable[[dict], bool]:
+    # Apply test to the value get resolves, or to each of a multi-valued attribute
+    def match(resource :dict) -> bool:
+        value = get(resource)
+        if type(value) is list:
+            for v in value:
+                if type(v) is dict:
+                    # Multi-valued complex attributes compare on their "value"
+                    v = v.get("value")
+                if test(v):
+                    return True
+            # An empty list is as good as an unassigned attribute
+            return not value and test(None)
+        return test(value)
+
+    if negate:
+        return lambda resource: not match(resource)
+    return match
+
+def _compile_attr_exp(node :AttrExp) -> Callable[[dict], bool]:
+    get = compile_getter(node.attr_path)
+    test = compile_test(node.op, literal_value(node.value), node.value.position)
+    return compile_comparison(get, test, node.op == _not_equal_op)
+
+def _compile_value_path(node :ValuePath) -> Callable[[dict], bool]:
+    get = compile_getter(node.attr_path)
+    value_filter = _compile_node(node.filter)
+
+    def match(resource :dict) -> bool:
+        value = get(resource)
+        if type(value) is dict:
+            return value_filter(value)
+        if type(value) is list:
+            for v in value:
+                if type(v) is dict and value_filter(v):
+                    return True
+        return False
+    return match
+
+def _compile_and(funcs :list) -> Callable[[dict], bool]:
+    if len(funcs) == 2:
+        first, second = funcs
+        return lambda resource: first(resource) and second(resource)
+
+    def match(resource :dict) -> bool:
+        for func in funcs:
+            if not func(resource):
+                return False
+        return True
+    return match
+
+def _compile_or(funcs :list) -> Callable[[dict], bool]:
+    if len(funcs) == 2:
+        first, second = funcs
+        return lambda resource: first(resource) or second(resource)
+
+    def match(resource :dict) -> bool:
+        for func in funcs:
+            if func(resource):
+                return True
+        return False
+    return match
+
+def _compile_node(node :Node) -> Callable[[dict], bool]:
+    cls = type(node)
+    if cls is AttrExp:
+        return _compile_attr_exp(node)
+    if cls is Present:
+        get = compile_getter(node.attr_path)
+        return lambda resource: is_present(get(resource))
+    if cls is LogExp:
+        funcs = [_compile_node(operand) for operand in node.operands]
+        return _compile_and(funcs) if node.op == _and_op else _compile_or(funcs)
+    if cls is Not:
+        operand = _compile_node(node.operand)
+        return lambda resource: not operand(resource)
+    if cls is ValuePath:
+        return _compile_value_path(node)
+    if cls is In:
+        return _compile_in(node)
+    if cls is Constant:
+        value = node.value
+        return lambda resource: value
+    raise TypeError(f"Cannot compile {cls.__name__}")
+
+def compile_filter(filter :Union[str, Node, Iterable[Token]]) -> Callable[[dict], bool]:
+    """Compile a filter into a single predicate over resource dicts.
+
+    Accepts a filter string (parsed through the module cache), a parsed Node or
+    a token stream. Attribute paths and literals are resolved once here.
+    """
+    if isinstance(filter, str):
+        node = parse(filter)
+    elif isinstance(filter, Node):
+        node = filter
+    else:
+        node = Parser(filter).parse()
+    match = _compile_node(node)
+    if cache._observer is not None:
+        from .instrumentation import timed_predicate
+        return timed_predicate(match, cache._observer)
+    return match
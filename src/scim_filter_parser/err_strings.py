@@ -1,7 +1,31 @@
+from .lazy import LazyProgram
 
 _invalid_numeric_literal                    = "Only digits allowed in numeric literals at position:"
 _unexpected_character                       = "Unexpected character at position:"
 _unexpected_end_of_input                    = "Unexpected end of input"
 _unterminated_string                        = "Unterminated string literal"
 _unexpected_space                           = "Unexpected space at position:"
-_missing_space                              = "Missing space at position:"
\ No newline at end of file
+_missing_space                              = "Missing space at position:"
+_unexpected_token                           = "Unexpected token at position:"
+_invalid_attribute_path                     = "Invalid attribute path at position:"
+_invalid_comparison                         = "Invalid comparison value for operator at position:"
+_unmapped_attribute                         = "No column mapped for attribute at position:"
+_input_too_long                             = "Filter exceeds the maximum length at position:"
+_too_many_tokens                            = "Filter exceeds the maximum number of tokens at position:"
+_nesting_too_deep                           = "Filter exceeds the maximum nesting depth at position:"
+_literal_too_long                           = "Literal exceeds the maximum length at position:"
+_time_budget_exceeded                       = "Filter exceeds the time budget at position:"
+_invalid_serialized_filter                  = "Invalid serialized filter at offset:"
+_unsupported_serialized_version             = "Unsupported serialized filter version:"
+_serialized_filter_too_large                = "Filter too large to serialize"
+_invalid_json                               = "Invalid JSON at offset:"
+_invalid_patch_operation                    = "Invalid PATCH operation at index:"
+_missing_leading_str                        = "Invalid SCIM filter string. Expecting 'filter=' at position"
+_patch_no_target                            = "PATCH path selects no value (noTarget) for operation at index:"
+
+_error_position_program = LazyProgram(r"^(.*) (\d+)$")
+
+def error_position(message :str):
+    # Position at the end of a "... at position: N" message, None otherwise
+    match = _error_position_program.match(message)
+    return None if match is None else int(match.group(2))
\ No newline at end of file
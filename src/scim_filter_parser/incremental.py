@@ -0,0 +1,127 @@
+import codecs
+from typing import IO, Iterable, Iterator, Optional, Union
+from .lexer import Lexer, Token
+from .err_strings import error_position
+
+class _BufferLexer(Lexer):
+    # A Lexer over a window of the input starting at absolute position _offset
+
+    def __init__(self, filter_str :str, engine :Lexer.Engine):
+        super().__init__(filter_str, engine)
+        self._offset = 0
+
+    def emit_token(self, cls :type, start_pos :int, end_pos :int):
+        return cls(self._filter_str[start_pos:end_pos+1], start_pos + self._offset)
+
+class IncrementalLexer():
+    """Lexer fed with chunks of a filter as they arrive.
+
+    feed() returns the tokens completed by a chunk and close() the rest. An
+    error is raised once the tokens lexed before it have been returned. Only
+    the token being scanned and the unscanned part of the last chunk are kept.
+    Tokens, positions and errors are the same as lexing the whole string.
+    """
+
+    def __init__(self, engine :Lexer.Engine = Lexer.Engine.Regex):
+        self._engine = engine
+        self._buffer = ""
+        self._lexer :Optional[_BufferLexer] = None
+        self._decoder = None
+        self._closed = False
+        self._error :Optional[ValueError] = None
+
+    def feed(self, chunk :Union[str, bytes]) -> list[Token]:
+        if self._error is not None:
+            raise self._error
+        if self._closed:
+            raise ValueError("Cannot feed a closed lexer")
+        if isinstance(chunk, bytes):
+            if self._decoder is None:
+                self._decoder = codecs.getincrementaldecoder("utf-8")()
+            chunk = self._decoder.decode(chunk)
+        if not chunk:
+            return []
+        self._buffer += chunk
+        return self._drain(False)
+
+    def close(self) -> list[Token]:
+        if self._error is not None:
+            raise self._error
+        if self._closed:
+            return []
+        if self._decoder is not None:
+            self._buffer += self._decoder.decode(b"", final=True)
+        self._closed = True
+        return self._drain(True)
+
+    def _drain(self, final :bool) -> list[Token]:
+        lexer = self._lexer
+        if lexer is None:
+            if len(self._buffer) < len(Lexer.leading_str) and not final:
+                return []
+            lexer = self._lexer = _BufferLexer(self._buffer, self._engine)
+        else:
+            lexer._filter_str = self._buffer
+        buffer_len = len(self._buffer)
+        tokens = []
+        while True:
+            position, state = lexer._position, lexer._state
+            try:
+                token = lexer.next_token()
+            except StopIteration:
+                if not final:
+                    lexer._position, lexer._state = position, state
+                break
+            except ValueError as e:
+                error_at = error_position(str(e))
+                if final or (error_at is not None and error_at + 2 < buffer_len):
+                    # Like Lexer, hand out the tokens before the error first
+                    self._error = self._absolute_error(e, error_at)
+                    if not tokens:
+                        raise self._error from None
+                    return tokens
+                lexer._position, lexer._state = position, state
+                break
+            end_pos = token.position - lexer._offset + len(token.value) - 1
+            if not final and end_pos + 1 >= buffer_len:
+                # The token might continue, or be rejected, with the next chunk
+                lexer._position, lexer._state = position, state
+                break
+            tokens.append(token)
+        self._trim()
+        return tokens
+
+    def _trim(self):
+        # Keep the last consumed character, the next token looks back at it
+        lexer = self._lexer
+        consumed = lexer._position
+        if consumed > 0:
+            self._buffer = self._buffer[consumed:]
+            lexer._filter_str = self._buffer
+            lexer._offset += consumed
+            lexer._position -= consumed
+            lexer._filter_start -= consumed
+
+    def _absolute_error(self, error :ValueError, position :Optional[int]) -> ValueError:
+        if position is None or self._lexer is None:
+            return error
+        prefix = str(error).rsplit(" ", 1)[0]
+        return ValueError(f"{prefix} {position + self._lexer._offset}")
+
+def iter_tokens(
+    source :Union[Iterable[Union[str, bytes]], IO], chunk_size :int = 65536,
+    engine :Lexer.Engine = Lexer.Engine.Regex
+) -> Iterator[Token]:
+    """Lex a filter from an iterable of chunks or a file-like object.
+
+    Tokens are yielded as soon as the chunks read so far complete them.
+    """
+    lexer = IncrementalLexer(engine)
+    if hasattr(source, "read"):
+        read = source.read
+        chunks = iter(lambda: read(chunk_size), read(0))
+    else:
+        chunks = source
+    for chunk in chunks:
+        yield from lexer.feed(chunk)
+    yield from lexer.close()
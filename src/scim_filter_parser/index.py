@@ -0,0 +1,266 @@
+from bisect import bisect_left, bisect_right
+from typing import Any, Hashable, Iterable, Optional, Union
+from .lexer import Token
+from .cache import parse
+from .parser import Parser, Node, Present, AttrExp, LogExp, Not, In, Constant
+from .compiler import compile_filter, compile_getter, compile_test, literal_value, membership_key, membership_keys, is_present
+from .operators import (
+    _and_op, _equal_op, _not_equal_op, _contains_op, _starts_with_op, _ends_with_op,
+    _greater_than_op, _greater_than_or_equal_op, _less_than_op, _less_than_or_equal_op
+)
+
+def _trigrams(key :str) -> set[str]:
+    return {key[i:i+3] for i in range(len(key) - 2)}
+
+def _prefixed(keys :list, prefix :str) -> Iterable:
+    # The keys of a sorted list that start with prefix
+    for i in range(bisect_left(keys, prefix), len(keys)):
+        if not keys[i].startswith(prefix):
+            break
+        yield keys[i]
+
+class _SortedKeys():
+    # Distinct keys kept sorted for range and prefix lookups. Adds and removes
+    # are recorded in sets and merged into the sorted list on the next lookup,
+    # so loading n keys costs O(n log n) rather than O(n) per key.
+
+    def __init__(self):
+        self._keys = []
+        self._added = set()
+        self._removed = set()
+
+    def add(self, key :Any):
+        if key in self._removed:
+            self._removed.discard(key)
+        else:
+            self._added.add(key)
+
+    def discard(self, key :Any):
+        if key in self._added:
+            self._added.discard(key)
+        else:
+            self._removed.add(key)
+
+    def sorted(self) -> list:
+        if self._added or self._removed:
+            removed = self._removed
+            keys = [key for key in self._keys if key not in removed] if removed else self._keys
+            keys.extend(self._added)
+            # A sorted run followed by the new keys, which timsort merges
+            keys.sort()
+            self._keys = keys
+            self._added = set()
+            self._removed = set()
+        return self._keys
+
+class _AttributeIndex():
+    # All indexes kept for one attribute path. Keys are membership keys, so
+    # strings are casefolded and matched the way the compiler matches them.
+
+    def __init__(self, attr_path :str):
+        self.get = compile_getter(attr_path)
+        self.ids = {}           # key -> ids whose value equals it
+        self.strings = _SortedKeys()    # distinct string keys
+        self.reversed = _SortedKeys()   # the same keys reversed, for ew
+        self.trigrams = {}              # trigram -> string keys containing it, for co
+        self.numbers = _SortedKeys()    # distinct numbers
+        self.present = set()
+
+    def keys(self, resource :dict) -> tuple[set, bool]:
+        value = self.get(resource)
+        # NaN never matches a literal
+        keys = {key for key in membership_keys(value) if key[1] == key[1]}
+        return keys, is_present(value)
+
+    def add(self, resource_id :Hashable, resource :dict):
+        keys, present = self.keys(resource)
+        for key in keys:
+            ids = self.ids.get(key)
+            if ids is None:
+                ids = self.ids[key] = set()
+                self._add_key(key)
+            ids.add(resource_id)
+        if present:
+            self.present.add(resource_id)
+
+    def remove(self, resource_id :Hashable, resource :dict):
+        keys, _ = self.keys(resource)
+        for key in keys:
+            ids = self.ids[key]
+            ids.discard(resource_id)
+            if not ids:
+                del self.ids[key]
+                self._remove_key(key)
+        self.present.discard(resource_id)
+
+    def _add_key(self, key :tuple):
+        kind, value = key
+        if kind is str:
+            self.strings.add(value)
+            self.reversed.add(value[::-1])
+            for trigram in _trigrams(value):
+                self.trigrams.setdefault(trigram, set()).add(value)
+        elif kind is int:
+            self.numbers.add(value)
+
+    def _remove_key(self, key :tuple):
+        kind, value = key
+        if kind is str:
+            self.strings.discard(value)
+            self.reversed.discard(value[::-1])
+            for trigram in _trigrams(value):
+                keys = self.trigrams[trigram]
+                keys.discard(value)
+                if not keys:
+                    del self.trigrams[trigram]
+        elif kind is int:
+            self.numbers.discard(value)
+
+    def union(self, keys :Iterable) -> set:
+        result = set()
+        for key in keys:
+            result |= self.ids.get(key, ())
+        return result
+
+    def match(self, op :str, literal :Any) -> set:
+        # Ids matching the eq, co, sw, ew or ordering test, ne is handled by the caller
+        if op == _equal_op:
+            return set(self.ids.get(membership_key(literal), ()))
+        if type(literal) is str:
+            literal = literal.casefold()
+            if op == _contains_op:
+                if len(literal) < 3:
+                    keys = (k for k in self.strings.sorted() if literal in k)
+                else:
+                    candidates = [self.trigrams.get(t, ()) for t in _trigrams(literal)]
+                    keys = (k for k in set.intersection(*map(set, candidates)) if literal in k)
+                return self.union((str, k) for k in keys)
+            if op == _starts_with_op:
+                return self.union((str, k) for k in _prefixed(self.strings.sorted(), literal))
+            if op == _ends_with_op:
+                return self.union((str, k[::-1]) for k in _prefixed(self.reversed.sorted(), literal[::-1]))
+            sorted_keys, kind = self.strings.sorted(), str
+        else:
+            sorted_keys, kind = self.numbers.sorted(), int
+        if op == _greater_than_op:
+            keys = sorted_keys[bisect_right(sorted_keys, literal):]
+        elif op == _greater_than_or_equal_op:
+            keys = sorted_keys[bisect_left(sorted_keys, literal):]
+        elif op == _less_than_op:
+            keys = sorted_keys[:bisect_left(sorted_keys, literal)]
+        else:
+            keys = sorted_keys[:bisect_right(sorted_keys, literal)]
+        return self.union((kind, k) for k in keys)
+
+class IndexedStore():
+    """Resources by id with secondary indexes on chosen attribute paths.
+
+    Filters are answered from hash indexes (eq, ne), sorted indexes (gt, ge,
+    lt, le on strings, dateTimes and numbers), a prefix index (sw), a reversed
+    prefix index (ew), a trigram index (co) and presence sets (pr). and, or and
+    not combine id sets; parts of a filter no index covers are evaluated on the
+    candidates left by the rest, or on every resource when nothing narrows them.
+    Results are the same as compile_filter over all resources.
+
+    Stored resources must not be modified in place, use update().
+    """
+
+    def __init__(self, indexed_paths :Iterable[str] = ()):
+        self._resources = {}
+        self._indexes = {attr_path.casefold(): _AttributeIndex(attr_path) for attr_path in indexed_paths}
+
+    def __len__(self) -> int:
+        return len(self._resources)
+
+    def __contains__(self, resource_id :Hashable) -> bool:
+        return resource_id in self._resources
+
+    def get(self, resource_id :Hashable) -> Optional[dict]:
+        return self._resources.get(resource_id)
+
+    def insert(self, resource_id :Hashable, resource :dict):
+        if resource_id in self._resources:
+            raise KeyError(resource_id)
+        self._resources[resource_id] = resource
+        for index in self._indexes.values():
+            index.add(resource_id, resource)
+
+    def update(self, resource_id :Hashable, resource :dict):
+        self.delete(resource_id)
+        self.insert(resource_id, resource)
+
+    def delete(self, resource_id :Hashable):
+        resource = self._resources.pop(resource_id)
+        for index in self._indexes.values():
+            index.remove(resource_id, resource)
+
+    def ids(self, filter :Union[str, Node, Iterable[Token]]) -> set:
+        """Return the ids of the resources matching filter."""
+        if isinstance(filter, str):
+            node = parse(filter)
+        elif isinstance(filter, Node):
+            node = filter
+        else:
+            node = Parser(filter).parse()
+        ids = self._candidates(node)
+        if ids is None:
+            match = compile_filter(node)
+            return {resource_id for resource_id, resource in self._resources.items() if match(resource)}
+        return ids
+
+    def search(self, filter :Union[str, Node, Iterable[Token]]) -> list[dict]:
+        """Return the resources matching filter."""
+        return [self._resources[resource_id] for resource_id in self.ids(filter)]
+
+    def _candidates(self, node :Node) -> Optional[set]:
+        # The exact ids matching node, None when that takes a scan
+        cls = type(node)
+        if cls is AttrExp:
+            index = self._indexes.get(node.attr_path.casefold())
+            if index is None:
+                return None
+            literal = literal_value(node.value)
+            # Same errors as the compiler for comparisons it rejects
+            compile_test(node.op, literal, node.value.position)
+            if node.op == _not_equal_op:
+                return self._resources.keys() - index.match(_equal_op, literal)
+            return index.match(node.op, literal)
+        if cls is Present:
+            index = self._indexes.get(node.attr_path.casefold())
+            return None if index is None else set(index.present)
+        if cls is In:
+            index = self._indexes.get(node.attr_path.casefold())
+            if index is None:
+                return None
+            return index.union(membership_key(literal_value(value)) for value in node.values)
+        if cls is Not:
+            ids = self._candidates(node.operand)
+            return None if ids is None else self._resources.keys() - ids
+        if cls is LogExp:
+            return self._log_exp(node)
+        if cls is Constant:
+            return set(self._resources) if node.value else set()
+        # Value filters have to match within one value, which the indexes do not record
+        return None
+
+    def _log_exp(self, node :LogExp) -> Optional[set]:
+        ids = None
+        rest = []
+        for operand in node.operands:
+            operand_ids = self._candidates(operand)
+            if operand_ids is None:
+                rest.append(operand)
+            elif ids is None:
+                ids = operand_ids
+            elif node.op == _and_op:
+                ids &= operand_ids
+            else:
+                ids |= operand_ids
+        if not rest:
+            return ids
+        if node.op != _and_op or ids is None:
+            return None
+        # Check the operands without an index on what the others left over
+        match = compile_filter(rest[0] if len(rest) == 1 else LogExp(_and_op, tuple(rest), rest[0].position))
+        resources = self._resources
+        return {resource_id for resource_id in ids if match(resources[resource_id])}
@@ -0,0 +1,258 @@
+"""Opt-in instrumentation of lexing, parsing, evaluation and the parse cache.
+
+Nothing is measured until an observer is installed:
+
+    recorder = Recorder()
+    set_observer(recorder)
+    ...
+    print(recorder.to_prometheus())
+
+Events come from the cache's tokenize() and parse(), the functions of the
+package built on them, and predicates returned by compile_filter while an
+observer is installed. A Lexer or Parser used directly is not observed.
+"""
+import bisect
+import heapq
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, Optional
+from . import cache, err_strings
+from .lexer import (
+    Lexer, Token,
+    StringLiteralToken, NumericLiteralToken, TrueLiteralToken, FalseLiteralToken, NullLiteralToken
+)
+from .parser import Parser, Node
+from .err_strings import error_position
+
+class Observer():
+    """Receives instrumentation events, every method is a no-op by default."""
+
+    def lexed(self, filter_str :str, tokens :tuple[Token, ...], seconds :float):
+        pass
+
+    def parsed(self, filter_str :str, seconds :float):
+        pass
+
+    def evaluated(self, seconds :float):
+        pass
+
+    def cache_lookup(self, hit :bool):
+        pass
+
+    def failed(self, stage :str, filter_str :str, error :ValueError):
+        pass
+
+observer :Optional[Observer] = None
+
+def set_observer(new_observer :Optional[Observer]) -> Optional[Observer]:
+    """Install an observer, None turns instrumentation off. Returns the previous one."""
+    global observer
+    previous, observer = observer, new_observer
+    # The cache and compiler check their own reference
+    cache._observer = new_observer
+    return previous
+
+@contextmanager
+def observing(new_observer :Observer) -> Iterator[Observer]:
+    previous = set_observer(new_observer)
+    try:
+        yield new_observer
+    finally:
+        set_observer(previous)
+
+# Messages of err_strings by text, for naming the category of an error
+_error_categories = {
+    value: name.lstrip("_")
+    for name, value in vars(err_strings).items()
+    if name.startswith("_") and not name.startswith("__") and type(value) is str
+}
+
+def error_category(error :ValueError) -> str:
+    """Name of the err_strings message of an error, without its position, or "other"."""
+    message = str(error)
+    if error_position(message) is not None:
+        message = message.rsplit(" ", 1)[0]
+    return _error_categories.get(message, "other")
+
+_literal_states = {
+    StringLiteralToken: Lexer.State.StringLiteral,
+    NumericLiteralToken: Lexer.State.NumericLiteral,
+    TrueLiteralToken: Lexer.State.TrueLiteral,
+    FalseLiteralToken: Lexer.State.FalseLiteral,
+    NullLiteralToken: Lexer.State.NullLiteral,
+}
+
+def state_characters(filter_str :str, tokens :tuple[Token, ...]) -> dict[str, int]:
+    """Characters the lexer consumes in each Lexer.State, worked out from its tokens.
+
+    Literals count towards their literal state and the spaces before them
+    towards ComparisonValue, everything after "filter=" else towards Filter.
+    """
+    counts = {state.name: 0 for state in Lexer.State}
+    previous_end = len(Lexer.leading_str)
+    for token in tokens:
+        gap = token.position - previous_end
+        state = _literal_states.get(type(token))
+        if state is None:
+            counts[Lexer.State.Filter.name] += gap + len(token.value)
+        else:
+            counts[Lexer.State.ComparisonValue.name] += gap
+            counts[state.name] += len(token.value)
+        previous_end = token.position + len(token.value)
+    counts[Lexer.State.Filter.name] += max(0, len(filter_str) - previous_end)
+    return counts
+
+def observed_lex(filter_str :str, tokens :Iterable[Token], current :Observer) -> tuple[Token, ...]:
+    # Read a token stream of filter_str reporting to current, used by the cache while observed
+    started = time.perf_counter()
+    try:
+        tokens = tuple(tokens)
+    except ValueError as e:
+        current.failed("lex", filter_str, e)
+        raise
+    current.lexed(filter_str, tokens, time.perf_counter() - started)
+    return tokens
+
+def observed_parse(filter_str :str, tokens :tuple[Token, ...], current :Observer) -> Node:
+    started = time.perf_counter()
+    try:
+        node = Parser(tokens).parse()
+    except ValueError as e:
+        current.failed("parse", filter_str, e)
+        raise
+    current.parsed(filter_str, time.perf_counter() - started)
+    return node
+
+def timed_predicate(match :Callable[[dict], bool], current :Observer) -> Callable[[dict], bool]:
+    def timed(resource :dict) -> bool:
+        started = time.perf_counter()
+        result = match(resource)
+        current.evaluated(time.perf_counter() - started)
+        return result
+    return timed
+
+_seconds_buckets = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1.0)
+_size_buckets = (1, 4, 16, 64, 256, 1024, 4096, 16384, 65536)
+
+class Histogram():
+    """Counts of observed values per upper bucket bound, as in Prometheus."""
+
+    def __init__(self, buckets :tuple[float, ...]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value :float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> dict:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {"buckets": buckets, "sum": self.sum, "count": self.count}
+
+class Recorder(Observer):
+    """Observer aggregating events into histograms and counters.
+
+    The slowest filters to lex or parse are kept, up to keep_slowest of them,
+    to track down pathological input.
+    """
+
+    def __init__(self, keep_slowest :int = 10):
+        self._lock = threading.Lock()
+        self.keep_slowest = keep_slowest
+        self.histograms = {
+            "filter_characters": Histogram(_size_buckets),
+            "filter_tokens": Histogram(_size_buckets),
+            "lex_seconds": Histogram(_seconds_buckets),
+            "parse_seconds": Histogram(_seconds_buckets),
+            "evaluate_seconds": Histogram(_seconds_buckets),
+        }
+        self.state_characters = {state.name: 0 for state in Lexer.State}
+        self.cache = {"hit": 0, "miss": 0}
+        self.errors :dict[tuple[str, str], int] = {}
+        self._slowest :list[tuple[float, str, str]] = []
+
+    def lexed(self, filter_str :str, tokens :tuple[Token, ...], seconds :float):
+        counts = state_characters(filter_str, tokens)
+        with self._lock:
+            self.histograms["filter_characters"].observe(len(filter_str))
+            self.histograms["filter_tokens"].observe(len(tokens))
+            self.histograms["lex_seconds"].observe(seconds)
+            for state, count in counts.items():
+                self.state_characters[state] += count
+            self._keep("lex", filter_str, seconds)
+
+    def parsed(self, filter_str :str, seconds :float):
+        with self._lock:
+            self.histograms["parse_seconds"].observe(seconds)
+            self._keep("parse", filter_str, seconds)
+
+    def evaluated(self, seconds :float):
+        with self._lock:
+            self.histograms["evaluate_seconds"].observe(seconds)
+
+    def cache_lookup(self, hit :bool):
+        with self._lock:
+            self.cache["hit" if hit else "miss"] += 1
+
+    def failed(self, stage :str, filter_str :str, error :ValueError):
+        key = (stage, error_category(error))
+        with self._lock:
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def _keep(self, stage :str, filter_str :str, seconds :float):
+        entry = (seconds, stage, filter_str)
+        if len(self._slowest) < self.keep_slowest:
+            heapq.heappush(self._slowest, entry)
+        elif self._slowest and entry > self._slowest[0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def slowest(self) -> list[tuple[float, str, str]]:
+        """(seconds, stage, filter) of the slowest filters seen, slowest first."""
+        with self._lock:
+            return sorted(self._slowest, reverse=True)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "histograms": {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+                "state_characters": dict(self.state_characters),
+                "cache": dict(self.cache),
+                "errors": [
+                    {"stage": stage, "category": category, "count": count}
+                    for (stage, category), count in self.errors.items()
+                ],
+            }
+
+    def to_prometheus(self, prefix :str = "scim_filter") -> str:
+        """Everything recorded in the Prometheus text exposition format."""
+        data = self.to_dict()
+        lines = []
+        for name, histogram in data["histograms"].items():
+            metric = f"{prefix}_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            for bound, count in histogram["buckets"].items():
+                le = "+Inf" if bound == math.inf else repr(float(bound))
+                lines.append(f'{metric}_bucket{{le="{le}"}} {count}')
+            lines.append(f"{metric}_sum {histogram['sum']!r}")
+            lines.append(f"{metric}_count {histogram['count']}")
+        lines.append(f"# TYPE {prefix}_state_characters_total counter")
+        for state, count in data["state_characters"].items():
+            lines.append(f'{prefix}_state_characters_total{{state="{state}"}} {count}')
+        lines.append(f"# TYPE {prefix}_cache_lookups_total counter")
+        for result, count in data["cache"].items():
+            lines.append(f'{prefix}_cache_lookups_total{{result="{result}"}} {count}')
+        lines.append(f"# TYPE {prefix}_errors_total counter")
+        for error in data["errors"]:
+            lines.append(
+                f'{prefix}_errors_total{{stage="{error["stage"]}",category="{error["category"]}"}} {error["count"]}'
+            )
+        return "\n".join(lines) + "\n"
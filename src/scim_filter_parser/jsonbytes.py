@@ -0,0 +1,165 @@
+"""Evaluate filters on raw JSON without decoding whole documents.
+
+    match = compile_json('filter=userName eq "bjensen"')
+    match(b'{"userName": "bjensen", "photos": [...]}')
+
+    with open("users.jsonl", "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for line in filter_json_lines('filter=title pr', data):
+            ...
+
+The top level object is scanned member by member as the compiled filter asks
+for attributes, so evaluation stops as soon as and/or decide the result and
+members after the deciding one are never looked at. The buffer is scanned in
+place, without decoding it. Values passed over, objects and arrays included,
+are only delimited: strings are skipped whole and brackets counted. Only the
+members the filter reads are decoded, once, and only those are checked to be
+valid JSON.
+"""
+import json
+from typing import Any, Callable, Iterable, Iterator, Optional, Union
+from .lexer import Token
+from .lazy import LazyProgram
+from .parser import Node
+from .compiler import compile_filter
+from .err_strings import _invalid_json
+
+_object_start_program = LazyProgram(rb'[ \t\n\r]*\{[ \t\n\r]*')
+_object_end_program = LazyProgram(rb'\}')
+_member_program = LazyProgram(rb'("[^"\\]*(?:\\.[^"\\]*)*")[ \t\n\r]*:[ \t\n\r]*')
+_separator_program = LazyProgram(rb'[ \t\n\r]*([,}])[ \t\n\r]*')
+_scalar_program = LazyProgram(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[^,}\] \t\n\r]+')
+# Up to and including the next bracket outside a string
+_bracket_program = LazyProgram(rb'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*([\[\]{}])')
+_blank_program = LazyProgram(rb'[ \t\n\r]*')
+
+_opening = {b"[": b"]", b"{": b"}"}
+
+def _skip_container(data :Any, position :int, end :int) -> int:
+    # The offset past the object or array starting at position
+    expected = [_opening[data[position:position+1]]]
+    position += 1
+    match = _bracket_program.match
+    while expected:
+        found = match(data, position, end)
+        if found is None:
+            raise ValueError(f"{_invalid_json} {end}")
+        bracket = found.group(1)
+        position = found.end()
+        closing = _opening.get(bracket)
+        if closing is not None:
+            expected.append(closing)
+        elif bracket != expected.pop():
+            raise ValueError(f"{_invalid_json} {position - 1}")
+    return position
+
+def _decode(data :Any, start :int, end :int) -> Any:
+    try:
+        return json.loads(data[start:end])
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{_invalid_json} {start + e.pos}") from None
+    except UnicodeDecodeError as e:
+        raise ValueError(f"{_invalid_json} {start + e.start}") from None
+
+def _decode_key(key :bytes, position :int) -> str:
+    # A key without escapes, between its quotes
+    try:
+        return str(key[1:-1], "utf-8")
+    except UnicodeDecodeError as e:
+        raise ValueError(f"{_invalid_json} {position + 1 + e.start}") from None
+
+class _LazyObject():
+    # A JSON object in data[start:end] whose members are found and decoded on
+    # first lookup. Offsets are those of data.
+
+    __slots__ = ("data", "end", "position", "done", "members", "values")
+
+    def __init__(self, data :Any, start :int, end :int):
+        match = _object_start_program.match(data, start, end)
+        if match is None:
+            raise ValueError(f"{_invalid_json} {start}")
+        self.data = data
+        self.end = end
+        self.position = match.end()
+        self.done = _object_end_program.match(data, self.position, end) is not None
+        self.members :list[tuple[str, int, int]] = []   # (key, value start, value end) scanned so far
+        self.values :dict[int, Any] = {}                # decoded values by member index
+
+    def _scan(self) -> bool:
+        # Locate the next member, False once there are none left
+        if self.done:
+            return False
+        data, end = self.data, self.end
+        match = _member_program.match(data, self.position, end)
+        if match is None:
+            raise ValueError(f"{_invalid_json} {self.position}")
+        key = match.group(1)
+        key = _decode(data, match.start(1), match.end(1)) if b"\\" in key else _decode_key(key, match.start(1))
+        value_start = match.end()
+        first = data[value_start:value_start+1]
+        if first == b"{" or first == b"[":
+            value_end = _skip_container(data, value_start, end)
+        else:
+            match = _scalar_program.match(data, value_start, end)
+            if match is None:
+                raise ValueError(f"{_invalid_json} {value_start}")
+            value_end = match.end()
+        self.members.append((key, value_start, value_end))
+        match = _separator_program.match(data, value_end, end)
+        if match is None:
+            raise ValueError(f"{_invalid_json} {value_end}")
+        self.done = match.group(1) == b"}"
+        self.position = match.end()
+        return True
+
+    def _value(self, index :int) -> Any:
+        value = self.values.get(index, self)
+        if value is self:
+            _, start, end = self.members[index]
+            value = self.values[index] = _decode(self.data, start, end)
+        return value
+
+    def get(self, name :str, default :Any = None) -> Any:
+        # Resolves name like compiler.lookup, an exact key first then any
+        # spelling, and None when missing, so lookup never needs items()
+        members = self.members
+        for index, member in enumerate(members):
+            if member[0] == name:
+                return self._value(index)
+        while self._scan():
+            if members[-1][0] == name:
+                return self._value(len(members) - 1)
+        folded = name.casefold()
+        for index, member in enumerate(members):
+            if member[0].casefold() == folded:
+                return self._value(index)
+        return None
+
+def compile_json(filter :Union[str, Node, Iterable[Token]]) -> Callable[..., bool]:
+    """Compile a filter into a predicate over one JSON object in a buffer.
+
+    The predicate takes bytes, a bytearray, an mmap or a str, and optionally
+    the start and end offsets of the object within it. A str is encoded to
+    UTF-8 first, offsets then count its bytes. Results are the same as
+    compile_filter on the decoded object.
+    """
+    match = compile_filter(filter)
+
+    def match_json(data :Any, start :int = 0, end :Optional[int] = None) -> bool:
+        if type(data) is str:
+            data = data.encode("utf-8")
+        size = len(data)
+        end = size if end is None else min(end, size)
+        return match(_LazyObject(data, start, end))
+    return match_json
+
+def filter_json_lines(filter :Union[str, Node, Iterable[Token]], data :Any) -> Iterator[bytes]:
+    """Yield the lines of a JSON Lines buffer whose object matches filter."""
+    match = compile_json(filter)
+    position, size = 0, len(data)
+    while position < size:
+        end = data.find(b"\n", position)
+        if end == -1:
+            end = size
+        if not _blank_program.fullmatch(data, position, end) and match(data, position, end):
+            yield data[position:end]
+        position = end + 1
@@ -0,0 +1,22 @@
+import re
+
+class LazyProgram():
+    """A regular expression compiled the first time one of its methods is used.
+
+    The methods of the compiled pattern are then stored on the instance, so
+    later calls cost the same as on the pattern itself.
+    """
+
+    def __init__(self, pattern :str, flags :int = 0):
+        self._pattern = pattern
+        self._flags = flags
+
+    def __getattr__(self, name :str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        program = re.compile(self._pattern, self._flags)
+        for method in ("match", "fullmatch", "search", "finditer", "findall", "sub", "split"):
+            setattr(self, method, getattr(program, method))
+        self.pattern = program.pattern
+        self.groupindex = program.groupindex
+        return getattr(program, name)
@@ -1,6 +1,7 @@
 import re
 from enum import Enum
 from dataclasses import dataclass
+from .lazy import LazyProgram
 from .operators import (
     _present_op, _not_op, _logic_ops, _comparison_ops, 
     _precedence_open_lit, _precedence_close_lit, 
@@ -12,12 +13,38 @@ from .err_strings import (
     _unexpected_end_of_input,
     _unterminated_string,
     _unexpected_space,
-    _missing_space
+    _missing_space,
+    _missing_leading_str
 )
 
-digit_program = re.compile(r"\d")
-alpha_program = re.compile(r"[a-zA-Z]")
-namechar_program = re.compile(r"[a-zA-Z0-9_\-]")
+digit_program = LazyProgram(r"\d")
+alpha_program = LazyProgram(r"[a-zA-Z]")
+namechar_program = LazyProgram(r"[a-zA-Z0-9_\-]")
+
+def _alternation(ops):
+    return "|".join(re.escape(op) for op in ops)
+
+# Tokens in the Filter state end on a delimiter, an attribute filter open or the
+# end of input. Words followed by anything else are left to the character engine.
+filter_program = LazyProgram(
+    r" *(?:"
+    rf"(?:(?P<cmp>{_alternation(_comparison_ops)})"
+    rf"|(?P<logic>{_alternation(_logic_ops)})"
+    rf"|(?P<present>{re.escape(_present_op)})"
+    rf"|(?P<not>{re.escape(_not_op)})"
+    r"|(?P<attr>[^ \[\]()]+))(?=[ \[\])]|\Z)"
+    r"|(?P<punct>[\[\]()])"
+    r"|(?P<end>\Z))"
+)
+value_program = LazyProgram(
+    r"\s*(?:"
+    r'(?P<string>"(?:[^"]|(?<=\\)")*(?<!\\)")'
+    r"|(?P<number>\d+)(?=[ )\]]|\Z)"
+    r"|(?P<true>true)(?=[ )\]]|\Z)"
+    r"|(?P<false>false)(?=[ )\]]|\Z)"
+    r"|(?P<null>null)(?=[ )\]]|\Z)"
+    r"|(?P<end>\Z))"
+)
 
 def isspace(string):
     # In https://datatracker.ietf.org/doc/html/rfc5234
@@ -27,7 +54,12 @@ def isspace(string):
         return ValueError("Expecting single character")
     return string == " "
 
-@dataclass
+def isdelimiter(string):
+    # Characters that may directly follow an attribute path, operator or
+    # comparison value
+    return string == " " or string == _precedence_close_lit or string == _attribute_filter_close_lit
+
+@dataclass(frozen=True)
 class Token():
     value :str
     position: int
@@ -77,6 +109,29 @@ class PresenceOperatorToken(Token):
 class NotOperatorToken(Token):
     pass
 
+_filter_token_classes = {
+    "cmp": ComparisonOperatorToken,
+    "logic": LogicOperatorToken,
+    "present": PresenceOperatorToken,
+    "not": NotOperatorToken,
+    "attr": Token,
+}
+
+_punct_token_classes = {
+    _attribute_filter_open_lit: ComplexFilterGroupStartToken,
+    _attribute_filter_close_lit: ComplexFilterGroupEndToken,
+    _precedence_open_lit: PrecedenceGroupStartToken,
+    _precedence_close_lit: PrecedenceGroupEndToken,
+}
+
+_value_token_classes = {
+    "string": StringLiteralToken,
+    "number": NumericLiteralToken,
+    "true": TrueLiteralToken,
+    "false": FalseLiteralToken,
+    "null": NullLiteralToken,
+}
+
 class Lexer():
     leading_str = "filter="
     
@@ -89,15 +144,22 @@ class Lexer():
         FalseLiteral = 5
         NullLiteral = 6
 
-    def __init__(self, filter_str :str):
+    class Engine(Enum):
+        Character = 0
+        Regex = 1
+
+    def __init__(self, filter_str :str, engine :"Lexer.Engine" = Engine.Character):
         self._position = -1
+        self._engine :Lexer.Engine = engine
         if not filter_str:
             raise ValueError("Filter string cannot be emtpy")
         if not filter_str.startswith(Lexer.leading_str):
-            raise ValueError(f"Invalid SCIM filter string. Expecting 'filter=' at position {self._position}")
+            raise ValueError(f"{_missing_leading_str} {self._position}")
         else:
             self._filter_str :str = filter_str
             self._position :int = len(Lexer.leading_str)-1
+            # Index of the first filter character, where "(" needs no leading space
+            self._filter_start :int = len(Lexer.leading_str)
             self._state :Lexer.State = Lexer.State.Filter
     
     def __iter__(self):
@@ -117,6 +179,70 @@ class Lexer():
         return False
 
     def next_token(self):
+        if self._engine is Lexer.Engine.Regex:
+            return self._next_token_regex()
+        return self._next_token_character()
+
+    def _next_token_regex(self):
+        span = self._scan_regex()
+        if type(span) is not tuple:
+            return span
+        return self.emit_token(*span)
+
+    def _scan_regex(self):
+        # Matches a whole token per step and returns (class, start, end) without
+        # building the token. Only well-formed tokens are taken on the fast path;
+        # anything unusual is handed to the character engine, whose token is
+        # returned as is, so both engines produce the same tokens, positions and
+        # errors.
+        filter_str = self._filter_str
+        filter_len = len(filter_str)
+        if self._state == Lexer.State.Filter:
+            match = filter_program.match(filter_str, self._position+1)
+            if match is None:
+                return self._next_token_character()
+            group = match.lastgroup
+            if group == "end":
+                self._position = filter_len-1
+                raise StopIteration
+            start_pos = match.start(group)
+            end_pos = match.end(group)-1
+            if group == "punct":
+                current_character = filter_str[start_pos]
+                previous_character = filter_str[start_pos-1]
+                next_character = filter_str[start_pos+1] if start_pos < filter_len-1 else None
+                if current_character == _attribute_filter_open_lit:
+                    ok = next_character != " " and previous_character != " "
+                elif current_character == _precedence_open_lit:
+                    ok = next_character != " " and (
+                        previous_character in (" ", _precedence_open_lit, _attribute_filter_open_lit)
+                        or start_pos == self._filter_start
+                    )
+                else:
+                    ok = previous_character != " " and (next_character is None or isdelimiter(next_character))
+                if not ok:
+                    return self._next_token_character()
+                cls = _punct_token_classes[current_character]
+            else:
+                cls = _filter_token_classes[group]
+                if cls is ComparisonOperatorToken:
+                    self._state = Lexer.State.ComparisonValue
+        else:
+            match = value_program.match(filter_str, self._position+1)
+            if match is None:
+                return self._next_token_character()
+            group = match.lastgroup
+            if group == "end":
+                self._position = filter_len-1
+                raise StopIteration
+            start_pos = match.start(group)
+            end_pos = match.end(group)-1
+            cls = _value_token_classes[group]
+            self._state = Lexer.State.Filter
+        self._position = end_pos
+        return cls, start_pos, end_pos
+
+    def _next_token_character(self):
         token_start_position = None
         filter_len = len(self._filter_str)
         token = None
@@ -148,7 +274,7 @@ class Lexer():
                         break
                     ValueError(f"Unexpected attribute group open at positon: {self._position}")
                 elif current_character == _attribute_filter_close_lit:
-                    if next_character and not isspace(next_character):
+                    if next_character and not isdelimiter(next_character):
                         raise ValueError(f"{_missing_space} {self._position}")
                     if previous_character and isspace(previous_character):
                         raise ValueError(f"{_unexpected_space} {self._position}")
@@ -159,22 +285,22 @@ class Lexer():
                 elif current_character == _precedence_open_lit:
                     if next_character and isspace(next_character):
                         raise ValueError(f"{_unexpected_space} {self._position}")
-                    if previous_character and not isspace(previous_character):
+                    if (
+                        self._position != self._filter_start
+                        and previous_character not in (_precedence_open_lit, _attribute_filter_open_lit)
+                        and not isspace(previous_character)
+                    ):
                         raise ValueError(f"{_missing_space} {self._position}")
-                    if token_start_position == self._position and (isspace(previous_character) or eof):
-                        token = self.emit_token(PrecedenceGroupStartToken, token_start_position, self._position)
-                        break
-                    ValueError(f"Unexpected logic group open at positon: {self._position}")
+                    token = self.emit_token(PrecedenceGroupStartToken, token_start_position, self._position)
+                    break
                 elif current_character == _precedence_close_lit:
-                    if token_start_position == self._position and previous_character and isspace(previous_character):
+                    if previous_character and isspace(previous_character):
                         raise ValueError(f"{_unexpected_space} {self._position}")
-                    if token_start_position == self._position and next_character and not isspace(next_character):
+                    if next_character and not isdelimiter(next_character):
                         raise ValueError(f"{_missing_space} {self._position}")
-                    if token_start_position == self._position and (isspace(previous_character) or eof):
-                        token = self.emit_token(PrecedenceGroupEndToken, token_start_position, self._position)
-                        break
-                    raise ValueError(f"Unexpected logic group open at positon: {self._position}")
-                elif (next_character and (isspace(next_character) or next_character == _attribute_filter_open_lit)) or eof:
+                    token = self.emit_token(PrecedenceGroupEndToken, token_start_position, self._position)
+                    break
+                elif (next_character and (isdelimiter(next_character) or next_character == _attribute_filter_open_lit)) or eof:
                     token :Token = self.emit_token(Token, token_start_position, self._position)
                     if token.value in _comparison_ops:
                         token = ComparisonOperatorToken(value=token.value, position=token.position)
@@ -194,6 +320,10 @@ class Lexer():
                     token_start_position = self._position
                 
                 if digit_program.fullmatch(current_character) and token_start_position == self._position:
+                    if eof or isdelimiter(next_character):
+                        self._state = Lexer.State.Filter
+                        token = self.emit_token(NumericLiteralToken, token_start_position, self._position)
+                        break
                     self._state = Lexer.State.NumericLiteral
                 elif current_character == "t" and token_start_position == self._position: 
                     self._state = Lexer.State.TrueLiteral
@@ -206,12 +336,12 @@ class Lexer():
                 else:
                     raise ValueError(f"{_unexpected_character} {self._position}")
             elif self._state == Lexer.State.NumericLiteral:
-                if eof or (next_character and isspace(next_character)):
+                if not digit_program.fullmatch(current_character):
+                    raise ValueError(f"{_invalid_numeric_literal} {self._position}")
+                if eof or isdelimiter(next_character):
                     self._state = Lexer.State.Filter
                     token = self.emit_token(NumericLiteralToken, token_start_position, self._position)
                     break
-                if not digit_program.fullmatch(current_character):
-                    raise ValueError(f"{_invalid_numeric_literal} {self._position}")
             elif self._state == Lexer.State.TrueLiteral:
                 # We already have a "t"
                 if filter_len-token_start_position < 4:
@@ -220,7 +350,7 @@ class Lexer():
                 for i, c in enumerate(s):
                     if self._filter_str[self._position+i] != c:
                         raise ValueError(f"{_unexpected_character} {self._position+1}")
-                if self._position+len(s) < filter_len and not isspace(self._filter_str[self._position+len(s)]):
+                if self._position+len(s) < filter_len and not isdelimiter(self._filter_str[self._position+len(s)]):
                     raise ValueError(f"{_unexpected_character} {self._position+len(s)}")
                 self._state = Lexer.State.Filter
                 self._position = self._position+len(s)-1
@@ -234,7 +364,7 @@ class Lexer():
                 for i, c in enumerate(s):
                     if self._filter_str[self._position+i] != c:
                         raise ValueError(f"{_unexpected_character} {self._position+1}")
-                if self._position+len(s) < filter_len and not isspace(self._filter_str[self._position+len(s)]):
+                if self._position+len(s) < filter_len and not isdelimiter(self._filter_str[self._position+len(s)]):
                     raise ValueError(f"{_unexpected_character} {self._position+len(s)}")
                 self._state = Lexer.State.Filter
                 self._position = self._position+len(s)-1
@@ -248,7 +378,7 @@ class Lexer():
                 for i, c in enumerate(s):
                     if self._filter_str[self._position+i] != c:
                         raise ValueError(f"{_unexpected_character} {self._position+1}")
-                if self._position+len(s) < filter_len and not isspace(self._filter_str[self._position+len(s)]):
+                if self._position+len(s) < filter_len and not isdelimiter(self._filter_str[self._position+len(s)]):
                     raise ValueError(f"{_unexpected_character} {self._position+len(s)}")
                 self._state = Lexer.State.Filter
                 self._position = self._position+len(s)-1
@@ -0,0 +1,72 @@
+import time
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+from .lexer import (
+    Lexer, Token, ComparisonValueToken, StringLiteralToken,
+    PrecedenceGroupStartToken, PrecedenceGroupEndToken,
+    ComplexFilterGroupStartToken, ComplexFilterGroupEndToken
+)
+from .parser import Parser, Node
+from .err_strings import (
+    _input_too_long,
+    _too_many_tokens,
+    _nesting_too_deep,
+    _literal_too_long,
+    _time_budget_exceeded
+)
+
+@dataclass(frozen=True)
+class Limits():
+    """Bounds on the work done for a single filter, None disables a limit.
+
+    max_length counts the characters of the whole filter string, max_depth
+    nested "(" and "[" groups, max_literal_length the characters of a string
+    (without quotes) or number literal and max_seconds the time spent lexing
+    and parsing.
+    """
+    max_length: Optional[int] = 65536
+    max_tokens: Optional[int] = 10000
+    max_depth: Optional[int] = 64
+    max_literal_length: Optional[int] = 8192
+    max_seconds: Optional[float] = None
+
+def limit_tokens(filter_str :str, tokens :Iterable[Token], limits :Limits) -> Iterator[Token]:
+    """Pass tokens through, raising a ValueError as soon as a limit is exceeded.
+
+    The length of filter_str is checked before the first token is read, the
+    other limits as tokens arrive. A Parser reading from the result stops at
+    the first token over a limit.
+    """
+    if limits.max_length is not None and len(filter_str) > limits.max_length:
+        raise ValueError(f"{_input_too_long} {limits.max_length}")
+    max_tokens = limits.max_tokens
+    max_depth = limits.max_depth
+    max_literal_length = limits.max_literal_length
+    deadline = None if limits.max_seconds is None else time.perf_counter() + limits.max_seconds
+    count = 0
+    depth = 0
+    for token in tokens:
+        count += 1
+        if max_tokens is not None and count > max_tokens:
+            raise ValueError(f"{_too_many_tokens} {token.position}")
+        cls = type(token)
+        if cls is PrecedenceGroupStartToken or cls is ComplexFilterGroupStartToken:
+            depth += 1
+            if max_depth is not None and depth > max_depth:
+                raise ValueError(f"{_nesting_too_deep} {token.position}")
+        elif cls is PrecedenceGroupEndToken or cls is ComplexFilterGroupEndToken:
+            depth -= 1
+        elif max_literal_length is not None and isinstance(token, ComparisonValueToken):
+            length = len(token.value) - 2 if cls is StringLiteralToken else len(token.value)
+            if length > max_literal_length:
+                raise ValueError(f"{_literal_too_long} {token.position}")
+        if deadline is not None and time.perf_counter() > deadline:
+            raise ValueError(f"{_time_budget_exceeded} {token.position}")
+        yield token
+
+def tokenize(filter_str :str, limits :Limits = Limits()) -> tuple[Token, ...]:
+    return tuple(limit_tokens(filter_str, Lexer(filter_str, Lexer.Engine.Regex), limits))
+
+def parse(filter_str :str, limits :Limits = Limits()) -> Node:
+    """Lex and parse filter_str, failing at the first token over a limit."""
+    return Parser(limit_tokens(filter_str, Lexer(filter_str, Lexer.Engine.Regex), limits)).parse()
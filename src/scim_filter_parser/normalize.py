@@ -0,0 +1,94 @@
+import hashlib
+from typing import Iterable, Optional, Union
+from .lexer import Lexer, Token, ComparisonValueToken, NumericLiteralToken
+from .cache import parse
+from .parser import Parser, Node, Present, AttrExp, LogExp, Not, ValuePath, In, Constant, expand_in
+from .operators import _and_op, _or_op, _not_op, _present_op
+
+def _as_node(filter :Union[str, Node, Iterable[Token]]) -> Node:
+    if isinstance(filter, str):
+        return parse(filter)
+    if isinstance(filter, Node):
+        return filter
+    return Parser(filter).parse()
+
+def _attr_path(attr_path :str, default_schema :Optional[str]) -> str:
+    attr_path = attr_path.lower()
+    if default_schema and attr_path.startswith(default_schema) and attr_path[len(default_schema):len(default_schema)+1] == ":":
+        attr_path = attr_path[len(default_schema)+1:]
+    return attr_path
+
+def _value(token :ComparisonValueToken) -> ComparisonValueToken:
+    value = token.value
+    if type(token) is NumericLiteralToken:
+        value = str(int(value))
+    return type(token)(value, 0)
+
+def _normalize(node :Node, default_schema :Optional[str]) -> Node:
+    cls = type(node)
+    if cls is Present:
+        return Present(_attr_path(node.attr_path, default_schema), 0)
+    if cls is AttrExp:
+        return AttrExp(_attr_path(node.attr_path, default_schema), node.op.lower(), _value(node.value), 0)
+    if cls is Not:
+        operand = node.operand
+        if type(operand) is Not:
+            return _normalize(operand.operand, default_schema)
+        return Not(_normalize(operand, default_schema), 0)
+    if cls is ValuePath:
+        return ValuePath(_attr_path(node.attr_path, default_schema), _normalize(node.filter, default_schema), 0)
+    if cls is In:
+        return _normalize(expand_in(node), default_schema)
+    if cls is Constant:
+        # No filter string always or never matches
+        raise TypeError(f"Cannot normalize {cls.__name__}")
+    op = node.op.lower()
+    operands = {}
+    for operand in node.operands:
+        operand = _normalize(operand, default_schema)
+        # a and (b and c) is a and b and c
+        nested = operand.operands if type(operand) is LogExp and operand.op == op else (operand,)
+        for nested_operand in nested:
+            operands.setdefault(_render(nested_operand), nested_operand)
+    if len(operands) == 1:
+        return next(iter(operands.values()))
+    return LogExp(op, tuple(operands[key] for key in sorted(operands)), 0)
+
+def _render(node :Node, parent_op :Optional[str] = None) -> str:
+    cls = type(node)
+    if cls is Present:
+        return f"{node.attr_path} {_present_op}"
+    if cls is AttrExp:
+        return f"{node.attr_path} {node.op} {node.value.value}"
+    if cls is Not:
+        return f"{_not_op} ({_render(node.operand)})"
+    if cls is ValuePath:
+        return f"{node.attr_path}[{_render(node.filter)}]"
+    rendered = f" {node.op} ".join(_render(operand, node.op) for operand in node.operands)
+    # Only an "or" inside an "and" needs the parentheses
+    if parent_op == _and_op and node.op == _or_op:
+        return f"({rendered})"
+    return rendered
+
+def normalize(filter :Union[str, Node, Iterable[Token]], default_schema :Optional[str] = None) -> Node:
+    """Rewrite a filter into a canonical AST.
+
+    Operators and attribute paths are lowercased, a URN prefix equal to
+    default_schema is dropped, nested and/or chains are flattened, their
+    operands deduplicated and sorted, and double negations removed. In nodes
+    of the optimizer become the "or" of their eq tests, a Constant raises a
+    TypeError. Positions are set to 0 so that equivalent filters give equal
+    trees.
+    """
+    if default_schema is not None:
+        default_schema = default_schema.lower()
+    return _normalize(_as_node(filter), default_schema)
+
+def canonical_string(filter :Union[str, Node, Iterable[Token]], default_schema :Optional[str] = None) -> str:
+    """The normalized filter as a filter string, which parses back to the same tree."""
+    return Lexer.leading_str + _render(normalize(filter, default_schema))
+
+def canonical_hash(filter :Union[str, Node, Iterable[Token]], default_schema :Optional[str] = None) -> int:
+    """A 64 bit hash of the canonical string, stable across processes."""
+    digest = hashlib.blake2b(canonical_string(filter, default_schema).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
@@ -0,0 +1,297 @@
+import math
+from dataclasses import dataclass, replace
+from typing import Iterable, Mapping, Optional, Union
+from .lexer import Token
+from .cache import parse
+from .parser import Parser, Node, Present, AttrExp, LogExp, Not, ValuePath, In, Constant
+from .compiler import literal_value, membership_key, compile_test
+from .operators import (
+    _and_op, _or_op, _equal_op, _not_equal_op, _contains_op, _starts_with_op, _ends_with_op,
+    _greater_than_op, _greater_than_or_equal_op, _less_than_op, _less_than_or_equal_op
+)
+
+@dataclass(frozen=True)
+class AttributeHint():
+    """What the optimizer may assume about an attribute.
+
+    selectivity is the fraction of resources matching an eq test on the
+    attribute, cost the relative cost of reading it. Only attributes declared
+    single_valued let eq tests on different values contradict each other.
+    """
+    selectivity: Optional[float] = None
+    cost: float = 1.0
+    single_valued: bool = False
+
+_default_hint = AttributeHint()
+
+# Rough guesses used where no hint is given
+_present_selectivity = 0.8
+_operator_selectivity = {
+    _equal_op: 0.1,
+    _not_equal_op: 0.9,
+    _contains_op: 0.2,
+    _starts_with_op: 0.2,
+    _ends_with_op: 0.2,
+    _greater_than_op: 0.33,
+    _greater_than_or_equal_op: 0.33,
+    _less_than_op: 0.33,
+    _less_than_or_equal_op: 0.33,
+}
+_operator_cost = {
+    _equal_op: 1.0,
+    _not_equal_op: 1.0,
+    _contains_op: 2.0,
+    _starts_with_op: 1.5,
+    _ends_with_op: 1.5,
+    _greater_than_op: 1.2,
+    _greater_than_or_equal_op: 1.2,
+    _less_than_op: 1.2,
+    _less_than_or_equal_op: 1.2,
+}
+# Value filters run once per value of a multi-valued attribute
+_value_path_cost = 3.0
+
+def _key(node :Node):
+    # Structural identity of a subexpression, operand order of and/or ignored
+    cls = type(node)
+    if cls is Present:
+        return (Present, node.attr_path)
+    if cls is AttrExp:
+        return (AttrExp, node.attr_path, node.op, type(node.value), literal_value(node.value))
+    if cls is In:
+        return (In, node.attr_path, frozenset((type(v), literal_value(v)) for v in node.values))
+    if cls is LogExp:
+        return (LogExp, node.op, frozenset(_key(operand) for operand in node.operands))
+    if cls is Not:
+        return (Not, _key(node.operand))
+    if cls is ValuePath:
+        return (ValuePath, node.attr_path, _key(node.filter))
+    return (Constant, node.value)
+
+def _complement_key(node :Node):
+    cls = type(node)
+    if cls is Not:
+        return _key(node.operand)
+    if cls is AttrExp and node.op == _equal_op:
+        return _key(replace(node, op=_not_equal_op))
+    if cls is AttrExp and node.op == _not_equal_op:
+        return _key(replace(node, op=_equal_op))
+    return None
+
+def _eq_values(node :Node) -> Optional[tuple]:
+    # The values of an eq test or In node, None for anything else
+    if type(node) is AttrExp and node.op == _equal_op:
+        return (node.value,)
+    if type(node) is In:
+        return node.values
+    return None
+
+def _implies_present(values :tuple) -> bool:
+    # eq matches a null or "" literal on absent attributes, any other only on present ones
+    for value in values:
+        literal = literal_value(value)
+        if literal is None or literal == "":
+            return False
+    return True
+
+class Optimizer():
+    """Rewrites a parsed filter into an equivalent one that is cheaper to evaluate.
+
+    Operands of and/or are ordered by estimated cost and selectivity, constant
+    subexpressions are folded, "or" chains of eq tests on one attribute become
+    an In node and operands common to every branch of an "or" are hoisted out
+    of it. The result is meant for compile_filter. Hints are keyed by attribute
+    path, case insensitive. Sub-attributes inside a value filter are looked up
+    as "emails[type]", so that a hint can describe a single email while
+    "emails.type" still stands for the types of all emails.
+    """
+
+    def __init__(self, hints :Optional[Mapping[str, AttributeHint]] = None):
+        self._hints = {path.casefold(): hint for path, hint in (hints or {}).items()}
+
+    def optimize(self, filter :Union[str, Node, Iterable[Token]]) -> Node:
+        if isinstance(filter, str):
+            node = parse(filter)
+        elif isinstance(filter, Node):
+            node = filter
+        else:
+            node = Parser(filter).parse()
+        return self._optimize(node, "")
+
+    def _hint(self, prefix :str, attr_path :str) -> AttributeHint:
+        # prefix is the attribute of the enclosing value filter, if any
+        if prefix:
+            attr_path = f"{prefix}[{attr_path}]"
+        return self._hints.get(attr_path.casefold(), _default_hint)
+
+    def _optimize(self, node :Node, prefix :str) -> Node:
+        cls = type(node)
+        if cls is AttrExp:
+            # Invalid comparisons must fail even if they are folded away
+            compile_test(node.op, literal_value(node.value), node.value.position)
+            return node
+        if cls is Not:
+            operand = self._optimize(node.operand, prefix)
+            if type(operand) is Constant:
+                return Constant(not operand.value, node.position)
+            if type(operand) is Not:
+                return operand.operand
+            return Not(operand, node.position)
+        if cls is ValuePath:
+            value_filter = self._optimize(node.filter, node.attr_path)
+            if type(value_filter) is Constant and not value_filter.value:
+                return value_filter
+            return ValuePath(node.attr_path, value_filter, node.position)
+        if cls is LogExp:
+            return self._log_exp(node.op, [self._optimize(operand, prefix) for operand in node.operands], node.position, prefix)
+        return node
+
+    def _log_exp(self, op :str, operands :list[Node], position :int, prefix :str) -> Node:
+        # The value that decides the result: true for "or", false for "and"
+        absorbing = op == _or_op
+        unique = {}
+        for operand in operands:
+            nested = operand.operands if type(operand) is LogExp and operand.op == op else (operand,)
+            for operand in nested:
+                if type(operand) is Constant:
+                    if operand.value is absorbing:
+                        return Constant(absorbing, position)
+                    continue
+                unique.setdefault(_key(operand), operand)
+        for operand in unique.values():
+            # x and not x, x or not x
+            if _complement_key(operand) in unique:
+                return Constant(absorbing, position)
+        operands = list(unique.values())
+        if op == _or_op:
+            operands = self._absorb_present(operands, False)
+            operands = self._merge_eq(operands)
+            hoisted = self._hoist(operands, position, prefix)
+            if hoisted is not None:
+                return hoisted
+        else:
+            if self._contradicts(operands, prefix):
+                return Constant(False, position)
+            operands = self._absorb_present(operands, True)
+        if not operands:
+            return Constant(not absorbing, position)
+        if len(operands) == 1:
+            return operands[0]
+        return LogExp(op, tuple(self._order(op, operands, prefix)), position)
+
+    def _absorb_present(self, operands :list[Node], drop_present :bool) -> list[Node]:
+        # When eq x implies x pr: "x pr and x eq v" is x eq v, "x pr or x eq v" is x pr
+        def implies_present(operand :Node) -> bool:
+            values = _eq_values(operand)
+            return values is not None and _implies_present(values)
+
+        if drop_present:
+            implied = {o.attr_path for o in operands if implies_present(o)}
+            return [o for o in operands if not (type(o) is Present and o.attr_path in implied)]
+        present = {o.attr_path for o in operands if type(o) is Present}
+        return [o for o in operands if not (implies_present(o) and o.attr_path in present)]
+
+    def _merge_eq(self, operands :list[Node]) -> list[Node]:
+        groups = {}
+        for operand in operands:
+            if _eq_values(operand) is not None:
+                groups.setdefault(operand.attr_path, []).append(operand)
+        merged = []
+        for operand in operands:
+            group = groups.get(operand.attr_path) if _eq_values(operand) is not None else None
+            if group is None or len(group) == 1:
+                merged.append(operand)
+            elif group[0] is operand:
+                values = {}
+                for member in group:
+                    for value in _eq_values(member):
+                        values.setdefault((type(value), literal_value(value)), value)
+                merged.append(In(operand.attr_path, tuple(values.values()), operand.position))
+        return merged
+
+    def _hoist(self, operands :list[Node], position :int, prefix :str) -> Optional[Node]:
+        # (c and a) or (c and b) is c and (a or b)
+        if len(operands) < 2:
+            return None
+        branches = []
+        for operand in operands:
+            conjuncts = operand.operands if type(operand) is LogExp and operand.op == _and_op else (operand,)
+            branches.append({_key(conjunct): conjunct for conjunct in conjuncts})
+        common = set(branches[0]).intersection(*branches[1:])
+        if not common:
+            return None
+        factors = [node for key, node in branches[0].items() if key in common]
+        rest = []
+        for branch in branches:
+            remaining = [node for key, node in branch.items() if key not in common]
+            if not remaining:
+                # c or (c and b) is c
+                return self._log_exp(_and_op, factors, position, prefix)
+            rest.append(remaining[0] if len(remaining) == 1 else LogExp(_and_op, tuple(remaining), remaining[0].position))
+        return self._log_exp(_and_op, factors + [self._log_exp(_or_op, rest, position, prefix)], position, prefix)
+
+    def _contradicts(self, operands :list[Node], prefix :str) -> bool:
+        # A single valued attribute cannot equal two different values
+        allowed = {}
+        for operand in operands:
+            values = _eq_values(operand)
+            if values is None or not self._hint(prefix, operand.attr_path).single_valued:
+                continue
+            keys = {membership_key(literal_value(value)) for value in values}
+            if operand.attr_path in allowed:
+                keys &= allowed[operand.attr_path]
+            if not keys:
+                return True
+            allowed[operand.attr_path] = keys
+        return False
+
+    def _order(self, op :str, operands :list[Node], prefix :str) -> list[Node]:
+        # Cheapest test most likely to decide the result first
+        def rank(operand :Node) -> float:
+            selectivity, cost = self.estimate(operand, prefix)
+            decides = selectivity if op == _or_op else 1 - selectivity
+            return cost / decides if decides > 0 else math.inf
+        return sorted(operands, key=rank)
+
+    def estimate(self, node :Node, prefix :str = "") -> tuple[float, float]:
+        """Return (selectivity, cost) estimated for evaluating node."""
+        cls = type(node)
+        if cls is AttrExp or cls is In or cls is Present:
+            hint = self._hint(prefix, node.attr_path)
+            if cls is Present:
+                return _present_selectivity, hint.cost
+            eq_selectivity = _operator_selectivity[_equal_op] if hint.selectivity is None else hint.selectivity
+            if cls is In:
+                return min(1.0, eq_selectivity * len(node.values)), hint.cost
+            if node.op == _equal_op:
+                selectivity = eq_selectivity
+            elif node.op == _not_equal_op:
+                selectivity = 1 - eq_selectivity
+            else:
+                selectivity = _operator_selectivity[node.op]
+            return selectivity, _operator_cost[node.op] * hint.cost
+        if cls is Not:
+            selectivity, cost = self.estimate(node.operand, prefix)
+            return 1 - selectivity, cost
+        if cls is ValuePath:
+            selectivity, cost = self.estimate(node.filter, node.attr_path)
+            return selectivity, cost * _value_path_cost
+        if cls is LogExp:
+            # Operands are evaluated in order until one decides the result
+            reached, cost, selectivity = 1.0, 0.0, 1.0
+            for operand in node.operands:
+                operand_selectivity, operand_cost = self.estimate(operand, prefix)
+                cost += reached * operand_cost
+                if node.op == _and_op:
+                    reached *= operand_selectivity
+                else:
+                    reached *= 1 - operand_selectivity
+            selectivity = reached if node.op == _and_op else 1 - reached
+            return selectivity, cost
+        return (1.0 if node.value else 0.0), 0.0
+
+def optimize(
+    filter :Union[str, Node, Iterable[Token]], hints :Optional[Mapping[str, AttributeHint]] = None
+) -> Node:
+    """Optimize a filter with Optimizer(hints)."""
+    return Optimizer(hints).optimize(filter)
@@ -0,0 +1,175 @@
+from dataclasses import dataclass
+from typing import Iterable, Optional
+from .lazy import LazyProgram
+from .lexer import (
+    Token, ComparisonValueToken,
+    PrecedenceGroupStartToken, PrecedenceGroupEndToken,
+    ComplexFilterGroupStartToken, ComplexFilterGroupEndToken,
+    LogicOperatorToken, ComparisonOperatorToken, PresenceOperatorToken, NotOperatorToken
+)
+from .operators import _and_op, _or_op, _equal_op
+from .err_strings import (
+    _unexpected_end_of_input,
+    _unexpected_token,
+    _invalid_attribute_path,
+    _nesting_too_deep
+)
+
+# attrPath = [URI ":"] ATTRNAME *1subAttr
+# The URI is not validated beyond ending in a colon
+attr_path_program = LazyProgram(r"(?:.+:)?[a-zA-Z][a-zA-Z0-9_\-]*(?:\.[a-zA-Z][a-zA-Z0-9_\-]*)?")
+
+def split_attr_path(attr_path :str) -> tuple[Optional[str], str, Optional[str]]:
+    # Returns (URI, ATTRNAME, subAttr) for an attribute path
+    uri = None
+    colon = attr_path.rfind(":")
+    if colon != -1:
+        uri = attr_path[:colon]
+        attr_path = attr_path[colon+1:]
+    name, _, sub_attr = attr_path.partition(".")
+    return uri, name, sub_attr or None
+
+@dataclass(frozen=True, slots=True)
+class Node():
+    pass
+
+@dataclass(frozen=True, slots=True)
+class Present(Node):
+    attr_path: str
+    position: int
+
+@dataclass(frozen=True, slots=True)
+class AttrExp(Node):
+    attr_path: str
+    op: str
+    value: ComparisonValueToken
+    position: int
+
+@dataclass(frozen=True, slots=True)
+class LogExp(Node):
+    # Chains of the same operator are kept flat: a or b or c has three operands
+    op: str
+    operands: tuple[Node, ...]
+    position: int
+
+@dataclass(frozen=True, slots=True)
+class Not(Node):
+    operand: Node
+    position: int
+
+@dataclass(frozen=True, slots=True)
+class ValuePath(Node):
+    attr_path: str
+    filter: Node
+    position: int
+
+@dataclass(frozen=True, slots=True)
+class In(Node):
+    # attr_path eq any of values, only produced by the optimizer
+    attr_path: str
+    values: tuple[ComparisonValueToken, ...]
+    position: int
+
+def expand_in(node :In) -> Node:
+    # The "or" of eq tests an In node stands for
+    operands = tuple(AttrExp(node.attr_path, _equal_op, value, node.position) for value in node.values)
+    return operands[0] if len(operands) == 1 else LogExp(_or_op, operands, node.position)
+
+@dataclass(frozen=True, slots=True)
+class Constant(Node):
+    # A subexpression that always or never matches, only produced by the optimizer
+    value: bool
+    position: int
+
+class Parser():
+    """Recursive descent parser over a token stream, e.g. a Lexer.
+
+    "and" binds tighter than "or". Every token is looked at once, with a single
+    token of lookahead. Each nested "(" or "[" group takes a few Python frames,
+    groups nested deeper than max_depth are rejected at the opening token
+    rather than running into a RecursionError.
+    """
+
+    max_depth = 200
+
+    def __init__(self, tokens :Iterable[Token]):
+        self._tokens = iter(tokens)
+        self._token :Optional[Token] = next(self._tokens, None)
+        self._depth = 0
+
+    def parse(self) -> Node:
+        node = self._or_exp(False)
+        if self._token is not None:
+            raise ValueError(f"{_unexpected_token} {self._token.position}")
+        return node
+
+    def _advance(self) -> Token:
+        token = self._token
+        if token is None:
+            raise ValueError(_unexpected_end_of_input)
+        self._token = next(self._tokens, None)
+        return token
+
+    def _expect(self, cls :type) -> Token:
+        token = self._advance()
+        if type(token) is not cls:
+            raise ValueError(f"{_unexpected_token} {token.position}")
+        return token
+
+    def _group(self, opening :Token, in_value_path :bool, end :type) -> Node:
+        self._depth += 1
+        if self._depth > self.max_depth:
+            raise ValueError(f"{_nesting_too_deep} {opening.position}")
+        node = self._or_exp(in_value_path)
+        self._expect(end)
+        self._depth -= 1
+        return node
+
+    def _or_exp(self, in_value_path :bool) -> Node:
+        node = self._and_exp(in_value_path)
+        token = self._token
+        if type(token) is not LogicOperatorToken or token.value != _or_op:
+            return node
+        operands = [node]
+        while type(token) is LogicOperatorToken and token.value == _or_op:
+            self._advance()
+            operands.append(self._and_exp(in_value_path))
+            token = self._token
+        return LogExp(_or_op, tuple(operands), operands[0].position)
+
+    def _and_exp(self, in_value_path :bool) -> Node:
+        node = self._unary_exp(in_value_path)
+        token = self._token
+        if type(token) is not LogicOperatorToken or token.value != _and_op:
+            return node
+        operands = [node]
+        while type(token) is LogicOperatorToken and token.value == _and_op:
+            self._advance()
+            operands.append(self._unary_exp(in_value_path))
+            token = self._token
+        return LogExp(_and_op, tuple(operands), operands[0].position)
+
+    def _unary_exp(self, in_value_path :bool) -> Node:
+        token = self._advance()
+        cls = type(token)
+        if cls is NotOperatorToken:
+            opening = self._expect(PrecedenceGroupStartToken)
+            return Not(self._group(opening, in_value_path, PrecedenceGroupEndToken), token.position)
+        if cls is PrecedenceGroupStartToken:
+            return self._group(token, in_value_path, PrecedenceGroupEndToken)
+        if cls is not Token:
+            raise ValueError(f"{_unexpected_token} {token.position}")
+        if not attr_path_program.fullmatch(token.value):
+            raise ValueError(f"{_invalid_attribute_path} {token.position}")
+        operator = self._advance()
+        cls = type(operator)
+        if cls is PresenceOperatorToken:
+            return Present(token.value, token.position)
+        if cls is ComparisonOperatorToken:
+            value = self._advance()
+            if not isinstance(value, ComparisonValueToken):
+                raise ValueError(f"{_unexpected_token} {value.position}")
+            return AttrExp(token.value, operator.value, value, token.position)
+        if cls is ComplexFilterGroupStartToken and not in_value_path:
+            return ValuePath(token.value, self._group(operator, True, ComplexFilterGroupEndToken), token.position)
+        raise ValueError(f"{_unexpected_token} {operator.position}")
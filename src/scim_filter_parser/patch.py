@@ -0,0 +1,349 @@
+"""PATCH paths and operations as in RFC 7644 section 3.5.2.
+
+    path = compile_path('emails[type eq "work"].value')
+    user = apply_patch(user, [
+        {"op": "replace", "path": 'emails[type eq "work"].value', "value": "bjensen@example.com"},
+        {"op": "remove", "path": 'members[value eq "2819c223"]'},
+    ])
+
+A path is an attrPath, or a valuePath selecting values of a multi-valued
+attribute with an optional subAttr, and compiles once into a PatchPath.
+
+apply_patch() applies consecutive operations with value filters on the same
+attribute together, in one pass over its values. Each value is still put
+through the operations in order, but those whose filter is an eq test, such as
+members[value eq "..."], are found by hashing the value's sub-attributes
+instead of trying every operation, so a batch of them costs about as much as
+the attribute has values plus the batch has operations.
+"""
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Any, Iterable, Optional
+from .lexer import Lexer
+from .lazy import LazyProgram
+from .cache import parse
+from .parser import AttrExp, ValuePath, attr_path_program, split_attr_path
+from .compiler import compile_filter, literal_value, lookup, membership_key, membership_keys
+from .operators import _equal_op
+from .err_strings import (
+    _invalid_attribute_path, _invalid_patch_operation, _patch_no_target, error_position
+)
+
+# Attributes of the resource's core schema live on the resource itself
+_core_schema_prefix = "urn:ietf:params:scim:schemas:core:"
+
+_add_op = "add"
+_replace_op = "replace"
+_remove_op = "remove"
+
+# The value filter up to its closing bracket, skipping string literals
+_value_filter_program = LazyProgram(r'\[(?:[^"\]]|"(?:[^"\\]|\\.)*")*\]')
+_sub_attr_program = LazyProgram(r"\.([a-zA-Z][a-zA-Z0-9_\-]*)")
+
+class PatchPath():
+    """A compiled PATCH path.
+
+    attr_path is the attribute targeted, value_filter the filter of a valuePath
+    as a Node and sub_attr the sub-attribute following it, both None for a
+    plain attrPath.
+    """
+    __slots__ = ("path", "attr_path", "value_filter", "sub_attr", "_uri", "_name", "_attr_sub", "_match", "_anchor")
+
+    def __init__(self, path :str):
+        self.path = path
+        self.value_filter = None
+        self.sub_attr = None
+        self._match = None
+        self._anchor = None
+        bracket = path.find("[")
+        if bracket == -1:
+            if not attr_path_program.fullmatch(path):
+                raise ValueError(f"{_invalid_attribute_path} 0")
+            self.attr_path = path
+        else:
+            self.attr_path = path[:bracket]
+            if not attr_path_program.fullmatch(self.attr_path) or "." in self.attr_path.rpartition(":")[2]:
+                raise ValueError(f"{_invalid_attribute_path} 0")
+            match = _value_filter_program.match(path, bracket)
+            if match is None:
+                raise ValueError(f"{_invalid_attribute_path} {bracket}")
+            node = _parse_value_path(path[:match.end()])
+            rest = path[match.end():]
+            if rest:
+                sub_attr = _sub_attr_program.fullmatch(rest)
+                if sub_attr is None:
+                    raise ValueError(f"{_invalid_attribute_path} {match.end()}")
+                self.sub_attr = sub_attr.group(1)
+            self.value_filter = node.filter
+            self._match = compile_filter(node.filter)
+            self._anchor = _anchor(node.filter)
+        self._uri, self._name, self._attr_sub = split_attr_path(self.attr_path)
+
+    def __repr__(self) -> str:
+        return f"PatchPath({self.path!r})"
+
+    @property
+    def _target(self) -> tuple:
+        # Operations on the same attribute, whatever its spelling, share a target
+        uri = None if self._uri is None else self._uri.casefold()
+        return uri, self._name.casefold()
+
+    def matches(self, value :Any) -> bool:
+        """Whether the value filter selects value, one value of the attribute."""
+        if self._match is None:
+            return True
+        return type(value) is dict and self._match(value)
+
+def _parse_value_path(text :str) -> ValuePath:
+    # Parse attr[valFilter] with the filter grammar, with positions of errors in text
+    try:
+        node = parse(Lexer.leading_str + text)
+    except ValueError as e:
+        position = error_position(str(e))
+        if position is None:
+            raise
+        message = str(e)[:-len(str(position))]
+        raise ValueError(f"{message}{max(position - len(Lexer.leading_str), 0)}") from None
+    if type(node) is not ValuePath:
+        raise ValueError(f"{_invalid_attribute_path} 0")
+    return node
+
+def _anchor(node) -> Optional[tuple]:
+    # (sub-attribute, key) of a value filter that is a single eq test
+    if type(node) is not AttrExp or node.op != _equal_op or not attr_path_program.fullmatch(node.attr_path):
+        return None
+    if ":" in node.attr_path or "." in node.attr_path:
+        return None
+    key = membership_key(literal_value(node.value))
+    return None if key is None else (node.attr_path.casefold(), key)
+
+@lru_cache(maxsize=1024)
+def compile_path(path :str) -> PatchPath:
+    """Compile a PATCH path, such as 'emails[type eq "work"].value'."""
+    return PatchPath(path)
+
+def _find_key(container :dict, name :str) -> Optional[str]:
+    # The key naming attribute name in container, in any case
+    if name in container:
+        return name
+    folded = name.casefold()
+    for key in container:
+        if type(key) is str and key.casefold() == folded:
+            return key
+    return None
+
+def _container(resource :dict, uri :Optional[str], create :bool) -> Optional[dict]:
+    # The dict holding the attributes of uri, copied into resource so it can be
+    # modified. As in compile_getter, a core schema URN without an object of its
+    # own names attributes of the resource itself.
+    if uri is None:
+        return resource
+    key = _find_key(resource, uri)
+    extension = None if key is None else resource[key]
+    if type(extension) is dict:
+        extension = dict(extension)
+    elif uri.casefold().startswith(_core_schema_prefix):
+        return resource
+    elif create:
+        extension = {}
+    else:
+        return None
+    resource[key or uri] = extension
+    return extension
+
+def _identity(value :Any) -> Any:
+    # Values added to a multi-valued attribute are skipped when one with the same identity is there
+    if type(value) is dict:
+        return membership_key(value["value"]) if "value" in value else None
+    return membership_key(value)
+
+def _extend(values :list, added :Any) -> list:
+    if type(added) is not list:
+        added = [added]
+    seen = {_identity(value) for value in values}
+    seen.discard(None)
+    values = list(values)
+    for value in added:
+        identity = _identity(value)
+        if identity is None or identity not in seen:
+            values.append(value)
+            if identity is not None:
+                seen.add(identity)
+    return values
+
+def _merge(current :dict, value :dict) -> dict:
+    merged = dict(current)
+    for name, sub_value in value.items():
+        merged[_find_key(merged, name) or name] = sub_value
+    return merged
+
+def _assign(container :dict, name :str, value :Any, op :str):
+    # add or replace attribute name of container
+    key = _find_key(container, name) or name
+    current = container.get(key)
+    if op == _add_op and type(current) is list:
+        container[key] = _extend(current, value)
+    elif type(current) is dict and type(value) is dict:
+        # Sub-attributes not given in value are kept
+        container[key] = _merge(current, value)
+    else:
+        container[key] = value
+
+def _apply_plain(resource :dict, index :int, op :str, path :Optional[PatchPath], value :Any):
+    if path is None:
+        # The value holds the attributes to add or replace
+        if type(value) is not dict:
+            raise ValueError(f"{_invalid_patch_operation} {index}")
+        for name, attribute_value in value.items():
+            _assign(resource, name, attribute_value, op)
+        return
+    container = _container(resource, path._uri, op != _remove_op)
+    if container is None:
+        return
+    sub_attr = path._attr_sub
+    if sub_attr is None:
+        if op == _remove_op:
+            key = _find_key(container, path._name)
+            if key is not None:
+                del container[key]
+        else:
+            _assign(container, path._name, value, op)
+        return
+    key = _find_key(container, path._name) or path._name
+    current = container.get(key)
+    if type(current) is list:
+        # A sub-attribute of every value of a multi-valued attribute
+        container[key] = [_apply_sub_attr(v, sub_attr, op, value) if type(v) is dict else v for v in current]
+    elif type(current) is dict:
+        container[key] = _apply_sub_attr(current, sub_attr, op, value)
+    elif op != _remove_op:
+        container[key] = {sub_attr: value}
+
+def _apply_sub_attr(element :dict, sub_attr :str, op :str, value :Any) -> dict:
+    element = dict(element)
+    if op == _remove_op:
+        key = _find_key(element, sub_attr)
+        if key is not None:
+            del element[key]
+    else:
+        _assign(element, sub_attr, value, op)
+    return element
+
+def _apply_to_value(element :dict, op :str, path :PatchPath, value :Any) -> Optional[dict]:
+    # One value selected by a value filter after the operation, None once removed
+    if path.sub_attr is not None:
+        return _apply_sub_attr(element, path.sub_attr, op, value)
+    if op == _remove_op:
+        return None
+    if op == _replace_op:
+        return value
+    if type(value) is not dict:
+        return value
+    return _merge(element, value)
+
+def _apply_filtered(resource :dict, operations :list):
+    # Operations with value filters on the same attribute, in one pass over its values
+    first = operations[0][2]
+    container = _container(resource, first._uri, False)
+    key = None if container is None else _find_key(container, first._name)
+    values = None if key is None else container[key]
+    single = type(values) is dict
+    if single:
+        values = [values]
+    elif type(values) is not list:
+        values = []
+
+    # Operations with an eq test by sub-attribute and key, others tried on every value
+    anchored :dict[str, dict] = {}
+    general = []
+    for position, (_, _, path, _) in enumerate(operations):
+        if path._anchor is None:
+            general.append(position)
+        else:
+            sub_attr, literal_key = path._anchor
+            anchored.setdefault(sub_attr, {}).setdefault(literal_key, []).append(position)
+
+    def next_operation(element :dict, after :int) -> Optional[int]:
+        # First operation past after that selects element
+        found = None
+        for sub_attr, keys in anchored.items():
+            for element_key in membership_keys(lookup(element, sub_attr)):
+                positions = keys.get(element_key)
+                if positions is not None:
+                    i = bisect_right(positions, after)
+                    if i < len(positions) and (found is None or positions[i] < found):
+                        found = positions[i]
+        for position in general[bisect_right(general, after):]:
+            if found is not None and position > found:
+                break
+            if operations[position][2]._match(element):
+                return position
+        return found
+
+    matched = [False] * len(operations)
+    result = []
+    for element in values:
+        after = -1
+        while type(element) is dict:
+            position = next_operation(element, after)
+            if position is None:
+                break
+            matched[position] = True
+            _, op, path, value = operations[position]
+            element = _apply_to_value(element, op, path, value)
+            after = position
+        if element is not None:
+            result.append(element)
+
+    for (index, op, _, _), found in zip(operations, matched):
+        if not found and op != _remove_op:
+            raise ValueError(f"{_patch_no_target} {index}")
+    if key is None:
+        return
+    if not result:
+        # No values left, the attribute is unassigned
+        del container[key]
+    else:
+        container[key] = result[0] if single and len(result) == 1 else result
+
+def _operation(index :int, operation :dict) -> tuple:
+    # (index, op, path, value) of a PATCH operation
+    op = operation.get("op")
+    op = op.casefold() if type(op) is str else None
+    path = operation.get("path")
+    if op not in (_add_op, _replace_op, _remove_op) or (path is not None and type(path) is not str):
+        raise ValueError(f"{_invalid_patch_operation} {index}")
+    if op == _remove_op:
+        if path is None:
+            raise ValueError(f"{_invalid_patch_operation} {index}")
+    elif "value" not in operation:
+        raise ValueError(f"{_invalid_patch_operation} {index}")
+    return index, op, None if path is None else compile_path(path), operation.get("value")
+
+def apply_patch(resource :dict, operations :Iterable[dict]) -> dict:
+    """Return a copy of resource with PATCH operations applied in order.
+
+    Operations are dicts with "op", "path" and "value" as in a PatchOp request.
+    resource is not modified, values that change are copied. A ValueError is
+    raised for an invalid operation or, with the operation's index, when a
+    replace or add through a value filter selects no value (noTarget).
+    """
+    resource = dict(resource)
+    operations = [_operation(index, operation) for index, operation in enumerate(operations)]
+    i = 0
+    while i < len(operations):
+        path = operations[i][2]
+        if path is None or path.value_filter is None:
+            _apply_plain(resource, *operations[i])
+            i += 1
+            continue
+        target = path._target
+        j = i + 1
+        while j < len(operations):
+            other = operations[j][2]
+            if other is None or other.value_filter is None or other._target != target:
+                break
+            j += 1
+        _apply_filtered(resource, operations[i:j])
+        i = j
+    return resource
@@ -0,0 +1,302 @@
+"""Cache of filter results, kept up to date as resources are written.
+
+    results = ResultCache(maxsize=256, ttl=30)
+    ids = results.get(filter_str)
+    if ids is None:
+        ids = {r["id"] for r in store if compile_filter(filter_str)(r)}
+        results.put(filter_str, ids)
+    ...
+    results.write(resource_id, old_resource, new_resource)
+
+Entries are keyed on the canonical string of the filter, so filters that only
+differ in spelling share one. Each entry records the attributes its filter
+reads: those of its comparisons and the attribute of each value filter. When
+a resource is written, only the entries reading an attribute that changed are
+touched, and only for that resource: the entry's filter is evaluated on the
+new resource and its id added or dropped. Every other entry keeps its results.
+A created or deleted resource is checked against every entry.
+
+Entries are evicted least recently used first beyond maxsize, and expire ttl
+seconds after they were put.
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Iterable, Optional, Union
+from .lexer import Token
+from .parser import Node, Present, AttrExp, LogExp, Not, ValuePath, In, split_attr_path
+from .compiler import compile_filter
+from .normalize import normalize, canonical_string
+
+_missing = object()
+
+@dataclass
+class CachedResult():
+    """The ids matching a filter, the attributes it reads and when it expires."""
+    ids: set
+    attributes: frozenset
+    expires: float
+
+@dataclass(frozen=True)
+class ResultCacheInfo():
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    invalidations: int
+    maxsize: int
+    currsize: int
+
+class ResultStore(ABC):
+    """Where a ResultCache keeps its entries, by canonical filter string.
+
+    Subclasses keep them elsewhere. A store belongs to one ResultCache, which
+    keeps the index of the attributes read by each entry itself.
+    """
+
+    @abstractmethod
+    def get(self, key :str) -> Optional[CachedResult]:
+        """The entry for key, now the most recently used, or None."""
+
+    @abstractmethod
+    def peek(self, key :str) -> Optional[CachedResult]:
+        """The entry for key, or None, leaving the order of use as it is."""
+
+    @abstractmethod
+    def set(self, key :str, entry :CachedResult):
+        """Store entry, a new key is the most recently used."""
+
+    @abstractmethod
+    def delete(self, key :str) -> Optional[CachedResult]:
+        pass
+
+    @abstractmethod
+    def popitem(self) -> tuple[str, CachedResult]:
+        """Remove and return the least recently used entry."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+class MemoryResultStore(ResultStore):
+    """Entries in an ordered dict, in the process."""
+
+    def __init__(self):
+        self._entries :OrderedDict[str, CachedResult] = OrderedDict()
+
+    def get(self, key :str) -> Optional[CachedResult]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def peek(self, key :str) -> Optional[CachedResult]:
+        return self._entries.get(key)
+
+    def set(self, key :str, entry :CachedResult):
+        self._entries[key] = entry
+
+    def delete(self, key :str) -> Optional[CachedResult]:
+        return self._entries.pop(key, None)
+
+    def popitem(self) -> tuple[str, CachedResult]:
+        return self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+
+def read_attributes(node :Node) -> frozenset:
+    """(URI, attribute name) pairs a filter reads, casefolded, URI None for the core schema.
+
+    A value filter reads the attribute it is on, whatever its sub-attributes.
+    An attribute qualified with a URN is also read on the resource itself,
+    where compile_filter looks for it when the extension object is missing.
+    """
+    attributes = set()
+    _read_attributes(node, attributes)
+    return frozenset(attributes)
+
+def _read_attributes(node :Node, attributes :set):
+    cls = type(node)
+    if cls is LogExp:
+        for operand in node.operands:
+            _read_attributes(operand, attributes)
+    elif cls is Not:
+        _read_attributes(node.operand, attributes)
+    elif cls is Present or cls is AttrExp or cls is ValuePath or cls is In:
+        uri, name, _ = split_attr_path(node.attr_path)
+        name = name.casefold()
+        attributes.add((None, name))
+        if uri is not None:
+            attributes.add((uri.casefold(), name))
+
+def _folded(resource :Any) -> dict:
+    # Attributes by casefolded name
+    if type(resource) is not dict:
+        return {}
+    return {key.casefold(): value for key, value in resource.items() if type(key) is str}
+
+def _same(a :Any, b :Any) -> bool:
+    # Equal and of the same types throughout, 1, 1.0 and True are not the same
+    # to the compiler
+    if a is b:
+        return True
+    if type(a) is not type(b):
+        return False
+    if type(a) is list:
+        return len(a) == len(b) and all(map(_same, a, b))
+    if type(a) is dict:
+        return a.keys() == b.keys() and all(_same(value, b[key]) for key, value in a.items())
+    return a == b
+
+def changed_attributes(old :Optional[dict], new :Optional[dict]) -> set:
+    """(URI, attribute name) pairs whose values differ between two versions of a resource.
+
+    Attributes of an extension object, a top-level attribute whose name holds
+    a colon, are compared one by one. Values differ when their types do, as
+    1, 1.0 and True do. None stands for a missing resource.
+    """
+    old_attributes = _folded(old)
+    new_attributes = _folded(new)
+    changed = set()
+    for name in old_attributes.keys() | new_attributes.keys():
+        old_value = old_attributes.get(name, _missing)
+        new_value = new_attributes.get(name, _missing)
+        if _same(old_value, new_value):
+            continue
+        changed.add((None, name))
+        if ":" in name:
+            old_extension = _folded(old_value)
+            new_extension = _folded(new_value)
+            for sub_name in old_extension.keys() | new_extension.keys():
+                if not _same(old_extension.get(sub_name, _missing), new_extension.get(sub_name, _missing)):
+                    changed.add((name, sub_name))
+    return changed
+
+class ResultCache():
+    """Results of filters, invalidated per resource and attribute on writes.
+
+    ttl is in seconds of clock(), None for entries that do not expire. Results
+    put must reflect every write() made before the put.
+    """
+
+    def __init__(
+        self, maxsize :int = 256, ttl :Optional[float] = None, store :Optional[ResultStore] = None,
+        clock :Callable[[], float] = time.monotonic
+    ):
+        if maxsize < 1:
+            raise ValueError("Cache size must be at least 1")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._store = MemoryResultStore() if store is None else store
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Entries reading each attribute, and their compiled filters
+        self._readers :dict[tuple, set[str]] = {}
+        self._matchers :dict[str, Callable[[dict], bool]] = {}
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def get(self, filter :Union[str, Node, Iterable[Token]]) -> Optional[set]:
+        """The ids put for filter, None when they are not cached."""
+        key = canonical_string(filter)
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is not None and entry.expires <= self._clock():
+                self._drop(key)
+                self._expirations += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            return set(entry.ids)
+
+    def put(self, filter :Union[str, Node, Iterable[Token]], ids :Iterable[Hashable]):
+        """Cache the ids of the resources matching filter."""
+        node = normalize(filter)
+        key = canonical_string(node)
+        match = compile_filter(node)
+        attributes = read_attributes(node)
+        expires = float("inf") if self.ttl is None else self._clock() + self.ttl
+        with self._lock:
+            self._drop(key)
+            self._store.set(key, CachedResult(set(ids), attributes, expires))
+            self._matchers[key] = match
+            for attribute in attributes:
+                self._readers.setdefault(attribute, set()).add(key)
+            while len(self._store) > self.maxsize:
+                evicted, entry = self._store.popitem()
+                self._unindex(evicted, entry)
+                self._evictions += 1
+
+    def write(self, resource_id :Hashable, old :Optional[dict], new :Optional[dict]):
+        """Bring the entries up to date with a write of one resource.
+
+        old is the resource before the write, None when it is created, and
+        new after it, None when it is deleted.
+        """
+        with self._lock:
+            if old is None or new is None:
+                # Filters such as "not (title pr)" match without reading a
+                # single attribute the resource has
+                keys = set(self._matchers)
+            else:
+                keys = set()
+                for attribute in changed_attributes(old, new):
+                    keys |= self._readers.get(attribute, set())
+            now = self._clock()
+            for key in keys:
+                # Writes leave the order in which entries are evicted alone
+                entry = self._store.peek(key)
+                if entry is None:
+                    continue
+                if entry.expires <= now:
+                    self._drop(key)
+                    self._expirations += 1
+                    continue
+                if new is not None and self._matchers[key](new):
+                    entry.ids.add(resource_id)
+                else:
+                    entry.ids.discard(resource_id)
+                self._store.set(key, entry)
+                self._invalidations += 1
+
+    def cache_info(self) -> ResultCacheInfo:
+        with self._lock:
+            return ResultCacheInfo(
+                self._hits, self._misses, self._evictions, self._expirations, self._invalidations,
+                self.maxsize, len(self._store)
+            )
+
+    def cache_clear(self):
+        with self._lock:
+            self._store.clear()
+            self._readers.clear()
+            self._matchers.clear()
+            self._hits = self._misses = self._evictions = self._expirations = self._invalidations = 0
+
+    def _drop(self, key :str):
+        entry = self._store.delete(key)
+        if entry is not None:
+            self._unindex(key, entry)
+
+    def _unindex(self, key :str, entry :CachedResult):
+        del self._matchers[key]
+        for attribute in entry.attributes:
+            keys = self._readers[attribute]
+            keys.discard(key)
+            if not keys:
+                del self._readers[attribute]
@@ -0,0 +1,227 @@
+"""Filters compiled against attribute schemas.
+
+    schema = {
+        "meta.lastModified": AttributeSchema("dateTime"),
+        "userName": AttributeSchema("string"),
+        "id": AttributeSchema("string", case_exact=True),
+        "emails.value": AttributeSchema("string", multi_valued=True),
+    }
+    match = compile_with_schema('filter=meta.lastModified gt "2011-05-13T04:42:34Z"', schema)
+
+Keys are attribute paths as in the filter, compared case insensitively, with
+sub-attributes of a value filter written "emails[type]". Literals are coerced
+to the attribute's type once when the filter is compiled: dateTimes to aware
+datetimes (UTC when no offset is given), integers and decimals to numbers,
+strings casefolded unless caseExact. Only resource values are converted while
+matching, through an LRU memo of memo_size entries when one is asked for.
+Attributes without a schema compare as compile_filter compares them.
+"""
+import operator
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Optional, Union
+from .lexer import Token
+from . import cache
+from .cache import parse
+from .lazy import LazyProgram
+from .parser import Parser, Node, Present, AttrExp, LogExp, Not, ValuePath, In, Constant
+from .compiler import (
+    compile_getter, compile_test, compile_comparison, literal_value, is_present, _compile_and, _compile_or
+)
+from .operators import (
+    _and_op, _or_op, _equal_op, _not_equal_op, _contains_op, _starts_with_op, _ends_with_op,
+    _greater_than_op, _greater_than_or_equal_op, _less_than_op, _less_than_or_equal_op
+)
+from .err_strings import _invalid_comparison
+
+@dataclass(frozen=True)
+class AttributeSchema():
+    """Characteristics of an attribute as in RFC 7643 section 2.
+
+    type is one of "string", "boolean", "decimal", "integer", "dateTime",
+    "binary", "reference" or "complex". A single valued attribute is compared
+    as a whole, a list in its place matches nothing.
+    """
+    type: str = "string"
+    case_exact: bool = False
+    multi_valued: bool = False
+
+_comparisons = {
+    _equal_op: operator.eq,
+    _not_equal_op: operator.eq,
+    _greater_than_op: operator.gt,
+    _greater_than_or_equal_op: operator.ge,
+    _less_than_op: operator.lt,
+    _less_than_or_equal_op: operator.le,
+}
+_substring_comparisons = {
+    _contains_op: operator.contains,
+    _starts_with_op: str.startswith,
+    _ends_with_op: str.endswith,
+}
+
+_date_time_program = LazyProgram(
+    r"(\d{4})-(\d\d)-(\d\d)[Tt](\d\d):(\d\d):(\d\d)(?:\.(\d+))?(?:([Zz])|([+-])(\d\d):(\d\d))?"
+)
+
+def parse_date_time(text :str) -> Optional[datetime]:
+    """An xsd:dateTime as an aware datetime, None when text is not one."""
+    match = _date_time_program.fullmatch(text)
+    if match is None:
+        return None
+    try:
+        # Once the text is known to be an xsd:dateTime the C parser is faster
+        value = datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    else:
+        return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+    year, month, day, hour, minute, second, fraction, _, sign, offset_hours, offset_minutes = match.groups()
+    tz = timezone.utc
+    if sign is not None:
+        offset = timedelta(hours=int(offset_hours), minutes=int(offset_minutes))
+        tz = timezone(-offset if sign == "-" else offset)
+    try:
+        return datetime(
+            int(year), int(month), int(day), int(hour), int(minute), int(second),
+            int((fraction or "0")[:6].ljust(6, "0")), tz
+        )
+    except ValueError:
+        return None
+
+def _string_converter(case_exact :bool) -> Callable[[str], Any]:
+    return (lambda v: v) if case_exact else str.casefold
+
+def _number(value :Any) -> Any:
+    return value if type(value) is int or type(value) is float else None
+
+class SchemaCompiler():
+    """Compiles filters into predicates comparing attributes by their schema."""
+
+    def __init__(self, schema :dict[str, AttributeSchema], memo_size :Optional[int] = None):
+        self._schema = {path.casefold(): attribute for path, attribute in schema.items()}
+        self.memo_size = memo_size
+
+    def compile(self, filter :Union[str, Node, Iterable[Token]]) -> Callable[[dict], bool]:
+        if isinstance(filter, str):
+            node = parse(filter)
+        elif isinstance(filter, Node):
+            node = filter
+        else:
+            node = Parser(filter).parse()
+        match = self._compile(node, "")
+        if cache._observer is not None:
+            from .instrumentation import timed_predicate
+            return timed_predicate(match, cache._observer)
+        return match
+
+    def _attribute(self, prefix :str, attr_path :str) -> Optional[AttributeSchema]:
+        # prefix is the attribute of the enclosing value filter, if any
+        if prefix:
+            attr_path = f"{prefix}[{attr_path}]"
+        return self._schema.get(attr_path.casefold())
+
+    def _memo(self, convert :Callable[[str], Any]) -> Callable[[Any], Any]:
+        # Converter of resource values, strings are memoized when asked to
+        if self.memo_size:
+            convert = lru_cache(self.memo_size)(convert)
+        return lambda v: convert(v) if type(v) is str else None
+
+    def _compile(self, node :Node, prefix :str) -> Callable[[dict], bool]:
+        cls = type(node)
+        if cls is AttrExp:
+            return self._compile_attr_exp(node, prefix)
+        if cls is Present:
+            get = compile_getter(node.attr_path)
+            return lambda resource: is_present(get(resource))
+        if cls is LogExp:
+            funcs = [self._compile(operand, prefix) for operand in node.operands]
+            return _compile_and(funcs) if node.op == _and_op else _compile_or(funcs)
+        if cls is Not:
+            operand = self._compile(node.operand, prefix)
+            return lambda resource: not operand(resource)
+        if cls is ValuePath:
+            return self._compile_value_path(node)
+        if cls is In:
+            # An "or" of eq tests, each coerced for the attribute
+            return self._compile(LogExp(_or_op, tuple(
+                AttrExp(node.attr_path, _equal_op, value, node.position) for value in node.values
+            ), node.position), prefix)
+        if cls is Constant:
+            value = node.value
+            return lambda resource: value
+        raise TypeError(f"Cannot compile {cls.__name__}")
+
+    def _compile_value_path(self, node :ValuePath) -> Callable[[dict], bool]:
+        get = compile_getter(node.attr_path)
+        value_filter = self._compile(node.filter, node.attr_path)
+
+        def match(resource :dict) -> bool:
+            value = get(resource)
+            if type(value) is dict:
+                return value_filter(value)
+            if type(value) is list:
+                for v in value:
+                    if type(v) is dict and value_filter(v):
+                        return True
+            return False
+        return match
+
+    def _compile_attr_exp(self, node :AttrExp, prefix :str) -> Callable[[dict], bool]:
+        get = compile_getter(node.attr_path)
+        attribute = self._attribute(prefix, node.attr_path)
+        if attribute is None:
+            test = compile_test(node.op, literal_value(node.value), node.value.position)
+        else:
+            test = self._compile_test(attribute, node.op, node.value)
+        negate = node.op == _not_equal_op
+        if attribute is None or attribute.multi_valued:
+            return compile_comparison(get, test, negate)
+        if negate:
+            return lambda resource: not test(get(resource))
+        return lambda resource: test(get(resource))
+
+    def _compile_test(self, attribute :AttributeSchema, op :str, token :Token) -> Callable[[Any], bool]:
+        literal = literal_value(token)
+        kind = attribute.type
+        if literal is None or type(literal) is bool or kind == "boolean" or kind == "complex":
+            # Null, true and false compare the same whatever the type, which
+            # also rejects ordering and substrings of booleans
+            if kind == "boolean" and type(literal) is not bool and literal is not None:
+                raise ValueError(f"{_invalid_comparison} {token.position}")
+            return compile_test(op, literal, token.position)
+        if kind == "dateTime":
+            if op in _substring_comparisons:
+                return compile_test(op, literal, token.position)
+            literal = parse_date_time(literal) if type(literal) is str else None
+            convert = self._memo(parse_date_time)
+        elif kind == "integer" or kind == "decimal":
+            if type(literal) is str and kind == "integer":
+                try:
+                    literal = int(literal)
+                except ValueError:
+                    literal = None
+            if type(literal) is not int or op in _substring_comparisons:
+                raise ValueError(f"{_invalid_comparison} {token.position}")
+            convert = _number
+        else:
+            # string, reference and binary, where binary cannot be ordered
+            if type(literal) is not str or (kind == "binary" and op not in (_equal_op, _not_equal_op)):
+                raise ValueError(f"{_invalid_comparison} {token.position}")
+            to_string = _string_converter(attribute.case_exact)
+            literal = to_string(literal)
+            convert = self._memo(to_string)
+            if op in _substring_comparisons:
+                compare = _substring_comparisons[op]
+                return lambda v: (v := convert(v)) is not None and compare(v, literal)
+        if literal is None:
+            raise ValueError(f"{_invalid_comparison} {token.position}")
+        compare = _comparisons[op]
+        return lambda v: (v := convert(v)) is not None and compare(v, literal)
+
+def compile_with_schema(
+    filter :Union[str, Node, Iterable[Token]], schema :dict[str, AttributeSchema], memo_size :Optional[int] = None
+) -> Callable[[dict], bool]:
+    """Compile a filter comparing attributes by their schema, see SchemaCompiler."""
+    return SchemaCompiler(schema, memo_size).compile(filter)
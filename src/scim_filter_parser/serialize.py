@@ -0,0 +1,223 @@
+"""Compact binary form of parsed filters.
+
+    data = dumps('filter=userName eq "bjensen"')
+    node = loads(data)      # bytes, bytearray, mmap or shared memory buffer
+
+Layout, all integers little endian:
+
+    magic "SCFB", version (u8), 3 reserved bytes
+    instruction count (u32), literal pool size (u32)
+    instructions, two u32 each: opcode << 24 | argument, position
+    pool offsets, pool size + 1 u32, into
+    pool, the UTF-8 text of attribute paths and literal values
+
+Instructions are the tree in postfix order, operands before the node using
+them. Arguments index the pool or count operands. loads() reads the buffer
+through a memoryview without copying it and decodes only the pool entries
+it uses.
+"""
+import struct
+import sys
+from array import array
+from typing import Iterable, Union
+from .lexer import (
+    Token, ComparisonValueToken,
+    StringLiteralToken, NumericLiteralToken, TrueLiteralToken, FalseLiteralToken, NullLiteralToken
+)
+from .cache import parse
+from .parser import Parser, Node, Present, AttrExp, LogExp, Not, ValuePath, In, Constant
+from .operators import _and_op, _or_op, _comparison_ops
+from .err_strings import _invalid_serialized_filter, _unsupported_serialized_version, _serialized_filter_too_large
+
+magic = b"SCFB"
+version = 1
+_header = struct.Struct("<4sB3xII")
+
+_op_present = 1
+_op_and = 2
+_op_or = 3
+_op_not = 4
+_op_value_path = 5
+_op_in = 6
+_op_path = 7
+_op_constant = 8
+_op_string = 16
+_op_number = 17
+_op_true = 18
+_op_false = 19
+_op_null = 20
+# Comparison operators are _op_compare + their index in _comparison_ops
+_op_compare = 32
+
+_value_opcodes = {
+    StringLiteralToken: _op_string,
+    NumericLiteralToken: _op_number,
+    TrueLiteralToken: _op_true,
+    FalseLiteralToken: _op_false,
+    NullLiteralToken: _op_null,
+}
+_value_classes = {opcode: cls for cls, opcode in _value_opcodes.items()}
+_compare_opcodes = {op: _op_compare + index for index, op in enumerate(_comparison_ops)}
+_max_argument = (1 << 24) - 1
+
+class _Encoder():
+
+    def __init__(self):
+        self.words = array("I")
+        self.pool :dict[str, int] = {}
+
+    def intern(self, text :str) -> int:
+        index = self.pool.get(text)
+        if index is None:
+            index = self.pool[text] = len(self.pool)
+        return index
+
+    def emit(self, opcode :int, argument :int, position :int):
+        if argument > _max_argument:
+            raise ValueError(_serialized_filter_too_large)
+        self.words.append(opcode << 24 | argument)
+        self.words.append(position)
+
+    def value(self, token :ComparisonValueToken):
+        self.emit(_value_opcodes[type(token)], self.intern(token.value), token.position)
+
+    def node(self, node :Node):
+        cls = type(node)
+        if cls is Present:
+            self.emit(_op_present, self.intern(node.attr_path), node.position)
+        elif cls is AttrExp:
+            self.value(node.value)
+            self.emit(_compare_opcodes[node.op], self.intern(node.attr_path), node.position)
+        elif cls is LogExp:
+            for operand in node.operands:
+                self.node(operand)
+            self.emit(_op_and if node.op == _and_op else _op_or, len(node.operands), node.position)
+        elif cls is Not:
+            self.node(node.operand)
+            self.emit(_op_not, 0, node.position)
+        elif cls is ValuePath:
+            self.node(node.filter)
+            self.emit(_op_value_path, self.intern(node.attr_path), node.position)
+        elif cls is In:
+            self.emit(_op_path, self.intern(node.attr_path), 0)
+            for value in node.values:
+                self.value(value)
+            self.emit(_op_in, len(node.values), node.position)
+        elif cls is Constant:
+            self.emit(_op_constant, int(node.value), node.position)
+        else:
+            raise TypeError(f"Cannot serialize {cls.__name__}")
+
+    def to_bytes(self) -> bytes:
+        texts = [text.encode() for text in self.pool]
+        offsets = array("I", [0])
+        for text in texts:
+            offsets.append(offsets[-1] + len(text))
+        words = self.words
+        if sys.byteorder != "little":
+            words, offsets = array("I", words), array("I", offsets)
+            words.byteswap()
+            offsets.byteswap()
+        return b"".join((
+            _header.pack(magic, version, len(words) // 2, len(texts)),
+            words.tobytes(), offsets.tobytes(), *texts,
+        ))
+
+def dumps(filter :Union[str, Node, Iterable[Token]]) -> bytes:
+    """Serialize a filter string, parsed Node or token stream."""
+    if isinstance(filter, str):
+        node = parse(filter)
+    elif isinstance(filter, Node):
+        node = filter
+    else:
+        node = Parser(filter).parse()
+    encoder = _Encoder()
+    encoder.node(node)
+    return encoder.to_bytes()
+
+def _words(view :memoryview, start :int, count :int):
+    # count u32 starting at byte start, without copying on little endian hosts
+    end = start + 4 * count
+    if end > len(view):
+        raise ValueError(f"{_invalid_serialized_filter} {len(view)}")
+    if sys.byteorder == "little":
+        return view[start:end].cast("I")
+    words = array("I", view[start:end])
+    words.byteswap()
+    return words
+
+def _pop(stack :list, cls :type):
+    item = stack.pop()
+    if not isinstance(item, cls):
+        raise IndexError
+    return item
+
+def loads(data :Union[bytes, bytearray, memoryview]) -> Node:
+    """Rebuild the Node serialized by dumps() from any buffer."""
+    view = memoryview(data).cast("B")
+    if len(view) < _header.size:
+        raise ValueError(f"{_invalid_serialized_filter} 0")
+    found_magic, found_version, instruction_count, pool_size = _header.unpack_from(view)
+    if found_magic != magic:
+        raise ValueError(f"{_invalid_serialized_filter} 0")
+    if found_version != version:
+        raise ValueError(f"{_unsupported_serialized_version} {found_version}")
+    words = _words(view, _header.size, 2 * instruction_count)
+    offsets_start = _header.size + 8 * instruction_count
+    offsets = _words(view, offsets_start, pool_size + 1)
+    pool_start = offsets_start + 4 * (pool_size + 1)
+    if pool_start + offsets[pool_size] > len(view):
+        raise ValueError(f"{_invalid_serialized_filter} {len(view)}")
+    pool :list = [None] * pool_size
+
+    def text(index :int) -> str:
+        value = pool[index]
+        if value is None:
+            value = pool[index] = str(view[pool_start + offsets[index]:pool_start + offsets[index+1]], "utf-8")
+        return value
+
+    stack = []
+    comparison_end = _op_compare + len(_comparison_ops)
+    try:
+        for i in range(instruction_count):
+            word = words[2*i]
+            opcode, argument, position = word >> 24, word & _max_argument, words[2*i+1]
+            if opcode in _value_classes:
+                stack.append(_value_classes[opcode](text(argument), position))
+            elif _op_compare <= opcode < comparison_end:
+                value = _pop(stack, ComparisonValueToken)
+                stack.append(AttrExp(text(argument), _comparison_ops[opcode - _op_compare], value, position))
+            elif opcode == _op_present:
+                stack.append(Present(text(argument), position))
+            elif opcode == _op_and or opcode == _op_or:
+                if argument < 2 or argument > len(stack):
+                    raise IndexError
+                operands = tuple(stack[-argument:])
+                if not all(isinstance(operand, Node) for operand in operands):
+                    raise IndexError
+                del stack[-argument:]
+                stack.append(LogExp(_and_op if opcode == _op_and else _or_op, operands, position))
+            elif opcode == _op_not:
+                stack.append(Not(_pop(stack, Node), position))
+            elif opcode == _op_value_path:
+                stack.append(ValuePath(text(argument), _pop(stack, Node), position))
+            elif opcode == _op_path:
+                stack.append(text(argument))
+            elif opcode == _op_in:
+                if argument < 1 or argument >= len(stack) or type(stack[-argument-1]) is not str:
+                    raise IndexError
+                values = tuple(stack[-argument:])
+                if not all(isinstance(value, ComparisonValueToken) for value in values):
+                    raise IndexError
+                attr_path = stack[-argument-1]
+                del stack[-argument-1:]
+                stack.append(In(attr_path, values, position))
+            elif opcode == _op_constant:
+                stack.append(Constant(bool(argument), position))
+            else:
+                raise IndexError
+    except (IndexError, UnicodeDecodeError):
+        raise ValueError(f"{_invalid_serialized_filter} {_header.size + 8 * i}") from None
+    if len(stack) != 1 or not isinstance(stack[0], Node):
+        raise ValueError(f"{_invalid_serialized_filter} {offsets_start}")
+    return stack[0]
@@ -0,0 +1,179 @@
+from dataclasses import dataclass, field
+from typing import Iterable, Mapping, Optional, Union
+from .cache import parse
+from .lexer import Token, NullLiteralToken
+from .parser import Parser, Node, Present, AttrExp, LogExp, Not, ValuePath, In, Constant, expand_in, split_attr_path
+from .compiler import literal_value
+from .operators import (
+    _and_op, _equal_op, _not_equal_op, _contains_op, _starts_with_op, _ends_with_op,
+    _greater_than_op, _greater_than_or_equal_op, _less_than_op, _less_than_or_equal_op
+)
+from .err_strings import _invalid_comparison, _unmapped_attribute
+
+@dataclass(frozen=True)
+class MultiValuedTable():
+    """A multi-valued attribute stored in its own table.
+
+    join is the SQL condition tying a row of table to the resource row, e.g.
+    "emails.user_id = users.id"; columns maps sub-attributes to SQL expressions.
+    """
+    table: str
+    join: str
+    columns: Mapping[str, str] = field(default_factory=dict)
+
+_order_ops = {
+    _greater_than_op: ">",
+    _greater_than_or_equal_op: ">=",
+    _less_than_op: "<",
+    _less_than_or_equal_op: "<=",
+}
+
+def escape_like(value :str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _fold_keys(mapping :Mapping) -> dict:
+    return {key.casefold(): value for key, value in mapping.items()}
+
+class SqlTranslator():
+    """Translates filters into parameterized SQL WHERE fragments.
+
+    mapping takes attribute paths to SQL expressions (a column or something like
+    json_extract(data, '$.name.familyName')) or to a MultiValuedTable, which is
+    queried through EXISTS subqueries. Unless case_exact is set string
+    comparisons are done on lower(expression).
+    """
+
+    def __init__(
+        self, mapping :Mapping[str, Union[str, MultiValuedTable]],
+        placeholder :str = "?", case_exact :bool = False
+    ):
+        self._mapping = _fold_keys(mapping)
+        self._placeholder = placeholder
+        self._case_exact = case_exact
+
+    def translate(self, filter :Union[str, Node, Iterable[Token]]) -> tuple[str, list]:
+        if isinstance(filter, str):
+            node = parse(filter)
+        elif isinstance(filter, Node):
+            node = filter
+        else:
+            node = Parser(filter).parse()
+        params :list = []
+        return self._where(node, self._mapping, params), params
+
+    def _resolve(self, attr_path :str, position :int, columns :dict) -> tuple[Union[str, MultiValuedTable], Optional[str]]:
+        # Returns the mapped target and, for multi-valued tables, the sub-attribute
+        target = columns.get(attr_path.casefold())
+        if target is not None:
+            return target, None
+        uri, name, sub_attr = split_attr_path(attr_path)
+        if uri is not None:
+            short_path = name if sub_attr is None else f"{name}.{sub_attr}"
+            target = columns.get(short_path.casefold())
+            if target is not None:
+                return target, None
+        target = columns.get(name.casefold())
+        if target is None and uri is not None:
+            target = columns.get(f"{uri}:{name}".casefold())
+        if isinstance(target, MultiValuedTable):
+            return target, sub_attr
+        raise ValueError(f"{_unmapped_attribute} {position}")
+
+    def _sub_column(self, table :MultiValuedTable, sub_attr :Optional[str], position :int) -> str:
+        # Comparing a multi-valued attribute itself means comparing its "value"
+        column = _fold_keys(table.columns).get((sub_attr or "value").casefold())
+        if column is None:
+            raise ValueError(f"{_unmapped_attribute} {position}")
+        return column
+
+    def _exists(self, table :MultiValuedTable, condition :Optional[str]) -> str:
+        where = table.join if condition is None else f"{table.join} AND {condition}"
+        return f"EXISTS (SELECT 1 FROM {table.table} WHERE {where})"
+
+    def _where(self, node :Node, columns :dict, params :list) -> str:
+        cls = type(node)
+        if cls is LogExp:
+            joiner = " AND " if node.op == _and_op else " OR "
+            return "(" + joiner.join(self._where(operand, columns, params) for operand in node.operands) + ")"
+        if cls is Not:
+            # Comparisons on NULL are unknown, which counts as no match
+            return f"NOT COALESCE({self._where(node.operand, columns, params)}, FALSE)"
+        if cls is Present:
+            target, sub_attr = self._resolve(node.attr_path, node.position, columns)
+            if isinstance(target, MultiValuedTable):
+                if sub_attr is None:
+                    return self._exists(target, None)
+                column = self._sub_column(target, sub_attr, node.position)
+                return self._exists(target, f"{column} IS NOT NULL")
+            return f"{target} IS NOT NULL"
+        if cls is ValuePath:
+            target, sub_attr = self._resolve(node.attr_path, node.position, columns)
+            if not isinstance(target, MultiValuedTable) or sub_attr is not None:
+                raise ValueError(f"{_unmapped_attribute} {node.position}")
+            return self._exists(target, self._where(node.filter, _fold_keys(target.columns), params))
+        if cls is AttrExp:
+            return self._attr_exp(node, columns, params)
+        if cls is In:
+            return self._where(expand_in(node), columns, params)
+        if cls is Constant:
+            return "(1 = 1)" if node.value else "(1 = 0)"
+        raise TypeError(f"Cannot translate {cls.__name__}")
+
+    def _attr_exp(self, node :AttrExp, columns :dict, params :list) -> str:
+        target, sub_attr = self._resolve(node.attr_path, node.position, columns)
+        table = None
+        if isinstance(target, MultiValuedTable):
+            table = target
+            target = self._sub_column(table, sub_attr, node.position)
+        op = node.op
+        negate = op == _not_equal_op
+        if negate:
+            op = _equal_op
+        condition = self._comparison(target, op, node, params)
+        is_null = type(node.value) is NullLiteralToken
+        if table is not None:
+            condition = self._exists(table, condition)
+            if is_null:
+                # No rows is an unassigned attribute, as an empty list is
+                condition = f"(NOT {self._exists(table, None)} OR {condition})"
+            return f"NOT {condition}" if negate else condition
+        if negate:
+            if is_null:
+                return f"{target} IS NOT NULL"
+            return f"({target} IS NULL OR NOT ({condition}))"
+        return condition
+
+    def _comparison(self, expression :str, op :str, node :AttrExp, params :list) -> str:
+        literal = literal_value(node.value)
+        placeholder = self._placeholder
+        if literal is None or type(literal) is bool:
+            if op != _equal_op:
+                raise ValueError(f"{_invalid_comparison} {node.value.position}")
+            if literal is None:
+                return f"{expression} IS NULL"
+            params.append(literal)
+            return f"{expression} = {placeholder}"
+        if type(literal) is str:
+            if not self._case_exact:
+                expression = f"lower({expression})"
+                literal = literal.lower()
+            if op == _contains_op:
+                params.append(f"%{escape_like(literal)}%")
+            elif op == _starts_with_op:
+                params.append(f"{escape_like(literal)}%")
+            elif op == _ends_with_op:
+                params.append(f"%{escape_like(literal)}")
+            else:
+                params.append(literal)
+                return f"{expression} {_order_ops.get(op, '=')} {placeholder}"
+            return f"{expression} LIKE {placeholder} ESCAPE '\\'"
+        if op not in _order_ops and op != _equal_op:
+            raise ValueError(f"{_invalid_comparison} {node.value.position}")
+        params.append(literal)
+        return f"{expression} {_order_ops.get(op, '=')} {placeholder}"
+
+def to_sql(
+    filter :Union[str, Node, Iterable[Token]], mapping :Mapping[str, Union[str, MultiValuedTable]],
+    placeholder :str = "?", case_exact :bool = False
+) -> tuple[str, list]:
+    return SqlTranslator(mapping, placeholder, case_exact).translate(filter)
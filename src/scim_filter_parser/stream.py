@@ -0,0 +1,106 @@
+import json
+import os
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import closing
+from functools import partial
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, Optional, Union
+from .lexer import Token
+from .cache import parse
+from .parser import Parser, Node
+from .compiler import compile_filter
+from .jsonbytes import compile_json
+
+def _match_batch(match :Callable[[dict], bool], match_json :Callable[..., bool], batch :list) -> list[dict]:
+    # Resources of batch matching the filter, JSON text is only decoded when it matches
+    matches = []
+    for item in batch:
+        if isinstance(item, (str, bytes, bytearray)):
+            if item.strip() and match_json(item):
+                matches.append(json.loads(item))
+        elif match(item):
+            matches.append(item)
+    return matches
+
+def _batches(
+    work :Callable[[list], list], source :Iterable, batch_size :int,
+    workers :Optional[int], executor :Optional[Executor]
+) -> Iterator[list]:
+    source = iter(source)
+    if executor is None and (workers is None or workers <= 1):
+        while batch := list(islice(source, batch_size)):
+            yield work(batch)
+        return
+    if workers is None:
+        workers = os.cpu_count() or 1
+    owned = executor is None
+    if owned:
+        executor = ThreadPoolExecutor(workers)
+    # A couple of batches per worker in flight, so memory stays bounded
+    pending :deque = deque()
+
+    def submit() -> bool:
+        batch = list(islice(source, batch_size))
+        if batch:
+            pending.append(executor.submit(work, batch))
+        return bool(batch)
+
+    try:
+        for _ in range(2 * workers):
+            if not submit():
+                break
+        while pending:
+            matches = pending.popleft().result()
+            submit()
+            yield matches
+    finally:
+        for future in pending:
+            future.cancel()
+        if owned:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+def filter_stream(
+    filter :Union[str, Node, Iterable[Token]], source :Iterable[Any], *, batch_size :int = 256,
+    start_index :int = 1, count :Optional[int] = None,
+    workers :Optional[int] = None, executor :Optional[Executor] = None
+) -> Iterator[dict]:
+    """Yield the resources of source matching filter, in source order.
+
+    source yields resource dicts or JSON text (str or bytes, such as the lines
+    of a JSON Lines file), which is evaluated with compile_json and decoded
+    only when it matches; blank lines are skipped. The filter is compiled once
+    and source is read batch_size items at a time.
+
+    start_index and count page through the matches as in RFC 7644: the first
+    match is at index 1, a start_index below 1 counts as 1, and no more than
+    count resources are returned. Reading stops as soon as count are found.
+
+    With workers above 1 or an executor, batches are evaluated and decoded on
+    a thread pool, a couple per worker ahead of the consumer.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    if isinstance(filter, str):
+        node = parse(filter)
+    elif isinstance(filter, Node):
+        node = filter
+    else:
+        node = Parser(filter).parse()
+    work = partial(_match_batch, compile_filter(node), compile_json(node))
+    skip = max(start_index, 1) - 1
+    remaining = count
+    if remaining is not None and remaining <= 0:
+        return
+    with closing(_batches(work, source, batch_size, workers, executor)) as batches:
+        for matches in batches:
+            if skip >= len(matches):
+                skip -= len(matches)
+                continue
+            for resource in islice(matches, skip, None):
+                yield resource
+                if remaining is not None:
+                    remaining -= 1
+                    if remaining == 0:
+                        return
+            skip = 0
@@ -0,0 +1,254 @@
+"""Match one resource against many registered filters.
+
+    matcher = SubscriptionMatcher()
+    matcher.add("crm", 'filter=userName eq "bjensen" and active eq true')
+    matcher.add("mail", 'filter=emails.value sw "bjensen@"')
+    matcher.match(user)     # {"crm"}
+
+Filters are normalized once on add() and broken into a network of distinct
+sub-expressions shared between filters, in the style of a Rete network, so a
+sub-expression common to many filters is evaluated once per resource.
+
+Each filter also gets anchors: eq and sw tests of which at least one holds
+whenever the filter matches. eq anchors are found by hashing the resource's
+values and sw anchors by walking its strings down a prefix trie, so match()
+only evaluates the filters whose anchors fire, plus those without anchors
+(such as filters made only of pr, ne, ordering or not).
+"""
+from typing import Hashable, Iterable, Optional, Union
+from .lexer import Token
+from .cache import parse
+from .parser import Parser, Node, AttrExp, LogExp, Not
+from .compiler import compile_filter, compile_getter, literal_value, membership_key, membership_keys
+from .normalize import normalize
+from .operators import _and_op, _equal_op, _starts_with_op
+
+class _TrieNode():
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children :dict[str, "_TrieNode"] = {}
+        self.ids :set = set()
+
+def _anchor_cost(anchor :tuple) -> int:
+    # Rough number of resources an anchor fires for, to choose between the
+    # operands of an "and": true, false and null hold for many
+    op, _, key = anchor
+    if op == _starts_with_op:
+        return 4
+    return 16 if key[0] is bool else 1
+_no_ids = frozenset()
+
+def _anchors(node :Node) -> Optional[frozenset]:
+    # (op, attribute path, key) tests of which one holds whenever node matches,
+    # None when there are no such tests
+    cls = type(node)
+    if cls is AttrExp:
+        if node.op == _equal_op:
+            key = membership_key(literal_value(node.value))
+            if key is not None:
+                return frozenset({(_equal_op, node.attr_path, key)})
+        elif node.op == _starts_with_op:
+            literal = literal_value(node.value)
+            if type(literal) is str:
+                return frozenset({(_starts_with_op, node.attr_path, literal.casefold())})
+        return None
+    if cls is LogExp:
+        candidates = [_anchors(operand) for operand in node.operands]
+        if node.op == _and_op:
+            candidates = [anchors for anchors in candidates if anchors is not None]
+            if not candidates:
+                return None
+            return min(candidates, key=lambda anchors: sum(map(_anchor_cost, anchors)))
+        if None in candidates:
+            return None
+        return frozenset().union(*candidates)
+    # Value filters match within one value, which anchors on the whole
+    # attribute do not capture
+    return None
+
+class SubscriptionMatcher():
+    """Registered filters by subscription id, matched against one resource at a time."""
+
+    def __init__(self):
+        self._subscriptions :dict[Hashable, tuple[int, Optional[frozenset]]] = {}
+        self._unanchored :set = set()
+        # Network of distinct normalized sub-expressions
+        self._slots :dict[Node, int] = {}
+        self._nodes :dict[int, Node] = {}
+        self._children :dict[int, tuple[int, ...]] = {}
+        self._funcs :dict = {}
+        self._refs :dict[int, int] = {}
+        self._next_slot = 0
+        # Anchor indexes per attribute path
+        self._getters :dict[str, list] = {}          # path -> [getter, anchors using it]
+        self._equal :dict[str, dict] = {}            # path -> key -> ids
+        self._prefixes :dict[str, _TrieNode] = {}    # path -> trie of casefolded prefixes
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def __contains__(self, subscription_id :Hashable) -> bool:
+        return subscription_id in self._subscriptions
+
+    def add(self, subscription_id :Hashable, filter :Union[str, Node, Iterable[Token]]):
+        if subscription_id in self._subscriptions:
+            raise KeyError(subscription_id)
+        if isinstance(filter, str):
+            node = parse(filter)
+        elif isinstance(filter, Node):
+            node = filter
+        else:
+            node = Parser(filter).parse()
+        # Invalid comparisons fail here, with their positions, before anything is registered
+        compile_filter(node)
+        node = normalize(node)
+        slot = self._acquire(node)
+        anchors = _anchors(node)
+        self._subscriptions[subscription_id] = (slot, anchors)
+        if anchors is None:
+            self._unanchored.add(subscription_id)
+        else:
+            for anchor in anchors:
+                self._add_anchor(subscription_id, anchor)
+
+    def remove(self, subscription_id :Hashable):
+        slot, anchors = self._subscriptions.pop(subscription_id)
+        if anchors is None:
+            self._unanchored.discard(subscription_id)
+        else:
+            for anchor in anchors:
+                self._remove_anchor(subscription_id, anchor)
+        self._release(slot)
+
+    def match(self, resource :dict) -> set:
+        """Return the ids of the subscriptions whose filter matches resource."""
+        candidates = set(self._unanchored)
+        for path, (get, _) in self._getters.items():
+            keys = membership_keys(get(resource))
+            equal = self._equal.get(path)
+            if equal is not None:
+                for key in keys:
+                    candidates |= equal.get(key, _no_ids)
+            trie = self._prefixes.get(path)
+            if trie is not None:
+                for kind, value in keys:
+                    if kind is str:
+                        candidates |= self._prefixed(trie, value)
+        memo :dict[int, bool] = {}
+        subscriptions = self._subscriptions
+        return {
+            subscription_id for subscription_id in candidates
+            if self._evaluate(subscriptions[subscription_id][0], resource, memo)
+        }
+
+    def _evaluate(self, slot :int, resource :dict, memo :dict) -> bool:
+        result = memo.get(slot)
+        if result is None:
+            result = memo[slot] = self._funcs[slot](resource, memo)
+        return result
+
+    def _acquire(self, node :Node) -> int:
+        # Slot of node in the network, added with its sub-expressions when new
+        slot = self._slots.get(node)
+        if slot is not None:
+            self._refs[slot] += 1
+            return slot
+        slot = self._next_slot
+        self._next_slot += 1
+        cls = type(node)
+        if cls is LogExp:
+            children = tuple(self._acquire(operand) for operand in node.operands)
+            self._funcs[slot] = self._compile_log_exp(node.op, children)
+        elif cls is Not:
+            children = (self._acquire(node.operand),)
+            operand = children[0]
+            self._funcs[slot] = lambda resource, memo: not self._evaluate(operand, resource, memo)
+        else:
+            # Comparisons, presence and value filters are evaluated whole
+            children = ()
+            match = compile_filter(node)
+            self._funcs[slot] = lambda resource, memo: match(resource)
+        self._slots[node] = slot
+        self._nodes[slot] = node
+        self._children[slot] = children
+        self._refs[slot] = 1
+        return slot
+
+    def _compile_log_exp(self, op :str, children :tuple[int, ...]):
+        evaluate = self._evaluate
+        if op == _and_op:
+            def match(resource :dict, memo :dict) -> bool:
+                for child in children:
+                    if not evaluate(child, resource, memo):
+                        return False
+                return True
+        else:
+            def match(resource :dict, memo :dict) -> bool:
+                for child in children:
+                    if evaluate(child, resource, memo):
+                        return True
+                return False
+        return match
+
+    def _release(self, slot :int):
+        self._refs[slot] -= 1
+        if self._refs[slot]:
+            return
+        del self._refs[slot], self._funcs[slot], self._slots[self._nodes.pop(slot)]
+        for child in self._children.pop(slot):
+            self._release(child)
+
+    def _add_anchor(self, subscription_id :Hashable, anchor :tuple):
+        op, path, key = anchor
+        entry = self._getters.get(path)
+        if entry is None:
+            entry = self._getters[path] = [compile_getter(path), 0]
+        entry[1] += 1
+        if op == _equal_op:
+            self._equal.setdefault(path, {}).setdefault(key, set()).add(subscription_id)
+        else:
+            node = self._prefixes.setdefault(path, _TrieNode())
+            for char in key:
+                node = node.children.setdefault(char, _TrieNode())
+            node.ids.add(subscription_id)
+
+    def _remove_anchor(self, subscription_id :Hashable, anchor :tuple):
+        op, path, key = anchor
+        if op == _equal_op:
+            equal = self._equal[path]
+            ids = equal[key]
+            ids.discard(subscription_id)
+            if not ids:
+                del equal[key]
+                if not equal:
+                    del self._equal[path]
+        else:
+            trail = [self._prefixes[path]]
+            for char in key:
+                trail.append(trail[-1].children[char])
+            trail[-1].ids.discard(subscription_id)
+            # Prune the nodes left empty, deepest first
+            for depth in range(len(key), 0, -1):
+                node = trail[depth]
+                if node.ids or node.children:
+                    break
+                del trail[depth-1].children[key[depth-1]]
+            if not trail[0].ids and not trail[0].children:
+                del self._prefixes[path]
+        entry = self._getters[path]
+        entry[1] -= 1
+        if not entry[1]:
+            del self._getters[path]
+
+    @staticmethod
+    def _prefixed(trie :_TrieNode, value :str) -> set:
+        # Ids of the prefixes of value registered in trie
+        ids = set(trie.ids)
+        node = trie
+        for char in value:
+            node = node.children.get(char)
+            if node is None:
+                break
+            ids |= node.ids
+        return ids
@@ -0,0 +1,87 @@
+"""Check a filter without building tokens or a tree.
+
+    validate('filter=userName eq "bjensen"')    # None
+    validate('filter=userName eq bjensen')      # (19, "Unexpected character at position:")
+
+A filter is valid exactly when parse() accepts it. Filters written the usual
+way, with single spaces around operators, are checked by one regular
+expression for the ABNF, with the lexer's rules on spaces around brackets and
+parentheses, followed by a scan of the parentheses for their balance. No
+Token or substring is created. Anything else, including every invalid filter,
+goes through the lexer and parser, so errors have the same positions and
+messages as parse() gives. The scan of the parentheses also applies the
+parser's Parser.max_depth, so filters nested deeper are left to the parser to
+report. A filter not starting with "filter=" is reported at position -1, as the
+lexer does.
+"""
+import re
+from typing import Optional
+from .lazy import LazyProgram
+from .lexer import Lexer, _alternation
+from .parser import Parser
+from .operators import _present_op, _not_op, _logic_ops, _comparison_ops
+from .err_strings import _unexpected_end_of_input, _missing_leading_str, error_position
+
+# A string literal as the lexer reads it, up to the first quote not escaped
+# with a backslash, taking runs of other characters at once
+_string = r'"[^"]*(?:(?<=\\)"[^"]*)*(?<!\\)"'
+
+def _filter_pattern() -> str:
+    words = _alternation(_comparison_ops + _logic_ops + [_present_op, _not_op])
+    # attrPath, as the parser checks it, that the lexer does not take for an operator
+    attr_path = rf"(?!(?:{words})[ \[])(?:[^ \[\]()\n]+:)?[a-zA-Z][a-zA-Z0-9_\-]*(?:\.[a-zA-Z][a-zA-Z0-9_\-]*)?"
+    value = rf'(?:{_string}|(?:\d+|true|false|null)(?=[ )\]]|\Z))'
+    attr_exp = rf"{attr_path} (?:{re.escape(_present_op)}|(?:{_alternation(_comparison_ops)}) {value})"
+    logic = rf" (?:{_alternation(_logic_ops)}) "
+    # Parentheses are only checked for where they may appear here
+    opening = rf"(?:\(|{_not_op} \()*"
+    val_filter = rf"{opening}{attr_exp}\)*(?:{logic}{opening}{attr_exp}\)*)*"
+    unary = rf"{opening}(?:{attr_exp}|{attr_path}\[{val_filter}\])\)*"
+    return rf"{re.escape(Lexer.leading_str)}{unary}(?:{logic}{unary})*"
+
+_filter_program = LazyProgram(_filter_pattern())
+# Strings are skipped, the groups are ( ) [ ]
+_punctuation_program = LazyProgram(rf'{_string}|(\()|(\))|(\[)|(\])')
+
+def _balanced(filter_str :str) -> bool:
+    # Parentheses close in order, and inside a value filter those opened there.
+    # Deep filters are left to the parser, one below its limit for the "[" around
+    # a value filter
+    depth = 0
+    floor = 0
+    for match in _punctuation_program.finditer(filter_str, len(Lexer.leading_str)):
+        group = match.lastindex
+        if group == 1:
+            depth += 1
+            if depth >= Parser.max_depth:
+                return False
+        elif group == 2:
+            depth -= 1
+            if depth < floor:
+                return False
+        elif group == 3:
+            floor = depth
+        elif group == 4:
+            if depth != floor:
+                return False
+            floor = 0
+    return depth == 0
+
+def validate(filter_str :str) -> Optional[tuple[int, str]]:
+    """None for a valid filter, else the position and message parse() would raise."""
+    if filter_str and not filter_str.startswith(Lexer.leading_str):
+        return -1, _missing_leading_str
+    if _filter_program.fullmatch(filter_str) is not None and (
+        ("(" not in filter_str and ")" not in filter_str) or _balanced(filter_str)
+    ):
+        return None
+    try:
+        Parser(Lexer(filter_str, Lexer.Engine.Regex)).parse()
+    except ValueError as e:
+        message = str(e)
+        position = error_position(message)
+        if position is None:
+            # Errors at the end of the input carry no position
+            return len(filter_str), message or _unexpected_end_of_input
+        return position, message[:-len(str(position))-1]
+    return None
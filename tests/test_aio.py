@@ -0,0 +1,91 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from scim_filter_parser import parse, cache
+from scim_filter_parser.cache import ParseCache
+from scim_filter_parser.limits import Limits
+from scim_filter_parser.aio import AsyncParser, aparse
+from scim_filter_parser.err_strings import (
+    _unexpected_token, _unexpected_end_of_input, _input_too_long, _nesting_too_deep
+)
+from scim_filter_parser.benchmark import loop_latency
+
+large = "filter=" + " or ".join(f'userName eq "user{i}"' for i in range(200))
+
+def test_inline_and_offloaded():
+    async def main():
+        with ThreadPoolExecutor(2) as executor:
+            parser = AsyncParser(threshold=100, executor=executor)
+            assert await parser.parse('filter=userName eq "bjensen"') == parse('filter=userName eq "bjensen"')
+            assert await parser.parse(large) == parse(large)
+            return parser.metrics()
+    metrics = asyncio.run(main())
+    assert (metrics.inline, metrics.offloaded, metrics.running, metrics.queued) == (1, 1, 0, 0)
+
+def test_coalesces_identical_requests():
+    async def main():
+        with ThreadPoolExecutor(2) as executor:
+            parser = AsyncParser(threshold=100, executor=executor, max_running=1)
+            other = large + " or title pr"
+            results = await asyncio.gather(*(parser.parse(f) for f in [large, large, other, large, other]))
+            return results, parser.metrics()
+    results, metrics = asyncio.run(main())
+    assert results[0] == results[1] == results[3] == parse(large)
+    assert results[2] == results[4]
+    assert (metrics.offloaded, metrics.coalesced, metrics.max_queued) == (2, 3, 2)
+
+def test_rejects_when_queue_is_full():
+    async def main():
+        with ThreadPoolExecutor(1) as executor:
+            parser = AsyncParser(threshold=100, executor=executor, max_running=1, max_queued=1)
+            filters = [f"{large} or x{i} pr" for i in range(3)]
+            results = await asyncio.gather(*(parser.parse(f) for f in filters), return_exceptions=True)
+            return results, parser.metrics()
+    results, metrics = asyncio.run(main())
+    assert type(results[2]) is asyncio.QueueFull
+    assert metrics.rejected == 1 and metrics.offloaded == 2
+
+def test_errors_propagate():
+    async def main():
+        async with AsyncParser(threshold=10) as parser:
+            with pytest.raises(ValueError) as e:
+                await parser.parse("filter=a pr b")
+            assert str(e.value) == f"{_unexpected_token} 12"
+            with pytest.raises(ValueError) as e:
+                await parser.parse(large + " and")
+        assert str(e.value) == _unexpected_end_of_input
+        assert await aparse("filter=title pr") == parse("filter=title pr")
+    asyncio.run(main())
+
+def test_configured_limits_apply_on_the_executor(monkeypatch):
+    monkeypatch.setattr(cache, "_default_cache", ParseCache(limits=Limits(max_length=100, max_depth=10)))
+    nested = "filter=" + "(" * 40 + "a pr" + ")" * 40
+
+    async def main():
+        with ThreadPoolExecutor(1) as executor:
+            parser = AsyncParser(threshold=50, executor=executor)
+            for f, message in [(large, f"{_input_too_long} 100"), (nested, f"{_nesting_too_deep} 17")]:
+                with pytest.raises(ValueError) as e:
+                    await parser.parse(f)
+                assert str(e.value) == message
+            return parser.metrics()
+    assert asyncio.run(main()).offloaded == 2
+
+def test_successive_event_loops():
+    with ThreadPoolExecutor(1) as executor:
+        parser = AsyncParser(threshold=100, executor=executor, max_running=1)
+
+        async def main(run :int):
+            # More filters than slots, so that they wait on the semaphore
+            filters = [f"{large} or run{run}x{i} pr" for i in range(3)]
+            return await asyncio.gather(*(parser.parse(f) for f in filters))
+        for run in range(2):
+            results = asyncio.run(main(run))
+            assert results[2] == parse(f"{large} or run{run}x2 pr")
+    metrics = parser.metrics()
+    assert (metrics.offloaded, metrics.running, metrics.queued) == (6, 0, 0)
+
+def test_loop_latency_report():
+    result = loop_latency([large] * 2, threshold=100)
+    assert set(result) == {"inline", "async"}
+    assert set(result["async"]) == {"p50_ms", "p99_ms"}
@@ -0,0 +1,64 @@
+import pytest
+from pathlib import Path
+from scim_filter_parser.lexer import Lexer
+from scim_filter_parser.parser import Parser
+from scim_filter_parser.batch import tokenize_many, parse_many, FilterError
+from scim_filter_parser import cache
+from scim_filter_parser.cache import ParseCache
+from scim_filter_parser.limits import Limits
+from scim_filter_parser.err_strings import _invalid_numeric_literal, _input_too_long, _nesting_too_deep
+
+def reference_examples():
+    with open(Path(__file__).parent.parent / "reference" / "example_querys.txt") as f:
+        return f.read().splitlines()
+
+def inputs():
+    return reference_examples() + ["filter=a eq 7x", "filter=(a pr) and b[c eq 7]"] + reference_examples()[:5]
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_tokenize_many_in_order(workers):
+    filters = inputs()
+    results = list(tokenize_many(filters, workers=workers, chunksize=4, cache_size=3))
+    assert len(results) == len(filters)
+    for f, result in zip(filters, results):
+        try:
+            tokens = tuple(Lexer(f))
+        except ValueError as e:
+            assert result == FilterError(str(e), int(str(e).rsplit(" ", 1)[1]))
+        else:
+            assert result.filter_str == f
+            assert result.materialize() == tokens
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parse_many_in_order(workers):
+    filters = inputs()
+    results = list(parse_many(iter(filters), workers=workers, chunksize=5))
+    for f, result in zip(filters, results):
+        try:
+            node = Parser(Lexer(f)).parse()
+        except ValueError as e:
+            assert type(result) is FilterError and result.message == str(e)
+        else:
+            assert result == node
+
+def test_errors_carry_position():
+    (result,) = parse_many(["filter=a eq 7x"], workers=1)
+    assert result == FilterError(f"{_invalid_numeric_literal} 13", 13)
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parse_many_applies_configured_limits(workers, monkeypatch):
+    monkeypatch.setattr(cache, "_default_cache", ParseCache(limits=Limits(max_length=100, max_depth=10)))
+    filters = ["filter=a pr", "filter=" + " or ".join(["a pr"] * 30), "filter=" + "(" * 20 + "a pr" + ")" * 20]
+    results = list(parse_many(filters, workers=workers, chunksize=1))
+    assert results == [
+        Parser(Lexer(filters[0])).parse(),
+        FilterError(f"{_input_too_long} 100", 100),
+        FilterError(f"{_nesting_too_deep} 17", 17),
+    ]
+
+def test_lazy():
+    def source():
+        yield "filter=a pr"
+        raise AssertionError("read past the first chunk")
+    results = parse_many(source(), workers=1, chunksize=1)
+    assert next(results) == Parser(Lexer("filter=a pr")).parse()
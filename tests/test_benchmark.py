@@ -0,0 +1,37 @@
+import json
+from scim_filter_parser.lexer import Lexer
+from scim_filter_parser.parser import Parser
+from scim_filter_parser.benchmark import workloads, run, compare, main
+
+def test_workloads_are_valid_filters():
+    for name, filters in workloads(scale=0.1).items():
+        for f in filters:
+            print(f"Testing {name} filter: {f[:60]}")
+            assert Parser(Lexer(f)).parse() is not None
+
+def test_compare_flags_regressions():
+    report = run(scale=0.05, min_time=0)
+    assert compare(report, report) == []
+    slower = json.loads(json.dumps(report))
+    name = next(iter(slower["results"]))
+    slower["results"][name]["filters_per_sec"] /= 2
+    assert compare(slower, report) == [
+        f"{name}: filters/sec {report['results'][name]['filters_per_sec']:.1f}"
+        f" -> {slower['results'][name]['filters_per_sec']:.1f}"
+    ]
+
+def test_main_writes_json(tmp_path, capsys):
+    output = tmp_path / "results.json"
+    assert main(["--scale", "0.05", "--min-time", "0", "--output", str(output)]) == 0
+    report = json.loads(output.read_text())
+    result = report["results"]["long_or_chain/lex_regex"]
+    assert set(result) == {
+        "filters", "tokens_per_sec", "filters_per_sec", "p50_ms", "p99_ms", "peak_memory_bytes"
+    }
+    assert "long_or_chain/lex_regex" in capsys.readouterr().out
+
+def test_validate_stage_reports_filters_only():
+    report = run(scale=0.05, min_time=0)
+    result = report["results"]["long_or_chain/validate"]
+    assert result["tokens_per_sec"] is None
+    assert result["filters_per_sec"] > 0
@@ -0,0 +1,84 @@
+import threading
+import pytest
+from scim_filter_parser.lexer import Lexer
+from scim_filter_parser.parser import Parser
+from scim_filter_parser.cache import ParseCache, CacheInfo
+from scim_filter_parser.err_strings import _unterminated_string
+
+def test_hits_misses_and_evictions():
+    cache = ParseCache(maxsize=2)
+    cache.tokenize('filter=userName eq "a"')
+    cache.tokenize('filter=userName eq "a"')
+    cache.tokenize('filter=userName eq "b"')
+    cache.tokenize('filter=userName eq "c"')
+    assert cache.cache_info() == CacheInfo(hits=1, misses=3, evictions=1, maxsize=2, currsize=2)
+
+def test_tokens_and_trees_share_the_bound():
+    cache = ParseCache(maxsize=3)
+    for i in range(4):
+        cache.tokenize(f"filter=a{i} pr")
+        cache.parse(f"filter=a{i} pr")
+        assert cache.cache_info().currsize <= 3
+    assert cache.cache_info() == CacheInfo(hits=0, misses=8, evictions=5, maxsize=3, currsize=3)
+    # The least recently used entries went first, whatever their kind
+    cache.parse("filter=a3 pr")
+    cache.tokenize("filter=a3 pr")
+    assert cache.cache_info().hits == 2
+
+def test_results_match_uncached():
+    cache = ParseCache()
+    f = 'filter=userType eq "Employee" and emails[type eq "work" and value co "@example.com"]'
+    for _ in range(2):
+        assert cache.tokenize(f) == tuple(Lexer(f))
+        assert cache.parse(f) == Parser(Lexer(f)).parse()
+    assert cache.cache_info().hits == 2
+
+def test_errors_are_not_cached():
+    cache = ParseCache()
+    for _ in range(2):
+        with pytest.raises(ValueError) as e:
+            cache.tokenize('filter=userName eq "a')
+        assert str(e.value) == _unterminated_string
+    assert cache.cache_info().currsize == 0
+
+def test_template_mode_shares_entries_between_literals():
+    cache = ParseCache(template=True)
+    filters = [
+        'filter=userName eq "bjensen" and meta.version gt 1',
+        'filter=userName eq "O\'Malley with spaces" and meta.version gt 123456',
+        'filter=userName eq "" and meta.version gt 42',
+        'filter=userName eq "say \\"hi\\"" and meta.version gt 7',
+    ]
+    for f in filters:
+        assert cache.tokenize(f) == tuple(Lexer(f))
+        assert cache.parse(f) == Parser(Lexer(f)).parse()
+    info = cache.cache_info()
+    assert info.misses == 1
+    assert info.currsize == 1
+
+def test_template_mode_falls_back_when_lexer_disagrees():
+    cache = ParseCache(template=True)
+    f = 'filter=title pr and 12 pr'
+    for _ in range(2):
+        assert cache.tokenize(f) == tuple(Lexer(f))
+
+def test_thread_safety():
+    cache = ParseCache(maxsize=8)
+    filters = [f'filter=id eq "{i}" or userName sw "u{i}"' for i in range(32)]
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(20):
+                for f in filters:
+                    assert cache.parse(f) == Parser(Lexer(f)).parse()
+        except AssertionError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert cache.cache_info().currsize <= 8
@@ -0,0 +1,93 @@
+import random
+import pytest
+np = pytest.importorskip("numpy")
+from scim_filter_parser.compiler import compile_filter
+from scim_filter_parser.optimizer import optimize
+from scim_filter_parser.columnar import compile_columnar, filter_indices
+from scim_filter_parser.err_strings import _invalid_comparison
+
+def make_users(count):
+    rnd = random.Random(5)
+    users = []
+    for i in range(count):
+        user = {
+            "userName": rnd.choice(["bjensen", "jsmith", "BJones", "alice"]) + str(i % 7),
+            "userType": rnd.choice(["Employee", "Intern", "Contractor", None]),
+            "loginCount": rnd.choice([0, 3, 12, 40, None]),
+            "active": rnd.choice([True, False]),
+        }
+        users.append({k: v for k, v in user.items() if v is not None})
+    return users
+
+def to_columns(users):
+    paths = ["userName", "userType", "loginCount", "active"]
+    columns = {path: np.array([u.get(path) for u in users], dtype=object) for path in paths}
+    columns["userName"] = np.array([u["userName"] for u in users])
+    columns["active"] = np.array([u["active"] for u in users])
+    return columns
+
+filters = [
+    'filter=userName eq "bjensen3"',
+    'filter=username sw "bj"',
+    'filter=userName co "Jon"',
+    'filter=userName ew "2"',
+    'filter=userType ne "Employee"',
+    'filter=userType pr',
+    'filter=userType eq null',
+    'filter=loginCount gt 3',
+    'filter=loginCount le 12 and active eq true',
+    'filter=active eq false or userType eq "Intern"',
+    'filter=not (userType eq "Intern" or loginCount lt 12) and userName gt "b"',
+    'filter=nickName pr or nickName eq "x"',
+    'filter=nickName ne "x"',
+]
+
+def test_matches_record_evaluation():
+    users = make_users(500)
+    columns = to_columns(users)
+    for f in filters:
+        print(f"Testing filter: {f}")
+        expected = [compile_filter(f)(u) for u in users]
+        assert compile_columnar(f)(columns).tolist() == expected
+
+def test_optimized_filters():
+    users = make_users(200)
+    columns = to_columns(users)
+    for f in filters + [
+        'filter=userType eq "Intern" or userType eq "employee" or userType eq null',
+        "filter=loginCount pr or not (loginCount pr)",
+        "filter=loginCount gt 3 and not (loginCount gt 3)",
+    ]:
+        expected = [compile_filter(f)(u) for u in users]
+        assert compile_columnar(optimize(f))(columns).tolist() == expected, f
+
+def test_filter_indices():
+    columns = {"userName": np.array(["a", "b", "a"]), "loginCount": np.array([1.0, np.nan, 5.0])}
+    assert filter_indices('filter=userName eq "A"', columns).tolist() == [0, 2]
+    assert filter_indices('filter=loginCount pr', columns).tolist() == [0, 2]
+    assert filter_indices('filter=loginCount eq null', columns).tolist() == [1]
+
+def test_non_ascii_strings_fold_like_record_evaluation():
+    users = [{"userName": name} for name in ["Straße", "STRASSE", "x", "İstanbul", "ǅemal"]]
+    columns = {"userName": np.array([u["userName"] for u in users])}
+    for f in [
+        'filter=userName eq "straße"',
+        'filter=userName eq "STRASSE"',
+        'filter=userName sw "i̇st"',
+        'filter=userName co "ǆ"',
+    ]:
+        expected = [compile_filter(f)(u) for u in users]
+        assert compile_columnar(f)(columns).tolist() == expected, f
+    assert compile_columnar('filter=userName eq "straße"')(columns).tolist() == [True, True, False, False, False]
+
+def test_value_path_reads_sub_attribute_columns():
+    columns = {
+        "name.givenName": np.array(["Barbara", "John"]),
+        "name.familyName": np.array(["Jensen", "Smith"]),
+    }
+    assert filter_indices('filter=name[givenName sw "b" and familyName pr]', columns).tolist() == [0]
+
+def test_invalid_comparison():
+    with pytest.raises(ValueError) as e:
+        compile_columnar('filter=active gt true')
+    assert str(e.value) == f"{_invalid_comparison} 17"
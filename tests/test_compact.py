@@ -0,0 +1,45 @@
+import pytest
+from pathlib import Path
+from scim_filter_parser.lexer import Lexer, Token, StringLiteralToken, ComparisonValueToken
+from scim_filter_parser.parser import Parser
+from scim_filter_parser.compact import tokenize_compact
+from scim_filter_parser.err_strings import _missing_space
+
+def reference_examples():
+    with open(Path(__file__).parent.parent / "reference" / "example_querys.txt") as f:
+        return f.read().splitlines()
+
+def test_matches_lexer():
+    for f in reference_examples() + ["filter=(a pr) and b[c eq 7]", "filter=a eq 7"]:
+        tokens = tuple(Lexer(f))
+        compact = tokenize_compact(f)
+        assert compact.materialize() == tokens
+        assert list(compact) == list(tokens)
+        assert list(tokens) == list(compact)
+        assert Parser(compact.materialize()).parse() == Parser(tokens).parse()
+
+def test_views_look_like_tokens():
+    compact = tokenize_compact('filter=userName eq "bjensen"')
+    assert len(compact) == 3
+    view = compact[-1]
+    assert isinstance(view, StringLiteralToken)
+    assert isinstance(view, ComparisonValueToken)
+    assert view.value == '"bjensen"'
+    assert view.position == 19
+    assert view == StringLiteralToken('"bjensen"', 19)
+    assert view.materialize() == StringLiteralToken('"bjensen"', 19)
+    assert type(compact[0].materialize()) is Token
+    assert repr(view) == "StringLiteralToken(value='\"bjensen\"', position=19)"
+
+def test_arrays():
+    compact = tokenize_compact("filter=title pr")
+    assert compact.kinds.typecode == "B"
+    assert compact.starts.typecode == compact.ends.typecode == "I"
+    assert list(compact.starts) == [7, 13]
+    assert list(compact.ends) == [12, 15]
+    assert compact.value(1) == "pr"
+
+def test_errors():
+    with pytest.raises(ValueError) as e:
+        tokenize_compact('filter=userType eq "Employee" and(emails.type eq "work")')
+    assert str(e.value) == f"{_missing_space} 33"
@@ -0,0 +1,94 @@
+import pytest
+from scim_filter_parser.lexer import Lexer
+from scim_filter_parser.parser import Parser
+from scim_filter_parser.compiler import compile_filter
+from scim_filter_parser.err_strings import _invalid_comparison
+
+bjensen = {
+    "schemas": ["urn:ietf:params:scim:schemas:core:2.0:User"],
+    "id": "2819c223",
+    "userName": "bjensen",
+    "name": {"familyName": "Jensen", "givenName": "Barbara"},
+    "title": "Tour Guide",
+    "userType": "Employee",
+    "active": True,
+    "loginCount": 12,
+    "emails": [
+        {"value": "bjensen@example.com", "type": "work", "primary": True},
+        {"value": "babs@jensen.org", "type": "home"},
+    ],
+    "meta": {"lastModified": "2011-05-13T04:42:34Z"},
+    "urn:ietf:params:scim:schemas:extension:enterprise:2.0:User": {
+        "employeeNumber": "701984",
+    },
+}
+
+matching_filters = [
+    'filter=userName eq "bjensen"',
+    'filter=USERNAME eq "BJensen"',
+    'filter=name.familyName co "ens"',
+    'filter=userName sw "bj"',
+    'filter=userName ew "sen"',
+    'filter=urn:ietf:params:scim:schemas:core:2.0:User:userName sw "b"',
+    'filter=urn:ietf:params:scim:schemas:extension:enterprise:2.0:User:employeeNumber eq "701984"',
+    'filter=title pr',
+    'filter=meta.lastModified gt "2011-05-13T04:42:33Z"',
+    'filter=meta.lastModified le "2011-05-13T04:42:34Z"',
+    'filter=loginCount ge 12',
+    'filter=active eq true',
+    'filter=nickName eq null',
+    'filter=title pr and userType eq "Employee"',
+    'filter=title pr or userType eq "Intern"',
+    'filter=userType ne "Intern" and not (emails co "example.org" or emails.value co "example.net")',
+    'filter=emails co "jensen.org"',
+    'filter=emails.type eq "home"',
+    'filter=emails[type eq "work" and value co "@example.com"]',
+    'filter=emails[primary eq true]',
+]
+
+non_matching_filters = [
+    'filter=userName eq "jsmith"',
+    'filter=nickName pr',
+    'filter=loginCount lt 12',
+    'filter=userName gt 3',
+    'filter=emails[type eq "home" and primary eq true]',
+    'filter=title pr and not (userType eq "Employee")',
+    'filter=urn:ietf:params:scim:schemas:extension:enterprise:2.0:User:employeeNumber eq "1"',
+]
+
+def test_matching_filters():
+    for f in matching_filters:
+        print(f"Testing filter: {f}")
+        assert compile_filter(f)(bjensen)
+
+def test_non_matching_filters():
+    for f in non_matching_filters:
+        print(f"Testing filter: {f}")
+        assert not compile_filter(f)(bjensen)
+
+def test_accepts_tokens_and_nodes():
+    f = 'filter=emails[type eq "work"]'
+    assert compile_filter(Lexer(f))(bjensen)
+    assert compile_filter(Parser(Lexer(f)).parse())(bjensen)
+
+def test_short_circuit():
+    calls = []
+
+    class Resource(dict):
+        def get(self, key, default=None):
+            calls.append(key)
+            return super().get(key, default)
+
+    match = compile_filter('filter=userName eq "x" and title pr')
+    assert not match(Resource(userName="y", title="z"))
+    assert calls == ["userName"]
+
+@pytest.mark.parametrize("filter_str, position", [
+    ('filter=active gt true', 17),
+    ('filter=active co null', 17),
+    ('filter=loginCount sw 1', 21),
+])
+def test_invalid_comparisons(filter_str, position):
+    with pytest.raises(ValueError) as e:
+        compile_filter(filter_str)
+    assert str(e.value) == f"{_invalid_comparison} {position}"
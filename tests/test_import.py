@@ -0,0 +1,58 @@
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+import scim_filter_parser
+
+src = str(Path(__file__).parent.parent / "src")
+
+# Generous, a cold import of everything parse() needs takes about 20ms
+import_budget_us = 150_000
+
+def import_profile(code :str) -> tuple[dict[str, int], set[str]]:
+    # Self import time in microseconds per module, and the modules loaded
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"{code}\nimport sys\nprint(' '.join(sys.modules))"],
+        capture_output=True, text=True, check=True, env={"PYTHONPATH": src},
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            self_us, _, name = line[len("import time:"):].split("|")
+            if self_us.strip().isdigit():
+                times[name.strip()] = int(self_us)
+    return times, set(result.stdout.split())
+
+def test_package_import_loads_no_submodules():
+    _, modules = import_profile("import scim_filter_parser")
+    assert sorted(m for m in modules if m.startswith("scim_filter_parser.")) == []
+
+def test_parse_loads_only_what_it_needs():
+    times, modules = import_profile("from scim_filter_parser import parse\nparse('filter=a pr')")
+    loaded = {m for m in modules if m.startswith("scim_filter_parser")}
+    assert loaded == {
+        "scim_filter_parser", "scim_filter_parser.cache", "scim_filter_parser.lazy",
+        "scim_filter_parser.lexer", "scim_filter_parser.parser",
+        "scim_filter_parser.operators", "scim_filter_parser.err_strings",
+    }
+    assert not {"numpy", "sqlite3", "asyncio", "concurrent.futures"} & modules
+    assert sum(t for name, t in times.items() if name.startswith("scim_filter_parser")) < import_budget_us
+
+def test_lazy_attributes():
+    assert scim_filter_parser.compile("filter=title pr")({"title": "x"})
+    assert "to_sql" in dir(scim_filter_parser)
+    with pytest.raises(AttributeError):
+        scim_filter_parser.does_not_exist
+
+def test_filter_indices_as_first_columnar_call():
+    pytest.importorskip("numpy")
+    code = (
+        "import numpy as np\n"
+        "from scim_filter_parser.columnar import filter_indices\n"
+        "print(filter_indices('filter=a pr', {'a': np.array(['x', ''])}).tolist())"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env={"PYTHONPATH": src},
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["[0]"]
@@ -0,0 +1,81 @@
+import io
+import random
+import pytest
+from pathlib import Path
+from scim_filter_parser.lexer import (
+    Lexer, Token, ComparisonOperatorToken, StringLiteralToken, LogicOperatorToken
+)
+from scim_filter_parser.incremental import IncrementalLexer, iter_tokens
+from scim_filter_parser.err_strings import _missing_space, _unterminated_string
+
+def collect_tokens(filter_str):
+    tokens = []
+    try:
+        for token in Lexer(filter_str):
+            tokens.append(token)
+    except ValueError as e:
+        tokens.append(str(e))
+    return tokens
+
+def collect_chunked(filter_str, rnd):
+    lexer = IncrementalLexer()
+    tokens = []
+    try:
+        i = 0
+        while i < len(filter_str):
+            size = rnd.randint(1, 8)
+            tokens += lexer.feed(filter_str[i:i+size])
+            i += size
+        tokens += lexer.close()
+    except ValueError as e:
+        tokens.append(str(e))
+    return tokens
+
+def test_reference_examples_in_random_chunks():
+    rnd = random.Random(7644)
+    with open(Path(__file__).parent.parent / "reference" / "example_querys.txt") as f:
+        for line in f.read().splitlines():
+            for _ in range(20):
+                assert collect_chunked(line, rnd) == collect_tokens(line)
+
+def test_random_input_in_random_chunks():
+    pieces = [
+        "a", "b.c", "eq", "pr", "and", "or", "not", "(", ")", "[", "]", "((", "))",
+        " ", "  ", '"x"', '"', "\\", "12", "7", "true", "false", "null", "tr", "\t",
+    ]
+    rnd = random.Random(7643)
+    for _ in range(3000):
+        f = "filter=" + "".join(rnd.choice(pieces) for _ in range(rnd.randint(0, 10)))
+        assert collect_chunked(f, rnd) == collect_tokens(f), f
+
+def test_tokens_are_emitted_as_soon_as_complete():
+    lexer = IncrementalLexer()
+    assert lexer.feed('filter=userName eq "bj') == [
+        Token("userName", 7), ComparisonOperatorToken("eq", 16)
+    ]
+    assert lexer.feed('ensen" and') == [StringLiteralToken('"bjensen"', 19)]
+    assert lexer.close() == [LogicOperatorToken("and", 29)]
+
+def test_buffer_stays_small_on_long_input():
+    clauses = (f'id eq "{i}"' for i in range(10000))
+    chunks = (("filter=" if i == 0 else " or ") + c for i, c in enumerate(clauses))
+    lexer = IncrementalLexer()
+    count = 0
+    for chunk in chunks:
+        count += len(lexer.feed(chunk))
+        assert len(lexer._buffer) < 32
+    count += len(lexer.close())
+    assert count == 10000 * 4 - 1
+
+def test_file_like_and_split_utf8():
+    data = 'filter=displayName eq "Zoë" and userName sw "J"'.encode("utf-8")
+    tokens = list(iter_tokens(io.BytesIO(data), chunk_size=1))
+    assert tokens == list(Lexer(data.decode("utf-8")))
+
+def test_errors_use_absolute_positions():
+    with pytest.raises(ValueError) as e:
+        list(iter_tokens(["filter=title pr and ", "(title pr)and x pr"]))
+    assert str(e.value) == f"{_missing_space} 29"
+    with pytest.raises(ValueError) as e:
+        list(iter_tokens(['filter=title eq "abc', "def"]))
+    assert str(e.value) == _unterminated_string
@@ -0,0 +1,128 @@
+import random
+import pytest
+from scim_filter_parser import parse
+from scim_filter_parser.compiler import compile_filter
+from scim_filter_parser.optimizer import optimize
+from scim_filter_parser.index import IndexedStore, _SortedKeys
+from scim_filter_parser.err_strings import _invalid_comparison
+
+values = ["abc", "ABD", "xabcx", "b", "", "2011-05-13T04:42:34Z", "2012-01-01T00:00:00Z", 0, 1, 2.5, True, None]
+indexed_paths = ["userName", "title", "tags", "emails", "emails.type", "meta.lastModified"]
+
+def random_resource(rng :random.Random) -> dict:
+    resource = {}
+    for attr in ["userName", "title", "nickName"]:
+        if rng.random() < 0.8:
+            resource[attr] = rng.choice(values)
+    if rng.random() < 0.8:
+        resource["tags"] = [rng.choice(values) for _ in range(rng.randint(0, 3))]
+    if rng.random() < 0.8:
+        resource["emails"] = [{"type": rng.choice(values), "value": rng.choice(values)} for _ in range(rng.randint(0, 2))]
+    if rng.random() < 0.5:
+        resource["meta"] = {"lastModified": rng.choice(values)}
+    return resource
+
+def random_filter(rng :random.Random, depth :int = 0) -> str:
+    choice = rng.random()
+    if depth < 3 and choice < 0.3:
+        op = rng.choice(["and", "or"])
+        return "(" + f" {op} ".join(random_filter(rng, depth + 1) for _ in range(rng.randint(2, 3))) + ")"
+    if depth < 3 and choice < 0.4:
+        return f"not ({random_filter(rng, depth + 1)})"
+    if choice < 0.45:
+        return f'emails[type eq "abc" and value pr]'
+    attr = rng.choice(indexed_paths + ["nickName"])
+    if rng.random() < 0.15:
+        return f"{attr} pr"
+    op = rng.choice(["eq", "ne", "co", "sw", "ew", "gt", "ge", "lt", "le"])
+    literals = ['"abc"', '"ab"', '"AB"', '"x"', '""', '"2011-05-13T04:42:34Z"', '"2011"', '"cx"']
+    if op not in ("co", "sw", "ew"):
+        literals += ["0", "1", "2"]
+    if op in ("eq", "ne"):
+        literals += ["true", "null"]
+    return f"{attr} {op} {rng.choice(literals)}"
+
+def test_matches_compiler():
+    rng = random.Random(3)
+    store = IndexedStore(indexed_paths)
+    for i in range(300):
+        store.insert(i, random_resource(rng))
+    for i in range(0, 300, 3):
+        store.update(i, random_resource(rng))
+    for i in range(1, 300, 7):
+        store.delete(i)
+    for _ in range(400):
+        filter_str = "filter=" + random_filter(rng)
+        match = compile_filter(filter_str)
+        expected = {i for i in range(300) if i in store and match(store.get(i))}
+        assert store.ids(filter_str) == expected, filter_str
+        assert store.ids(optimize(filter_str)) == expected, filter_str
+
+def test_writes_between_range_queries():
+    rng = random.Random(13)
+    store = IndexedStore(["userName", "title"])
+    resources = {}
+    for i in range(200):
+        resource = {"userName": f"u{rng.randrange(50)}", "title": rng.choice([rng.randrange(20), "t" + str(rng.randrange(20))])}
+        if i in resources and rng.random() < 0.3:
+            store.delete(i)
+            del resources[i]
+        elif i in resources:
+            store.update(i, resource)
+        else:
+            store.insert(i, resource)
+        resources[i] = resource
+        i = rng.randrange(200)
+        for filter_str in ['filter=userName gt "u3"', 'filter=userName ew "7"', 'filter=title le 9', 'filter=title sw "t1"']:
+            match = compile_filter(filter_str)
+            assert store.ids(filter_str) == {k for k, v in resources.items() if match(v)}, filter_str
+
+def test_bulk_load_is_linear(monkeypatch):
+    # Each re-sort of the keys, with the number of keys pending. Sorting on
+    # every insert, or inserting into the sorted list, would be quadratic
+    resorts = []
+    sorted_keys = _SortedKeys.sorted
+
+    def counting_sorted(self) -> list:
+        if self._added or self._removed:
+            resorts.append(len(self._added) + len(self._removed))
+        return sorted_keys(self)
+    monkeypatch.setattr(_SortedKeys, "sorted", counting_sorted)
+    for n in [1000, 8000]:
+        resorts.clear()
+        # Keys in random order, so that each new key lands inside the sorted index
+        keys = random.Random(n).sample(range(10 * n), n)
+        store = IndexedStore(["title"])
+        for i, key in enumerate(keys):
+            store.insert(i, {"title": key})
+        assert store._indexes["title"].numbers._keys == []
+        assert len(store.ids("filter=title ge 0")) == n
+        assert len(store.ids("filter=title lt 100")) == len([key for key in keys if key < 100])
+        assert resorts == [n]
+
+def test_uses_indexes():
+    store = IndexedStore(["userName", "title"])
+    store.insert("a", {"userName": "bjensen", "title": "Tour Guide"})
+    store.insert("b", {"userName": "jsmith"})
+    assert store._candidates(parse('filter=userName sw "BJ" or not (title pr)')) == {"a", "b"}
+    assert store._candidates(parse('filter=title co "our" and nickName pr')) == set()
+    assert store._candidates(parse('filter=nickName pr or title pr')) is None
+    assert store.search('filter=title ew "guide" and userName ne "x"') == [{"userName": "bjensen", "title": "Tour Guide"}]
+
+def test_updates_indexes():
+    store = IndexedStore(["userName"])
+    store.insert("a", {"userName": "bjensen"})
+    with pytest.raises(KeyError):
+        store.insert("a", {"userName": "bjensen"})
+    store.update("a", {"userName": "babs"})
+    assert store.ids('filter=userName co "jen"') == set()
+    assert store.ids('filter=userName eq "BABS"') == {"a"}
+    store.delete("a")
+    assert store.ids('filter=userName eq null') == set()
+    assert len(store) == 0
+
+def test_invalid_comparison():
+    store = IndexedStore(["userName"])
+    with pytest.raises(ValueError) as e:
+        store.ids("filter=userName co 1")
+    assert str(e.value) == f"{_invalid_comparison} 19"
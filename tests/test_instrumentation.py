@@ -0,0 +1,74 @@
+import pytest
+from scim_filter_parser.cache import ParseCache
+from scim_filter_parser.compiler import compile_filter
+from scim_filter_parser.instrumentation import (
+    Observer, Recorder, observing, set_observer, error_category, state_characters
+)
+from scim_filter_parser.lexer import Lexer
+import scim_filter_parser.instrumentation as instrumentation
+
+def test_off_by_default():
+    assert instrumentation.observer is None
+    assert set_observer(None) is None
+
+def test_state_characters():
+    f = 'filter=userName eq  "bjensen" and (age gt 12 or active eq true)'
+    counts = state_characters(f, tuple(Lexer(f)))
+    assert counts == {
+        "Filter": len(f) - len("filter=") - 9 - 2 - 4 - 4,
+        "ComparisonValue": 4,
+        "StringLiteral": 9,
+        "NumericLiteral": 2,
+        "TrueLiteral": 4,
+        "FalseLiteral": 0,
+        "NullLiteral": 0,
+    }
+
+def test_error_category():
+    for f, category in [
+        ("filter=a eq 1x", "invalid_numeric_literal"),
+        ('filter=a eq "x', "unterminated_string"),
+        ("filter=a pr b", "unexpected_token"),
+        ("filter=a eq", "unexpected_end_of_input"),
+        ("", "other"),
+    ]:
+        with pytest.raises(ValueError) as e:
+            ParseCache().parse(f)
+        assert error_category(e.value) == category
+
+def test_recorder():
+    cache = ParseCache()
+    with observing(Recorder(keep_slowest=2)) as recorder:
+        cache.parse('filter=userName eq "bjensen"')
+        cache.parse('filter=userName eq "bjensen"')
+        cache.parse("filter=title pr or userType eq null")
+        with pytest.raises(ValueError):
+            cache.parse("filter=a pr b")
+        match = compile_filter(cache.parse("filter=title pr"))
+        assert match({"title": "x"})
+    assert instrumentation.observer is None
+    data = recorder.to_dict()
+    assert data["histograms"]["lex_seconds"]["count"] == 4
+    assert data["histograms"]["parse_seconds"]["count"] == 3
+    assert data["histograms"]["evaluate_seconds"]["count"] == 1
+    assert data["histograms"]["filter_tokens"]["buckets"][4] == 3
+    assert data["cache"] == {"hit": 1, "miss": 4}
+    assert data["errors"] == [{"stage": "parse", "category": "unexpected_token", "count": 1}]
+    assert data["state_characters"]["NullLiteral"] == 4
+    assert len(recorder.slowest()) == 2
+    text = recorder.to_prometheus()
+    assert 'scim_filter_filter_tokens_bucket{le="+Inf"} 4\n' in text
+    assert 'scim_filter_cache_lookups_total{result="hit"} 1\n' in text
+    assert 'scim_filter_errors_total{stage="parse",category="unexpected_token"} 1\n' in text
+
+def test_custom_observer():
+    class Slow(Observer):
+        def __init__(self):
+            self.filters = []
+
+        def lexed(self, filter_str, tokens, seconds):
+            self.filters.append((filter_str, len(tokens)))
+
+    with observing(Slow()) as slow:
+        ParseCache().tokenize("filter=a pr")
+    assert slow.filters == [("filter=a pr", 2)]
@@ -0,0 +1,100 @@
+import json
+import mmap
+import random
+import pytest
+from scim_filter_parser.compiler import compile_filter
+from scim_filter_parser.jsonbytes import compile_json, filter_json_lines
+from scim_filter_parser.err_strings import _invalid_json
+
+enterprise = "urn:ietf:params:scim:schemas:extension:enterprise:2.0:User"
+values = ["abc", "ABC", "a}b]\"c", "", 0, 7, 2.5, True, False, None, [], {}]
+
+def random_resource(rng :random.Random) -> dict:
+    resource = {}
+    for attr in ["userName", "UserName", "title", "active", "nickName"]:
+        if rng.random() < 0.5:
+            resource[attr] = rng.choice(values)
+    if rng.random() < 0.7:
+        resource["emails"] = [{"type": rng.choice(values), "value": rng.choice(values)} for _ in range(rng.randint(0, 2))]
+    if rng.random() < 0.5:
+        resource["name"] = {"givenName": rng.choice(values), "nested": {"deep": [rng.choice(values)]}}
+    if rng.random() < 0.3:
+        resource[enterprise] = {"employeeNumber": rng.choice(values)}
+    if rng.random() < 0.3:
+        resource["tags"] = [rng.choice(values) for _ in range(rng.randint(0, 3))]
+    return resource
+
+def random_filter(rng :random.Random, depth :int = 0) -> str:
+    choice = rng.random()
+    if depth < 3 and choice < 0.3:
+        op = rng.choice(["and", "or"])
+        return "(" + f" {op} ".join(random_filter(rng, depth + 1) for _ in range(rng.randint(2, 3))) + ")"
+    if depth < 3 and choice < 0.4:
+        return f"not ({random_filter(rng, depth + 1)})"
+    if choice < 0.45:
+        return 'emails[type eq "abc" or value pr]'
+    attr = rng.choice([
+        "userName", "username", "title", "active", "nickName", "emails", "emails.type",
+        "name.givenName", "tags", "missing", f"{enterprise}:employeeNumber",
+    ])
+    if rng.random() < 0.2:
+        return f"{attr} pr"
+    op = rng.choice(["eq", "ne", "co", "sw", "gt", "le"])
+    literals = ['"abc"', '"a"', '""', '"c"']
+    if op not in ("co", "sw"):
+        literals += ["0", "7"]
+    if op in ("eq", "ne"):
+        literals += ["true", "null"]
+    return f"{attr} {op} {rng.choice(literals)}"
+
+def test_matches_compiler():
+    rng = random.Random(19)
+    resources = [random_resource(rng) for _ in range(200)]
+    encoded = [json.dumps(resource, indent=rng.choice([None, 1])).encode() for resource in resources]
+    for _ in range(300):
+        filter_str = "filter=" + random_filter(rng)
+        match = compile_filter(filter_str)
+        match_json = compile_json(filter_str)
+        for resource, data in zip(resources, encoded):
+            assert match_json(data) == match(resource), (filter_str, data)
+
+def test_skips_and_short_circuits():
+    # Nothing after the deciding member is read
+    data = b'{"userName": "bjensen", "photos": [{"x": "]}"}], "title": nope, "emails": [tru'
+    assert compile_json('filter=userName eq "BJENSEN"')(data)
+    assert not compile_json('filter=userName eq "x" and title eq "y"')(data)
+    with pytest.raises(ValueError):
+        compile_json('filter=title eq "y"')(data)
+
+def test_escaped_keys_and_offsets():
+    data = b'xx{"user\\u004eame" : "a\\"b" , "n":1}yy'
+    assert compile_json('filter=userName eq "a\\"b"')(data, 2, len(data) - 2)
+    assert compile_json("filter=n eq 1")(data, 2, len(data) - 2)
+    assert compile_json("filter=missing pr or n pr")(b" { } ") is False
+
+def test_invalid_json():
+    match = compile_json("filter=b pr")
+    for data, offset in [(b"[1]", 0), (b'{"a" 1}', 1), (b'{"a": 1 "b": 2}', 7), (b'{"a": [1}', 8), (b'{"b": tru}', 6)]:
+        with pytest.raises(ValueError) as e:
+            match(data)
+        assert str(e.value) == f"{_invalid_json} {offset}"
+
+def test_json_lines(tmp_path):
+    path = tmp_path / "users.jsonl"
+    lines = [json.dumps({"userName": name, "active": i % 2 == 0}) for i, name in enumerate(["a", "b", "c", "d"])]
+    path.write_text("\n".join(lines[:2]) + "\n\n  \n" + "\n".join(lines[2:]) + "\n")
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        found = list(filter_json_lines("filter=active eq true", data))
+    assert found == [lines[0].encode(), lines[2].encode()]
+    assert list(filter_json_lines('filter=userName eq "d"', lines[3].encode())) == [lines[3].encode()]
+
+def test_skipped_subtrees_are_not_decoded():
+    # Brackets inside strings do not count, and the skipped members are not
+    # valid JSON, so decoding them would fail
+    groups = b", ".join(b'{"display": "g]}\\"[{", "value": [nope, {"x": [undefined]}]}' for _ in range(5000))
+    data = b'{"groups": [' + groups + b'], "meta": {"a": {"b": [[[{}]]]}}, "userName": "bjensen"}'
+    assert compile_json('filter=userName eq "bjensen"')(data)
+    assert not compile_json('filter=userName eq "bjensen" and title pr')(data)
+    with pytest.raises(ValueError):
+        compile_json("filter=groups pr")(data)
+    assert compile_json('filter=name.givenName eq "Zoë"')('{"photos": ["ü]"], "name": {"givenName": "zoë"}}')
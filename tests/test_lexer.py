@@ -1,3 +1,4 @@
+import random
 import pytest
 from scim_filter_parser.lexer import (
     Lexer, Token, 
@@ -323,4 +324,81 @@ def test_truncated_string_literal():
     lexer = Lexer(f)
     with pytest.raises(ValueError) as e:
         _ = [x for x in lexer]
-        assert str(e) == _unterminated_string
\ No newline at end of file
+        assert str(e) == _unterminated_string
+
+
+def test_nested_precedence_groups():
+    f = 'filter=((title pr) or userType eq 1) and emails[primary eq true]'
+    lexer = Lexer(f)
+    tokens = [x for x in lexer]
+    assert tokens == [
+        PrecedenceGroupStartToken("(", 7),
+        PrecedenceGroupStartToken("(", 8),
+        Token("title", 9),
+        PresenceOperatorToken("pr", 15),
+        PrecedenceGroupEndToken(")", 17),
+        LogicOperatorToken("or", 19),
+        Token("userType", 22),
+        ComparisonOperatorToken("eq", 31),
+        NumericLiteralToken("1", 34),
+        PrecedenceGroupEndToken(")", 35),
+        LogicOperatorToken("and", 37),
+        Token("emails", 41),
+        ComplexFilterGroupStartToken("[", 47),
+        Token("primary", 48),
+        ComparisonOperatorToken("eq", 56),
+        TrueLiteralToken("true", 59),
+        ComplexFilterGroupEndToken("]", 63),
+    ]
+
+def test_missing_space_after_logic_group_close():
+    f = 'filter=(title pr)and userType eq 1'
+    lexer = Lexer(f)
+    with pytest.raises(ValueError) as e:
+        _ = [x for x in lexer]
+    assert str(e.value) == f"{_missing_space} 16"
+
+def collect_tokens(filter_str, engine):
+    tokens = []
+    try:
+        for token in Lexer(filter_str, engine):
+            tokens.append(token)
+    except ValueError as e:
+        tokens.append(str(e))
+    return tokens
+
+engine_examples = list(valid_examples_from_rfc) + [
+    'filter=emails [type eq "work" and value co "@example.com"]',
+    'filter=emails[ type eq "work" and value co "@example.com"]',
+    'filter=emails[type eq "work" and value co "@example.com" ]',
+    'filter=emails[type eq "work"]and value co "@example.com"',
+    'filter=userType eq "Employee" and(emails.type eq "work")',
+    'filter=userType eq "Employee" and ( emails.type eq "work")',
+    'filter=userType eq 7657',
+    'filter=userType eq 7657sa387090',
+    'filter=userType eq 7',
+    'filter=userType eq true',
+    'filter=userType eq tr ',
+    'filter=userType eq trello',
+    'filter=userType eq flase',
+    'filter=userType eq nu   ',
+    'filter=userType eq "Hello the',
+    'filter=userType eq "Say \\"hi\\""',
+    'filter=((title pr) or userType eq 1) and emails[primary eq true]',
+    'filter=(title pr)and userType eq 1',
+]
+
+def test_regex_engine_matches_character_engine():
+    for f in engine_examples:
+        print(f"Testing example filter: {f}")
+        assert collect_tokens(f, Lexer.Engine.Regex) == collect_tokens(f, Lexer.Engine.Character)
+
+def test_regex_engine_matches_character_engine_on_random_input():
+    pieces = [
+        "a", "b.c", "eq", "pr", "and", "or", "not", "(", ")", "[", "]", "((", "))",
+        " ", "  ", '"x"', '"', "\\", "12", "7", "true", "false", "null", "tr", "\t",
+    ]
+    rnd = random.Random(7644)
+    for _ in range(5000):
+        f = "filter=" + "".join(rnd.choice(pieces) for _ in range(rnd.randint(1, 10)))
+        assert collect_tokens(f, Lexer.Engine.Regex) == collect_tokens(f, Lexer.Engine.Character), f
@@ -0,0 +1,42 @@
+import pytest
+from scim_filter_parser.cache import ParseCache
+from scim_filter_parser.limits import Limits, parse, tokenize
+from scim_filter_parser.err_strings import (
+    _input_too_long, _too_many_tokens, _nesting_too_deep, _literal_too_long, _time_budget_exceeded
+)
+
+def test_within_limits():
+    f = 'filter=((userName eq "bjensen")) and emails[value ew "example.com"]'
+    assert parse(f) == ParseCache().parse(f)
+    assert tokenize(f, Limits(None, None, None, None, None)) == ParseCache().tokenize(f)
+
+@pytest.mark.parametrize("f, limits, message", [
+    ("filter=" + "a pr or " * 10 + "a pr", Limits(max_length=50), f"{_input_too_long} 50"),
+    ("filter=a pr or b pr or c pr", Limits(max_tokens=5), f"{_too_many_tokens} 20"),
+    ("filter=(((a pr)))", Limits(max_depth=2), f"{_nesting_too_deep} 9"),
+    ("filter=(a pr) and emails[(b pr)]", Limits(max_depth=1), f"{_nesting_too_deep} 25"),
+    ('filter=a eq "12345" or b eq "123456"', Limits(max_literal_length=5), f"{_literal_too_long} 28"),
+    ("filter=a eq 123456", Limits(max_literal_length=5), f"{_literal_too_long} 12"),
+    ("filter=a pr", Limits(max_seconds=-1), f"{_time_budget_exceeded} 7"),
+])
+def test_limits_exceeded(f, limits, message):
+    with pytest.raises(ValueError) as e:
+        parse(f, limits)
+    assert str(e.value) == message
+    for template in (False, True):
+        with pytest.raises(ValueError) as e:
+            ParseCache(template=template, limits=limits).parse(f)
+        assert str(e.value) == message
+
+def test_fails_before_lexing_everything():
+    f = "filter=" + "(" * 100000 + "a pr" + ")" * 100000
+    with pytest.raises(ValueError) as e:
+        parse(f, Limits(max_length=None))
+    assert str(e.value) == f"{_nesting_too_deep} {7 + 64}"
+
+def test_template_checks_new_literals():
+    cache = ParseCache(template=True, limits=Limits(max_literal_length=3))
+    cache.tokenize('filter=a eq "abc"')
+    with pytest.raises(ValueError) as e:
+        cache.tokenize('filter=a eq "abcd"')
+    assert str(e.value) == f"{_literal_too_long} 12"
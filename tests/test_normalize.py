@@ -0,0 +1,55 @@
+from pathlib import Path
+import pytest
+from scim_filter_parser import parse
+from scim_filter_parser.optimizer import optimize
+from scim_filter_parser.normalize import normalize, canonical_string, canonical_hash
+
+user_schema = "urn:ietf:params:scim:schemas:core:2.0:User"
+
+def reference_examples():
+    with open(Path(__file__).parent.parent / "reference" / "example_querys.txt") as f:
+        return f.read().splitlines()
+
+def test_equivalent_filters():
+    equivalent = [
+        'filter=title pr and userType eq "x"',
+        'filter=userType eq "x" and title pr',
+        'filter=((userType eq "x")) and (title pr)',
+        'filter=TITLE pr and not (not (UserType eq "x"))',
+        'filter=urn:ietf:params:scim:schemas:core:2.0:User:title pr and userType eq "x" and title pr',
+    ]
+    expected = canonical_string(equivalent[0], user_schema)
+    assert expected == 'filter=title pr and usertype eq "x"'
+    for f in equivalent:
+        assert canonical_string(f, user_schema) == expected
+        assert canonical_hash(f, user_schema) == canonical_hash(equivalent[0], user_schema)
+
+def test_flattening_keeps_precedence():
+    assert canonical_string("filter=c pr and (b pr or (a pr or d pr))") == "filter=(a pr or b pr or d pr) and c pr"
+    assert canonical_string("filter=(c pr and b pr) or a pr") == "filter=a pr or b pr and c pr"
+    assert canonical_string("filter=not (b pr and a pr)") == "filter=not (a pr and b pr)"
+    assert canonical_string('filter=emails[value co "x" and type eq "work"]') == \
+        'filter=emails[type eq "work" and value co "x"]'
+
+def test_different_filters():
+    assert canonical_hash('filter=userName eq "a"') != canonical_hash('filter=userName eq "A"')
+    assert canonical_hash("filter=a pr and b pr") != canonical_hash("filter=a pr or b pr")
+    assert canonical_string(f"filter={user_schema}:userName pr") == f"filter={user_schema.lower()}:username pr"
+    other = "urn:ietf:params:scim:schemas:extension:enterprise:2.0:User:employeeNumber pr"
+    assert canonical_string(f"filter={other}", user_schema) == f"filter={other.lower()}"
+
+def test_canonical_string_round_trips():
+    for f in reference_examples():
+        canonical = canonical_string(f)
+        assert normalize(parse(canonical)) == normalize(f)
+        assert canonical_string(canonical) == canonical
+        assert 0 <= canonical_hash(f) < 2 ** 64
+
+def test_optimized_filters():
+    f = 'filter=userType eq "Intern" or title pr or userType eq "Employee" or userType eq null'
+    assert type(optimize(f)).__name__ == "LogExp"
+    assert normalize(optimize(f)) == normalize(f)
+    assert canonical_string(optimize(f)) == canonical_string(f)
+    assert canonical_string(optimize('filter=a eq 1 or a eq 1')) == "filter=a eq 1"
+    with pytest.raises(TypeError):
+        canonical_string(optimize("filter=title pr or not (title pr)"))
@@ -0,0 +1,94 @@
+import random
+import pytest
+from scim_filter_parser.parser import LogExp, In, Constant, AttrExp, Present
+from scim_filter_parser.compiler import compile_filter
+from scim_filter_parser.optimizer import optimize, Optimizer, AttributeHint
+from scim_filter_parser.err_strings import _invalid_comparison
+
+hints = {
+    "id": AttributeHint(selectivity=0.001, single_valued=True),
+    "level": AttributeHint(single_valued=True),
+    "description": AttributeHint(cost=5.0),
+    "emails[type]": AttributeHint(single_valued=True),
+}
+
+def test_reorders_by_selectivity_and_cost():
+    node = optimize('filter=description co "x" and id eq "2819c223"', hints)
+    assert [operand.attr_path for operand in node.operands] == ["id", "description"]
+    node = optimize('filter=id eq "2819c223" or level eq 1', hints)
+    assert [operand.attr_path for operand in node.operands] == ["level", "id"]
+
+def test_folds_constants():
+    assert optimize("filter=level eq 1 and level eq 2", hints) == Constant(False, 7)
+    assert type(optimize('filter=tags eq "a" and tags eq "b"', hints)) is LogExp
+    assert optimize('filter=level eq 1 and level eq 2 or title pr', hints) == Present("title", 36)
+    assert optimize("filter=title pr or not (title pr)") == Constant(True, 7)
+    assert optimize("filter=level eq 1 and level ne 1") == Constant(False, 7)
+    assert optimize("filter=not (not (title pr))") == Present("title", 17)
+    assert optimize('filter=emails[type eq "work" and type eq "home"]', hints) == Constant(False, 14)
+
+def test_merges_eq_chains():
+    node = optimize('filter=userName eq "a" or userName eq "b" or title pr or userName eq 3')
+    assert type(node) is LogExp and node.op == "or"
+    (merged,) = [operand for operand in node.operands if type(operand) is In]
+    assert [v.value for v in merged.values] == ['"a"', '"b"', "3"]
+
+def test_hoists_common_operands():
+    node = optimize('filter=title pr and userName eq "a" or title pr and nickName eq "b"')
+    assert node.op == "and"
+    assert Present("title", 7) in node.operands
+    node = optimize('filter=title pr or title pr and nickName eq "b"')
+    assert node == Present("title", 7)
+    node = optimize('filter=title pr and title eq "x"')
+    assert type(node) is AttrExp and node.position == 20
+
+def test_keeps_invalid_comparisons():
+    with pytest.raises(ValueError) as e:
+        optimize("filter=title co 1 and title pr and not (title pr)")
+    assert str(e.value) == f"{_invalid_comparison} 16"
+
+def random_filter(rng :random.Random, depth :int = 0, in_value_path :bool = False) -> str:
+    choice = rng.random()
+    if depth < 3 and choice < 0.35:
+        op = rng.choice(["and", "or"])
+        return "(" + f" {op} ".join(random_filter(rng, depth + 1, in_value_path) for _ in range(rng.randint(2, 4))) + ")"
+    if depth < 3 and choice < 0.45:
+        return f"not ({random_filter(rng, depth + 1, in_value_path)})"
+    if not in_value_path and depth < 3 and choice < 0.5:
+        return f"emails[{random_filter(rng, depth + 1, True)}]"
+    attr = rng.choice(["type", "value"] if in_value_path else ["level", "title", "tags", "emails", "emails.type"])
+    if rng.random() < 0.15:
+        return f"{attr} pr"
+    op = rng.choice(["eq", "eq", "eq", "ne", "co", "sw", "gt", "le"])
+    if op in ("co", "sw") or rng.random() < 0.6:
+        literal = rng.choice(['"a"', '"A"', '"b"', '"ab"', '""'])
+    else:
+        literal = rng.choice(["0", "1", "2", "true", "null"] if op in ("eq", "ne") else ["0", "1", "2"])
+    return f"{attr} {op} {literal}"
+
+def random_resource(rng :random.Random) -> dict:
+    values = ["a", "A", "b", "ab", "", 0, 1, 2, True, None]
+    resource = {}
+    if rng.random() < 0.8:
+        resource["level"] = rng.choice(values)
+    if rng.random() < 0.8:
+        resource["title"] = rng.choice(values)
+    if rng.random() < 0.8:
+        resource["tags"] = [rng.choice(values) for _ in range(rng.randint(0, 3))]
+    if rng.random() < 0.8:
+        resource["emails"] = [
+            {"type": rng.choice(values), "value": rng.choice(values)}
+            for _ in range(rng.randint(0, 3))
+        ]
+    return resource
+
+def test_equivalent_to_unoptimized():
+    rng = random.Random(12)
+    resources = [random_resource(rng) for _ in range(200)]
+    optimizers = [Optimizer(), Optimizer(hints), Optimizer({"level": AttributeHint(selectivity=0.9, cost=0.1)})]
+    for _ in range(300):
+        filter_str = "filter=" + random_filter(rng)
+        expected = [compile_filter(filter_str)(r) for r in resources]
+        for optimizer in optimizers:
+            match = compile_filter(optimizer.optimize(filter_str))
+            assert [match(r) for r in resources] == expected, filter_str
@@ -0,0 +1,111 @@
+import pytest
+from pathlib import Path
+from scim_filter_parser.lexer import (
+    Lexer, NumericLiteralToken, StringLiteralToken, TrueLiteralToken
+)
+from scim_filter_parser.parser import (
+    Parser, Present, AttrExp, LogExp, Not, ValuePath, split_attr_path
+)
+from scim_filter_parser.err_strings import (
+    _unexpected_end_of_input,
+    _unexpected_token,
+    _invalid_attribute_path,
+    _nesting_too_deep
+)
+
+def parse(filter_str):
+    return Parser(Lexer(filter_str)).parse()
+
+valid_examples = {
+    'filter=userName eq "bjensen"':
+        AttrExp("userName", "eq", StringLiteralToken('"bjensen"', 19), 7),
+    'filter=title pr':
+        Present("title", 7),
+    'filter=title pr and userType eq "Employee"':
+        LogExp("and", (
+            Present("title", 7),
+            AttrExp("userType", "eq", StringLiteralToken('"Employee"', 32), 20),
+        ), 7),
+    'filter=userType ne "Employee" and not (emails co "example.com" or emails.value co "example.org")':
+        LogExp("and", (
+            AttrExp("userType", "ne", StringLiteralToken('"Employee"', 19), 7),
+            Not(LogExp("or", (
+                AttrExp("emails", "co", StringLiteralToken('"example.com"', 49), 39),
+                AttrExp("emails.value", "co", StringLiteralToken('"example.org"', 82), 66),
+            ), 39), 34),
+        ), 7),
+    'filter=emails[type eq "work" and value co "@example.com"] or ims[type eq "xmpp" and value co "@foo.com"]':
+        LogExp("or", (
+            ValuePath("emails", LogExp("and", (
+                AttrExp("type", "eq", StringLiteralToken('"work"', 22), 14),
+                AttrExp("value", "co", StringLiteralToken('"@example.com"', 42), 33),
+            ), 14), 7),
+            ValuePath("ims", LogExp("and", (
+                AttrExp("type", "eq", StringLiteralToken('"xmpp"', 73), 65),
+                AttrExp("value", "co", StringLiteralToken('"@foo.com"', 93), 84),
+            ), 65), 61),
+        ), 7),
+    'filter=(a pr or b pr) and c eq 7':
+        LogExp("and", (
+            LogExp("or", (Present("a", 8), Present("b", 16)), 8),
+            AttrExp("c", "eq", NumericLiteralToken("7", 31), 26),
+        ), 8),
+    'filter=emails[primary eq true]':
+        ValuePath("emails", AttrExp("primary", "eq", TrueLiteralToken("true", 25), 14), 7),
+}
+
+def test_valid_examples():
+    for k, v in valid_examples.items():
+        print(f"Testing example filter: {k}")
+        assert parse(k) == v
+
+def test_reference_examples_parse():
+    with open(Path(__file__).parent.parent / "reference" / "example_querys.txt") as f:
+        for line in f.read().splitlines():
+            assert parse(line) is not None
+
+def test_and_binds_tighter_than_or():
+    node = parse("filter=a pr or b pr and c pr or d pr")
+    assert node == LogExp("or", (
+        Present("a", 7),
+        LogExp("and", (Present("b", 15), Present("c", 24)), 15),
+        Present("d", 32),
+    ), 7)
+
+def test_urn_attribute_path():
+    node = parse('filter=urn:ietf:params:scim:schemas:core:2.0:User:name.givenName sw "J"')
+    assert split_attr_path(node.attr_path) == (
+        "urn:ietf:params:scim:schemas:core:2.0:User", "name", "givenName"
+    )
+
+@pytest.mark.parametrize("filter_str, message", [
+    ("filter=title", _unexpected_end_of_input),
+    ("filter=title eq", _unexpected_end_of_input),
+    ("filter=(title pr", _unexpected_end_of_input),
+    ("filter=title pr)", f"{_unexpected_token} 15"),
+    ("filter=title pr title pr", f"{_unexpected_token} 16"),
+    ("filter=and pr", f"{_unexpected_token} 7"),
+    ("filter=not title pr", f"{_unexpected_token} 11"),
+    ("filter=emails[value[type pr]]", f"{_unexpected_token} 19"),
+    ("filter=1title pr", f"{_invalid_attribute_path} 7"),
+])
+def test_invalid_filters(filter_str, message):
+    with pytest.raises(ValueError) as e:
+        parse(filter_str)
+    assert str(e.value) == message
+
+@pytest.mark.parametrize("opening", ["(", "not ("])
+def test_nesting_too_deep(opening):
+    depth = Parser.max_depth + 1
+    filter_str = "filter=" + opening * depth + "a pr" + ")" * depth
+    with pytest.raises(ValueError) as e:
+        parse(filter_str)
+    assert str(e.value) == f"{_nesting_too_deep} {7 + len(opening) * depth - 1}"
+    filter_str = "filter=" + opening * 1200 + "a pr" + ")" * 1200
+    with pytest.raises(ValueError, match=_nesting_too_deep):
+        parse(filter_str)
+
+def test_nesting_at_max_depth():
+    depth = Parser.max_depth
+    node = parse("filter=" + "(" * depth + "a pr" + ")" * depth)
+    assert node == Present("a", 7 + depth)
@@ -0,0 +1,168 @@
+import random
+import pytest
+from scim_filter_parser.cache import cache_clear
+from scim_filter_parser.compiler import compile_filter
+from scim_filter_parser import patch
+from scim_filter_parser.patch import PatchPath, compile_path, apply_patch
+from scim_filter_parser.err_strings import (
+    _invalid_attribute_path, _invalid_patch_operation, _patch_no_target, _unexpected_token
+)
+
+enterprise = "urn:ietf:params:scim:schemas:extension:enterprise:2.0:User"
+
+user = {
+    "userName": "bjensen",
+    "name": {"givenName": "Barbara", "familyName": "Jensen"},
+    "emails": [
+        {"type": "work", "value": "bjensen@example.com", "primary": True},
+        {"type": "home", "value": "babs@jensen.org"},
+    ],
+    enterprise: {"employeeNumber": "701984", "manager": {"value": "26118915"}},
+}
+
+def test_compile_path():
+    path = compile_path('emails[type eq "work" and value ew ".com"].value')
+    assert (path.attr_path, path.sub_attr) == ("emails", "value")
+    assert path.matches(user["emails"][0]) and not path.matches(user["emails"][1])
+    assert compile_path('emails[type eq "work" and value ew ".com"].value') is path
+    plain = compile_path(f"{enterprise}:manager.value")
+    assert (plain.attr_path, plain.value_filter, plain.sub_attr) == (f"{enterprise}:manager.value", None, None)
+    assert compile_path('members[value eq "a]b"]').matches({"value": "A]B"})
+
+def test_invalid_paths():
+    for path, message in [
+        ("", f"{_invalid_attribute_path} 0"),
+        ("name.givenName.x", f"{_invalid_attribute_path} 0"),
+        ('emails[type eq "work"', f"{_invalid_attribute_path} 6"),
+        ('emails[type eq "work"]value', f"{_invalid_attribute_path} 22"),
+        ('emails[type eq "work"].', f"{_invalid_attribute_path} 22"),
+        ('emails[type "work"]', f"{_unexpected_token} 12"),
+    ]:
+        with pytest.raises(ValueError) as e:
+            PatchPath(path)
+        assert str(e.value) == message, path
+
+def test_operations():
+    patched = apply_patch(user, [
+        {"op": "add", "path": "emails", "value": [{"type": "other", "value": "BJENSEN@example.com"}, {"value": "b@x.org"}]},
+        {"op": "Replace", "path": 'emails[type eq "work"].value', "value": "barbara@example.com"},
+        {"op": "replace", "path": "name", "value": {"givenName": "Babs"}},
+        {"op": "remove", "path": "emails.primary"},
+        {"op": "add", "path": f"{enterprise}:department", "value": "Tour Operations"},
+        {"op": "remove", "path": f"{enterprise}:manager"},
+        {"op": "add", "value": {"nickName": "Babs", "USERNAME": "babs"}},
+    ])
+    assert patched == {
+        "userName": "babs",
+        "nickName": "Babs",
+        "name": {"givenName": "Babs", "familyName": "Jensen"},
+        "emails": [
+            {"type": "work", "value": "barbara@example.com"},
+            {"type": "home", "value": "babs@jensen.org"},
+            {"value": "b@x.org"},
+        ],
+        enterprise: {"employeeNumber": "701984", "department": "Tour Operations"},
+    }
+    # The resource itself is left as it was
+    assert user["emails"][0] == {"type": "work", "value": "bjensen@example.com", "primary": True}
+    assert "manager" in user[enterprise]
+
+def test_core_schema_urn_names_resource_attributes():
+    core = "urn:ietf:params:scim:schemas:core:2.0:User"
+    patched = apply_patch(user, [
+        {"op": "replace", "path": f"{core}:userName", "value": "babs"},
+        {"op": "add", "path": f"{core.upper()}:name.middleName", "value": "Jane"},
+        {"op": "remove", "path": f'{core}:emails[type eq "home"]'},
+    ])
+    assert patched == {
+        **user,
+        "userName": "babs",
+        "name": {"givenName": "Barbara", "familyName": "Jensen", "middleName": "Jane"},
+        "emails": [user["emails"][0]],
+    }
+    # The same attributes compile_filter resolves the paths to
+    assert compile_filter(f'filter={core}:userName eq "babs"')(patched)
+    assert compile_filter(f'filter={core}:name.middleName eq "Jane"')(patched)
+
+def test_operations_apply_in_order():
+    group = {"members": [{"value": "a"}, {"value": "b"}, {"value": "c"}]}
+    patched = apply_patch(group, [
+        {"op": "replace", "path": 'members[value eq "a"]', "value": {"value": "b", "display": "B"}},
+        {"op": "remove", "path": 'members[value eq "b" and display pr]'},
+        {"op": "add", "path": 'members[value eq "c"].display', "value": "C"},
+        {"op": "remove", "path": 'members[value eq "x"]'},
+    ])
+    assert patched == {"members": [{"value": "b"}, {"value": "c", "display": "C"}]}
+    assert apply_patch(group, [{"op": "remove", "path": f'members[value eq "{v}"]'} for v in "abc"]) == {}
+
+def test_invalid_operations():
+    for operations, message in [
+        ([{"op": "remove", "path": "title"}, {"op": "move", "path": "title"}], f"{_invalid_patch_operation} 1"),
+        ([{"op": "remove"}], f"{_invalid_patch_operation} 0"),
+        ([{"op": "add", "path": "title"}], f"{_invalid_patch_operation} 0"),
+        ([{"op": "add", "value": "x"}], f"{_invalid_patch_operation} 0"),
+        ([{"op": "replace", "path": 'emails[type eq "other"].value', "value": "x"}], f"{_patch_no_target} 0"),
+    ]:
+        with pytest.raises(ValueError) as e:
+            apply_patch(user, operations)
+        assert str(e.value) == message
+
+def apply_one_by_one(resource :dict, operations :list) -> dict:
+    # Reference: each operation on its own, one scan of the values per operation
+    for index, operation in enumerate(operations):
+        try:
+            resource = apply_patch(resource, [operation])
+        except ValueError:
+            raise ValueError(f"{_patch_no_target} {index}") from None
+    return resource
+
+def test_batches_match_one_by_one():
+    rng = random.Random(23)
+    for _ in range(200):
+        resource = {"emails": [
+            {"type": rng.choice(["work", "home"]), "value": rng.choice("abcd")} for _ in range(rng.randint(0, 6))
+        ]}
+        operations = []
+        for _ in range(rng.randint(1, 8)):
+            value_filter = rng.choice([
+                f'value eq "{rng.choice("abcd")}"', f'type eq "{rng.choice(["work", "home"])}"',
+                f'value eq "{rng.choice("abcd")}" and type eq "work"', 'value gt "b"',
+            ])
+            op = rng.choice(["remove", "remove", "replace", "add"])
+            sub_attr = rng.choice(["", ".value", ".type"])
+            value = rng.choice("abcd") if sub_attr else {"type": "work", "value": rng.choice("abcd")}
+            operations.append({"op": op, "path": f"emails[{value_filter}]{sub_attr}", "value": value})
+        try:
+            expected = apply_one_by_one(resource, operations)
+        except ValueError as e:
+            with pytest.raises(ValueError) as batch_error:
+                apply_patch(resource, operations)
+            assert str(batch_error.value) == str(e)
+        else:
+            assert apply_patch(resource, operations) == expected, operations
+
+def test_bulk_member_removal_is_linear(monkeypatch):
+    # Value filters tried on members, the removals would try each of theirs on
+    # every member were they not looked up by value
+    calls = []
+    compile_value_filter = patch.compile_filter
+
+    def counting_compile_filter(filter):
+        match = compile_value_filter(filter)
+
+        def counting_match(value :dict) -> bool:
+            calls.append(value)
+            return match(value)
+        return counting_match
+    monkeypatch.setattr(patch, "compile_filter", counting_compile_filter)
+
+    def remove_members(n :int) -> int:
+        group = {"members": [{"value": f"user{i}"} for i in range(n)]}
+        operations = [{"op": "remove", "path": f'members[value eq "user{i}"]'} for i in range(0, n, 2)]
+        # Every path is compiled, as for a request with new members
+        compile_path.cache_clear()
+        cache_clear()
+        calls.clear()
+        assert apply_patch(group, operations)["members"] == group["members"][1::2]
+        return len(calls)
+    assert remove_members(2000) == remove_members(16000)
@@ -0,0 +1,135 @@
+import random
+import pytest
+from scim_filter_parser.compiler import compile_filter
+from scim_filter_parser.result_cache import (
+    ResultCache, ResultCacheInfo, ResultStore, MemoryResultStore, changed_attributes, read_attributes
+)
+from scim_filter_parser.cache import parse
+from scim_filter_parser.optimizer import optimize
+
+enterprise = "urn:ietf:params:scim:schemas:extension:enterprise:2.0:User"
+
+class Clock():
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def test_read_and_changed_attributes():
+    node = parse(f'filter=userName eq "a" or (emails[type eq "work"] and not ({enterprise}:department pr))')
+    assert read_attributes(node) == {
+        (None, "username"), (None, "emails"), (None, "department"), (enterprise.casefold(), "department")
+    }
+    old = {"userName": "a", "emails": [{"type": "work"}], enterprise: {"department": "x", "manager": "m"}}
+    new = {"USERNAME": "a", "emails": [{"type": "home"}], enterprise: {"department": "x", "manager": "n"}}
+    assert changed_attributes(old, new) == {
+        (None, "emails"), (None, enterprise.casefold()), (enterprise.casefold(), "manager")
+    }
+
+def test_writes_update_only_readers():
+    clock = Clock()
+    results = ResultCache(clock=clock)
+    results.put('filter=title eq "boss"', {1})
+    results.put("filter=not (title pr)", {2})
+    results.put('filter=userName sw "b"', {1, 2})
+    assert results.get('filter=TITLE eq "boss"') == {1}
+    results.write(2, {"userName": "b2"}, {"userName": "b2", "title": "boss"})
+    assert results.get('filter=title eq "boss"') == {1, 2}
+    assert results.get("filter=not (title pr)") == set()
+    # userName did not change, its entry was left alone
+    assert results.cache_info().invalidations == 2
+    results.write(3, None, {"userName": "c"})
+    assert results.get("filter=not (title pr)") == {3}
+    results.write(1, {"userName": "b1", "title": "boss"}, None)
+    assert results.get('filter=userName sw "b"') == {2}
+    assert results.get('filter=title eq "boss"') == {2}
+
+def test_type_changes_are_writes():
+    results = ResultCache()
+    results.put("filter=active eq true", set())
+    results.write("u", {"active": 1}, {"active": True})
+    assert results.get("filter=active eq true") == {"u"}
+    assert changed_attributes({"a": [0, {"b": 1.0}]}, {"a": [False, {"b": 1}]}) == {(None, "a")}
+    assert changed_attributes({"a": [0, {"b": 1.0}]}, {"a": [0, {"b": 1.0}]}) == set()
+
+def test_optimized_filters():
+    results = ResultCache()
+    f = 'filter=userName eq "a" or userName eq "b"'
+    results.put(optimize(f), {1})
+    assert results.get(f) == {1}
+    results.write(2, {"userName": "c"}, {"userName": "B"})
+    assert results.get(optimize(f)) == {1, 2}
+
+def test_eviction_and_expiry():
+    clock = Clock()
+    results = ResultCache(maxsize=2, ttl=10, clock=clock, store=MemoryResultStore())
+    results.put("filter=a pr", {1})
+    results.put("filter=b pr", {2})
+    assert results.get("filter=a pr") == {1}
+    results.put("filter=c pr", {3})
+    assert results.get("filter=b pr") is None
+    clock.now = 10
+    assert results.get("filter=a pr") is None
+    results.write(4, {}, {"c": 1})
+    assert results.cache_info() == ResultCacheInfo(
+        hits=1, misses=2, evictions=1, expirations=2, invalidations=0, maxsize=2, currsize=0
+    )
+    assert not results._readers and not results._matchers
+    results.cache_clear()
+    assert results.cache_info().misses == 0
+
+def test_writes_keep_eviction_order():
+    results = ResultCache(maxsize=2)
+    results.put("filter=a pr", {1})
+    results.put("filter=b pr", {2})
+    results.write(1, {"a": 1}, {"a": 2})
+    results.put("filter=c pr", {3})
+    # a was put first and only written since, it goes first
+    assert results.get("filter=a pr") is None
+    assert results.get("filter=b pr") == {2}
+
+def test_incomplete_store_is_rejected():
+    class GetOnlyStore(ResultStore):
+        def get(self, key):
+            return None
+    with pytest.raises(TypeError):
+        GetOnlyStore()
+
+def test_matches_recomputing():
+    rng = random.Random(24)
+    values = [
+        "a", "b", "B", None, 1, 1.0, True, 0, False, [{"value": "a"}], [{"value": "b", "type": "work"}],
+        [{"value": 1}], [{"value": True}], [{"value": "b", "type": "work", "primary": 1}],
+        [{"value": "b", "type": "work", "primary": True}],
+    ]
+    filters = [
+        'filter=title eq "b"', "filter=not (title pr)", 'filter=emails[type eq "work"]',
+        'filter=title eq "a" or nickName ne "b"', f'filter={enterprise}:manager eq "a"', "filter=emails.value gt 0",
+        "filter=title eq true", "filter=nickName eq 1", f"filter={enterprise}:manager ne false",
+        "filter=emails[primary eq true]", "filter=emails eq 1",
+    ]
+
+    def random_resource() -> dict:
+        resource = {attr: rng.choice(values) for attr in ["title", "nickName", "emails"] if rng.random() < 0.7}
+        if rng.random() < 0.5:
+            resource[enterprise] = {"manager": rng.choice(values)}
+        return resource
+
+    resources = {i: random_resource() for i in range(30)}
+    results = ResultCache()
+    for f in filters:
+        match = compile_filter(f)
+        results.put(f, {i for i, r in resources.items() if match(r)})
+    for _ in range(300):
+        i = rng.randrange(40)
+        old = resources.get(i)
+        new = None if old is not None and rng.random() < 0.2 else random_resource()
+        if new is None:
+            del resources[i]
+        else:
+            resources[i] = new
+        results.write(i, old, new)
+    for f in filters:
+        match = compile_filter(f)
+        assert results.get(f) == {i for i, r in resources.items() if match(r)}, f
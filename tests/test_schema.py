@@ -0,0 +1,96 @@
+import random
+from datetime import datetime, timedelta, timezone
+import pytest
+from scim_filter_parser.compiler import compile_filter
+from scim_filter_parser.optimizer import optimize
+from scim_filter_parser.schema import AttributeSchema, SchemaCompiler, compile_with_schema, parse_date_time
+from scim_filter_parser.err_strings import _invalid_comparison
+
+schema = {
+    "meta.lastModified": AttributeSchema("dateTime"),
+    "id": AttributeSchema("string", case_exact=True),
+    "userName": AttributeSchema("string"),
+    "age": AttributeSchema("integer"),
+    "score": AttributeSchema("decimal"),
+    "active": AttributeSchema("boolean"),
+    "photo": AttributeSchema("binary", case_exact=True),
+    "emails[type]": AttributeSchema("string", case_exact=True),
+    "emails.value": AttributeSchema("string", multi_valued=True),
+}
+
+def test_parse_date_time():
+    assert parse_date_time("2011-05-13T04:42:34Z") == datetime(2011, 5, 13, 4, 42, 34, tzinfo=timezone.utc)
+    assert parse_date_time("2011-05-13t04:42:34.5-01:30") == datetime(
+        2011, 5, 13, 4, 42, 34, 500000, timezone(-timedelta(hours=1, minutes=30))
+    )
+    assert parse_date_time("2011-05-13T04:42:34.1234567") == datetime(2011, 5, 13, 4, 42, 34, 123456, timezone.utc)
+    for text in ["2011-05-13", "2011-13-13T04:42:34Z", "2011-05-13T04:42:34+0200", "x"]:
+        assert parse_date_time(text) is None
+
+def test_date_times_compare_chronologically():
+    match = compile_with_schema('filter=meta.lastModified gt "2011-05-13T04:42:34Z"', schema)
+    earlier = {"meta": {"lastModified": "2011-05-13T05:00:00+01:00"}}
+    later = {"meta": {"lastModified": "2011-05-13T04:00:00-01:00"}}
+    # As strings the offsets get the order wrong
+    assert compile_filter('filter=meta.lastModified gt "2011-05-13T04:42:34Z"')(earlier)
+    assert not match(earlier)
+    assert match(later)
+    assert not match({"meta": {"lastModified": "yesterday"}})
+    assert compile_with_schema('filter=meta.lastModified eq "2011-05-13T05:42:34.000+01:00"', schema)(
+        {"meta": {"lastModified": "2011-05-13T04:42:34Z"}}
+    )
+    assert compile_with_schema('filter=meta.lastModified sw "2011-05"', schema)(earlier)
+
+def test_case_exact_and_types():
+    assert compile_with_schema('filter=id eq "AbC"', schema)({"id": "AbC"})
+    assert not compile_with_schema('filter=id eq "AbC"', schema)({"id": "abc"})
+    assert compile_with_schema('filter=userName sw "BJ"', schema)({"userName": "bjensen"})
+    assert compile_with_schema('filter=age ge "30"', schema)({"age": 30})
+    assert not compile_with_schema("filter=age ge 30", schema)({"age": "31"})
+    assert compile_with_schema("filter=score lt 3", schema)({"score": 2.5})
+    assert compile_with_schema("filter=active eq false", schema)({"active": False})
+    assert compile_with_schema('filter=emails[type eq "work"]', schema)({"emails": [{"type": "work"}]})
+    assert not compile_with_schema('filter=emails[type eq "work"]', schema)({"emails": [{"type": "Work"}]})
+    assert compile_with_schema('filter=emails.value ew "X.COM"', schema)({"emails": [{"value": "a@x.com"}]})
+    # Single valued attributes are not searched as lists
+    assert not compile_with_schema('filter=userName eq "a"', schema)({"userName": ["a"]})
+    assert compile_with_schema('filter=id ne "a"', schema)({"id": "b"})
+
+def test_invalid_comparisons():
+    for f, position in [
+        ("filter=active gt true", 17),
+        ('filter=active eq "true"', 17),
+        ('filter=photo lt "AA=="', 16),
+        ('filter=age eq "x"', 14),
+        ("filter=age co 1", 14),
+        ("filter=userName eq 1", 19),
+        ('filter=meta.lastModified gt "soon"', 28),
+    ]:
+        with pytest.raises(ValueError) as e:
+            compile_with_schema(f, schema)
+        assert str(e.value) == f"{_invalid_comparison} {position}"
+
+def test_memo():
+    compiler = SchemaCompiler(schema, memo_size=2)
+    match = compiler.compile('filter=meta.lastModified le "2011-05-13T04:42:34Z" or userName eq "x"')
+    resources = [{"meta": {"lastModified": f"2011-05-13T0{i % 6}:00:00+00:00"}} for i in range(20)]
+    assert [match(r) for r in resources] == [i % 6 <= 4 for i in range(20)]
+
+def test_matches_compiler_without_types():
+    # Case insensitive multi-valued strings behave as compile_filter does
+    plain = {path: AttributeSchema("string", multi_valued=True) for path in ["userName", "title", "tags", "emails.type"]}
+    rng = random.Random(21)
+    values = ["abc", "ABD", "x", "", None, 1, [], ["abc", "y"], [{"value": "abc"}]]
+    resources = [
+        {attr: rng.choice(values) for attr in ["userName", "title", "tags"] if rng.random() < 0.8}
+        | {"emails": [{"type": rng.choice(values)}]}
+        for _ in range(100)
+    ]
+    for _ in range(200):
+        attr = rng.choice(list(plain))
+        op = rng.choice(["eq", "ne", "co", "sw", "ew", "gt", "le"])
+        literal = rng.choice(['"abc"', '"ab"', '"X"', '""'] + (["null"] if op in ("eq", "ne") else []))
+        f = f"filter={attr} {op} {literal} or not (title {op} {literal})"
+        expected = compile_filter(f)
+        for compiled in (compile_with_schema(f, plain), compile_with_schema(optimize(f), plain, memo_size=8)):
+            assert [compiled(r) for r in resources] == [expected(r) for r in resources], f
@@ -0,0 +1,122 @@
+import random
+import struct
+import pytest
+from multiprocessing import shared_memory
+from pathlib import Path
+from scim_filter_parser.lexer import Lexer, Token
+from scim_filter_parser.parser import Parser, Node
+from scim_filter_parser.optimizer import optimize, AttributeHint
+from scim_filter_parser.serialize import dumps, loads, version
+from scim_filter_parser.err_strings import _invalid_serialized_filter, _unsupported_serialized_version
+
+def reference_examples():
+    with open(Path(__file__).parent.parent / "reference" / "example_querys.txt") as f:
+        return f.read().splitlines()
+
+def walk(node):
+    # Every node and value token, to compare classes and positions one by one
+    yield node
+    if isinstance(node, Node):
+        for name in node.__slots__:
+            child = getattr(node, name)
+            for item in child if type(child) is tuple else (child,):
+                if isinstance(item, (Node, Token)):
+                    yield from walk(item)
+
+def assert_round_trip(node):
+    loaded = loads(dumps(node))
+    assert loaded == node
+    for original, copy in zip(walk(node), walk(loaded), strict=True):
+        assert type(copy) is type(original)
+        assert copy.position == original.position
+
+def test_reference_examples():
+    for f in reference_examples():
+        node = Parser(Lexer(f)).parse()
+        assert_round_trip(node)
+        assert loads(dumps(f)) == node
+        assert loads(dumps(Lexer(f))) == node
+
+def test_value_tokens():
+    f = 'filter=a eq "x\\"y" or b gt 12 or c eq true or d ne false or e eq null or f[g sw "é"]'
+    node = Parser(Lexer(f)).parse()
+    assert_round_trip(node)
+    assert [type(t).__name__ for t in walk(loads(dumps(node))) if isinstance(t, Token)] == [
+        "StringLiteralToken", "NumericLiteralToken", "TrueLiteralToken",
+        "FalseLiteralToken", "NullLiteralToken", "StringLiteralToken",
+    ]
+
+def test_optimizer_nodes():
+    hints = {"active": AttributeHint(single_valued=True)}
+    for f in [
+        'filter=a eq 1 or a eq 2 or a eq "x"',
+        "filter=a pr or not (a pr)",
+        "filter=active eq true and active eq false",
+    ]:
+        assert_round_trip(optimize(f, hints))
+
+def test_random_filters():
+    rng = random.Random(18)
+    leaves = ['a eq "x"', "b pr", "c gt 5", "d[e eq false]", "not (f co null)"]
+    for _ in range(200):
+        parts = [rng.choice(leaves) for _ in range(rng.randint(1, 6))]
+        f = "filter=" + " ".join(
+            part + ("" if i == len(parts) - 1 else rng.choice([" and", " or"])) for i, part in enumerate(parts)
+        )
+        assert_round_trip(Parser(Lexer(f)).parse())
+
+def test_compact_and_shared_strings():
+    data = dumps('filter=title eq "a" or title eq "a" or title eq "a"')
+    # Three instructions per comparison and one for the or, both strings pooled once
+    assert len(data) == 16 + 7 * 8 + 3 * 4 + len('title"a"')
+
+def test_buffers():
+    f = 'filter=emails[type eq "work" and value co "@example.com"]'
+    data = dumps(f)
+    node = Parser(Lexer(f)).parse()
+    assert loads(bytearray(data)) == node
+    assert loads(memoryview(b"padding" + data)[7:]) == node
+    shm = shared_memory.SharedMemory(create=True, size=len(data) + 32)
+    try:
+        shm.buf[:len(data)] = data
+        # Trailing bytes of the segment are ignored
+        assert loads(shm.buf) == node
+    finally:
+        shm.close()
+        shm.unlink()
+
+def test_file(tmp_path):
+    path = tmp_path / "filter.bin"
+    path.write_bytes(dumps("filter=a pr"))
+    with open(path, "rb") as f:
+        assert loads(f.read()) == Parser(Lexer("filter=a pr")).parse()
+
+def test_invalid():
+    data = dumps('filter=a eq "x" and b pr')
+    with pytest.raises(ValueError) as e:
+        loads(b"XXXX" + data[4:])
+    assert str(e.value) == f"{_invalid_serialized_filter} 0"
+    with pytest.raises(ValueError) as e:
+        loads(data[:4] + bytes([version + 1]) + data[5:])
+    assert str(e.value) == f"{_unsupported_serialized_version} {version + 1}"
+    for cut in range(len(data)):
+        with pytest.raises(ValueError):
+            loads(data[:cut])
+    # An or with a single operand
+    words = bytearray(data)
+    struct.pack_into("<I", words, 16 + 3 * 8, 2 << 24 | 1)
+    with pytest.raises(ValueError) as e:
+        loads(words)
+    assert str(e.value) == f"{_invalid_serialized_filter} {16 + 3 * 8}"
+
+def test_fuzzed_input_raises_value_error():
+    rng = random.Random(7)
+    data = dumps('filter=a eq "x" and (b pr or c[d lt 4])')
+    for _ in range(2000):
+        damaged = bytearray(data)
+        for _ in range(rng.randint(1, 4)):
+            damaged[rng.randrange(8, len(damaged))] = rng.randrange(256)
+        try:
+            loads(damaged)
+        except ValueError:
+            pass
@@ -0,0 +1,117 @@
+import json
+import sqlite3
+import pytest
+from scim_filter_parser.compiler import compile_filter
+from scim_filter_parser.optimizer import optimize
+from scim_filter_parser.sql import MultiValuedTable, SqlTranslator, to_sql
+from scim_filter_parser.err_strings import _unmapped_attribute
+
+users = [
+    {
+        "id": "1", "userName": "bjensen", "title": "Tour Guide", "userType": "Employee",
+        "loginCount": 12, "active": True, "name": {"familyName": "Jensen"},
+        "emails": [
+            {"value": "bjensen@example.com", "type": "work"},
+            {"value": "babs@jensen.org", "type": "home"},
+        ],
+    },
+    {
+        "id": "2", "userName": "jsmith", "userType": "Intern", "loginCount": 3, "active": False,
+        "name": {"familyName": "Smith_Jones"},
+        "emails": [{"value": "js@example.org", "type": "work"}],
+    },
+    {"id": "3", "userName": "100%_real", "active": True, "name": {}},
+]
+
+mapping = {
+    "id": "users.id",
+    "userName": "users.user_name",
+    "title": "users.title",
+    "userType": "users.user_type",
+    "loginCount": "users.login_count",
+    "active": "users.active",
+    "name.familyName": "json_extract(users.data, '$.name.familyName')",
+    "emails": MultiValuedTable(
+        "emails", "emails.user_id = users.id", {"value": "emails.value", "type": "emails.type"}
+    ),
+}
+
+@pytest.fixture
+def connection():
+    connection = sqlite3.connect(":memory:")
+    connection.execute(
+        "CREATE TABLE users (id TEXT, user_name TEXT, title TEXT, user_type TEXT,"
+        " login_count INTEGER, active BOOLEAN, data TEXT)"
+    )
+    connection.execute("CREATE TABLE emails (user_id TEXT, value TEXT, type TEXT)")
+    for u in users:
+        connection.execute(
+            "INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (u["id"], u["userName"], u.get("title"), u.get("userType"),
+             u.get("loginCount"), u["active"], json.dumps(u)),
+        )
+        for e in u.get("emails", []):
+            connection.execute("INSERT INTO emails VALUES (?, ?, ?)", (u["id"], e["value"], e["type"]))
+    yield connection
+    connection.close()
+
+filters = [
+    'filter=userName eq "BJENSEN"',
+    'filter=userName sw "100%"',
+    'filter=userName co "_"',
+    'filter=name.familyName ew "_jones"',
+    'filter=title pr',
+    'filter=userType ne "Employee"',
+    'filter=loginCount gt 3 or active eq false',
+    'filter=not (userType eq "Intern") and active eq true',
+    'filter=urn:ietf:params:scim:schemas:core:2.0:User:userName eq "jsmith"',
+    'filter=emails co "example"',
+    'filter=emails.type eq "home"',
+    'filter=emails pr',
+    'filter=emails ne "js@example.org"',
+    'filter=emails[type eq "work" and value ew ".com"]',
+    'filter=userType eq null',
+    'filter=title ne null',
+    'filter=title eq null',
+    'filter=emails eq null',
+    'filter=emails ne null',
+    'filter=emails.type eq null',
+    'filter=not (emails.type ne null)',
+]
+
+def test_matches_record_evaluation(connection):
+    for f in filters:
+        print(f"Testing filter: {f}")
+        where, params = to_sql(f, mapping)
+        rows = connection.execute(f"SELECT id FROM users WHERE {where} ORDER BY id", params)
+        expected = [u["id"] for u in users if compile_filter(f)(u)]
+        assert [r[0] for r in rows] == expected
+
+def test_optimized_filters(connection):
+    for f in filters + [
+        'filter=userType eq "Intern" or userType eq "employee" or userType eq null',
+        'filter=emails eq "js@example.org" or emails eq "BABS@jensen.org"',
+        "filter=title pr or not (title pr)",
+        "filter=title pr and not (title pr)",
+        "filter=emails[type pr or not (type pr)]",
+    ]:
+        where, params = to_sql(optimize(f), mapping)
+        rows = connection.execute(f"SELECT id FROM users WHERE {where} ORDER BY id", params)
+        assert [r[0] for r in rows] == [u["id"] for u in users if compile_filter(f)(u)], f
+
+def test_parameters_are_bound():
+    where, params = to_sql('filter=userName eq "x\' OR 1=1 --" and emails co "a%"', mapping)
+    assert where == (
+        "(lower(users.user_name) = ? AND EXISTS (SELECT 1 FROM emails WHERE"
+        " emails.user_id = users.id AND lower(emails.value) LIKE ? ESCAPE '\\'))"
+    )
+    assert params == ["x' or 1=1 --", "%a\\%%"]
+
+def test_placeholder_and_case_exact():
+    translator = SqlTranslator(mapping, placeholder="%s", case_exact=True)
+    assert translator.translate('filter=userName sw "J"') == ("users.user_name LIKE %s ESCAPE '\\'", ["J%"])
+
+def test_unmapped_attribute():
+    with pytest.raises(ValueError) as e:
+        to_sql('filter=title pr and nickName pr', mapping)
+    assert str(e.value) == f"{_unmapped_attribute} 20"
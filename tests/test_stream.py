@@ -0,0 +1,58 @@
+import json
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from scim_filter_parser.lexer import Lexer
+from scim_filter_parser.stream import filter_stream
+
+resources = [{"id": i, "userName": f"user{i}", "active": i % 3 == 0} for i in range(1000)]
+active = [r for r in resources if r["active"]]
+
+def counted(items, consumed :list):
+    for item in items:
+        consumed.append(item)
+        yield item
+
+def test_filters_in_order():
+    assert list(filter_stream("filter=active eq true", resources)) == active
+    assert list(filter_stream(Lexer("filter=active eq true"), iter(resources), batch_size=7)) == active
+
+def test_pagination():
+    f = "filter=active eq true"
+    assert list(filter_stream(f, resources, start_index=3, count=2, batch_size=1)) == active[2:4]
+    assert list(filter_stream(f, resources, start_index=0, count=2)) == active[:2]
+    assert list(filter_stream(f, resources, start_index=300, batch_size=10)) == active[299:]
+    assert list(filter_stream(f, resources, start_index=1000)) == []
+    assert list(filter_stream(f, resources, count=0)) == []
+
+def test_stops_reading_once_count_is_reached():
+    consumed = []
+    found = list(filter_stream("filter=active eq true", counted(resources, consumed), count=5, batch_size=10))
+    assert found == active[:5]
+    assert len(consumed) == 20
+    consumed = []
+    found = list(filter_stream("filter=active eq true", counted(resources, consumed), count=5, batch_size=10, workers=2))
+    assert found == active[:5]
+    # The batches read ahead for the pool, and no more
+    assert len(consumed) <= 20 + 4 * 10
+
+def test_json_lines(tmp_path):
+    path = tmp_path / "users.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in resources[:100]) + "\n\n")
+    with open(path, "rb") as f:
+        assert list(filter_stream('filter=userName ew "7"', f)) == [r for r in resources[:100] if r["id"] % 10 == 7]
+    with open(path) as f:
+        assert list(filter_stream("filter=id gt 95", f, start_index=2)) == resources[97:100]
+
+def test_thread_pool():
+    lines = [json.dumps(r) for r in resources]
+    f = 'filter=userName sw "user1" and not (active eq true)'
+    expected = [r for r in resources if str(r["id"]).startswith("1") and not r["active"]]
+    assert list(filter_stream(f, lines, workers=4, batch_size=16)) == expected
+    with ThreadPoolExecutor(2) as executor:
+        assert list(filter_stream(f, lines, executor=executor, start_index=5, count=10)) == expected[4:14]
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        list(filter_stream("filter=a pr", resources, batch_size=0))
+    with pytest.raises(ValueError):
+        list(filter_stream("filter=a pr", ["{not json"]))
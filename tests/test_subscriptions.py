@@ -0,0 +1,107 @@
+import random
+import pytest
+from scim_filter_parser.compiler import compile_filter
+from scim_filter_parser.optimizer import optimize
+from scim_filter_parser.subscriptions import SubscriptionMatcher
+from scim_filter_parser.err_strings import _invalid_comparison
+
+values = ["abc", "ABD", "ab", "b", "", 0, 1, 1.0, True, None]
+
+def random_resource(rng :random.Random) -> dict:
+    resource = {}
+    for attr in ["userName", "title", "active"]:
+        if rng.random() < 0.8:
+            resource[attr] = rng.choice(values)
+    if rng.random() < 0.8:
+        resource["emails"] = [{"type": rng.choice(values), "value": rng.choice(values)} for _ in range(rng.randint(0, 2))]
+    return resource
+
+def random_filter(rng :random.Random, depth :int = 0) -> str:
+    choice = rng.random()
+    if depth < 3 and choice < 0.35:
+        op = rng.choice(["and", "or"])
+        return "(" + f" {op} ".join(random_filter(rng, depth + 1) for _ in range(rng.randint(2, 3))) + ")"
+    if depth < 3 and choice < 0.42:
+        return f"not ({random_filter(rng, depth + 1)})"
+    if choice < 0.46:
+        return 'emails[type eq "abc" and value pr]'
+    attr = rng.choice(["userName", "title", "active", "emails", "emails.value", "emails.type"])
+    if rng.random() < 0.1:
+        return f"{attr} pr"
+    op = rng.choice(["eq", "eq", "eq", "sw", "sw", "ne", "co", "gt"])
+    literals = ['"abc"', '"ab"', '"AB"', '"a"', '""']
+    if op in ("eq", "ne", "gt"):
+        literals += ["0", "1"]
+    if op in ("eq", "ne"):
+        literals += ["true", "null"]
+    return f"{attr} {op} {rng.choice(literals)}"
+
+def test_matches_compiler():
+    rng = random.Random(22)
+    matcher = SubscriptionMatcher()
+    filters = {}
+    for i in range(400):
+        filters[i] = "filter=" + random_filter(rng)
+        matcher.add(i, filters[i])
+    for i in range(0, 400, 3):
+        matcher.remove(i)
+        del filters[i]
+    compiled = {i: compile_filter(f) for i, f in filters.items()}
+    for _ in range(300):
+        resource = random_resource(rng)
+        assert matcher.match(resource) == {i for i, match in compiled.items() if match(resource)}, resource
+
+def test_optimized_filters():
+    matcher = SubscriptionMatcher()
+    matcher.add("in", optimize('filter=userName eq "a" or userName eq "b" or userName eq null'))
+    matcher.add("nested", optimize('filter=title pr and (active eq true or active eq false)'))
+    assert matcher.match({"userName": "B"}) == {"in"}
+    assert matcher.match({"userName": "c", "title": "x", "active": False}) == {"nested"}
+    with pytest.raises(TypeError):
+        matcher.add("constant", optimize("filter=title pr and not (title pr)"))
+    assert "constant" not in matcher
+
+def test_anchors_limit_evaluation():
+    matcher = SubscriptionMatcher()
+    for i in range(1000):
+        matcher.add(i, f'filter=userName eq "user{i}" and (title sw "eng" or active eq true)')
+    matcher.add("prefix", 'filter=userName sw "USER99"')
+    evaluated = []
+    funcs = matcher._funcs
+    for slot, func in list(funcs.items()):
+        funcs[slot] = lambda resource, memo, slot=slot, func=func: evaluated.append(slot) or func(resource, memo)
+    assert matcher.match({"userName": "user990", "title": "Engineer"}) == {990, "prefix"}
+    # The shared "or" and its operands are evaluated once for both candidates
+    assert len(evaluated) == len(set(evaluated)) <= 6
+
+def test_shared_network():
+    matcher = SubscriptionMatcher()
+    matcher.add("a", 'filter=title pr and userName eq "x"')
+    matcher.add("b", 'filter=USERNAME eq "x" and title pr')
+    matcher.add("c", 'filter=not (title pr)')
+    # Both spellings share one "and", with "title pr" shared by all three
+    assert len(matcher._slots) == 4
+    assert matcher.match({"title": "t", "userName": "X"}) == {"a", "b"}
+    assert matcher.match({}) == {"c"}
+    for subscription_id in ["a", "b", "c"]:
+        matcher.remove(subscription_id)
+    assert len(matcher) == 0
+    assert not (matcher._slots or matcher._funcs or matcher._refs or matcher._getters)
+    assert not (matcher._equal or matcher._prefixes or matcher._unanchored)
+
+def test_add_and_remove():
+    matcher = SubscriptionMatcher()
+    matcher.add("a", 'filter=emails.value sw "bjensen@"')
+    matcher.add("b", 'filter=emails.value sw "bjensen@example"')
+    with pytest.raises(KeyError):
+        matcher.add("a", "filter=title pr")
+    with pytest.raises(ValueError) as e:
+        matcher.add("c", "filter=title co true")
+    assert str(e.value) == f"{_invalid_comparison} 16"
+    assert "c" not in matcher
+    resource = {"emails": [{"value": "BJensen@Example.com"}]}
+    assert matcher.match(resource) == {"a", "b"}
+    matcher.remove("b")
+    assert matcher.match(resource) == {"a"}
+    with pytest.raises(KeyError):
+        matcher.remove("b")
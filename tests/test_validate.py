@@ -0,0 +1,93 @@
+import random
+import time
+from scim_filter_parser.lexer import Lexer
+from scim_filter_parser.parser import Parser
+from scim_filter_parser.validate import validate
+from scim_filter_parser.benchmark import workloads
+from scim_filter_parser.err_strings import (
+    _unexpected_character, _unexpected_end_of_input, _unexpected_token, _invalid_attribute_path,
+    _missing_space, _unterminated_string, _nesting_too_deep, _missing_leading_str, error_position
+)
+
+def parse_error(filter_str :str):
+    try:
+        Parser(Lexer(filter_str)).parse()
+    except ValueError as e:
+        return error_position(str(e)), str(e)
+    return None
+
+def test_valid_filters():
+    for filters in workloads(scale=0.2).values():
+        for f in filters:
+            assert validate(f) is None, f
+    # Spacing the fast path does not expect is left to the parser
+    assert validate('filter=a  eq  "x"and (b pr)') is None
+    depth = Parser.max_depth
+    assert validate("filter=" + "(" * depth + "a pr" + ")" * depth) is None
+    assert validate("filter=x[" + "(" * (depth - 1) + "a pr" + ")" * (depth - 1) + "]") is None
+
+def test_errors():
+    for f, expected in [
+        ("userName pr", (-1, _missing_leading_str)),
+        ('filter=userName eq bjensen', (19, _unexpected_character)),
+        ("filter=(a pr", (12, _unexpected_end_of_input)),
+        ("filter=a pr)", (11, _unexpected_token)),
+        ("filter=x[(a pr])", (14, _unexpected_token)),
+        ("filter=x[a[b pr]]", (10, _unexpected_token)),
+        ("filter=1a pr", (7, _invalid_attribute_path)),
+        ("filter=a pr and(b pr)", (15, _missing_space)),
+        ('filter=a eq "x', (14, _unterminated_string)),
+        ("filter=a eq f", (13, _unexpected_end_of_input)),
+        ("filter=" + "(" * 5000 + "a pr", (7 + Parser.max_depth, _nesting_too_deep)),
+        ("filter=" + "(" * 5000 + "a pr" + ")" * 5000, (7 + Parser.max_depth, _nesting_too_deep)),
+        ("filter=x[" + "(" * Parser.max_depth + "a pr" + ")" * Parser.max_depth + "]", (9 + Parser.max_depth - 1, _nesting_too_deep)),
+    ]:
+        assert validate(f) == expected, f
+
+def random_filter(rng :random.Random, depth :int = 0) -> str:
+    choice = rng.random()
+    if depth < 3 and choice < 0.3:
+        return random_filter(rng, depth + 1) + rng.choice([" and ", " or "]) + random_filter(rng, depth + 1)
+    if depth < 3 and choice < 0.4:
+        return rng.choice(["(", "not ("]) + random_filter(rng, depth + 1) + ")"
+    if depth < 2 and choice < 0.5:
+        return rng.choice(["emails", "x.y", "urn:a:b"]) + "[" + random_filter(rng, 3) + "]"
+    attr = rng.choice(["a", "b.c", "urn:x:y:a", "x-1", "eq", "EQ"])
+    if rng.random() < 0.2:
+        return f"{attr} pr"
+    return f"{attr} {rng.choice(['eq', 'co', 'gt'])} " + rng.choice(['"x"', "1", "true", "null", '"a\\"b"', '"(]"', '""'])
+
+def test_matches_parser():
+    rng = random.Random(25)
+    pieces = ["a", "eq", "pr", "and", "not", "(", ")", "[", "]", " ", '"x"', '"', "\\", "1", "true", ":", ".", "\n"]
+    for _ in range(5000):
+        f = "filter=" + random_filter(rng)
+        for _ in range(rng.randint(0, 2)):
+            i = rng.randrange(len(Lexer.leading_str), len(f) + 1)
+            f = f[:i] + rng.choice(pieces) + f[i+1:] if rng.random() < 0.5 else f[:i] + rng.choice(pieces) + f[i:]
+        expected = parse_error(f)
+        result = validate(f)
+        if expected is None:
+            assert result is None, f
+        else:
+            position, message = expected
+            assert result is not None and (position is None or result[0] == position), f
+            assert message.startswith(result[1]), f
+
+def test_faster_than_tokenizing():
+    queries = workloads()["reference_queries"]
+
+    def best(stage) -> float:
+        times = []
+        for _ in range(5):
+            start = time.perf_counter()
+            for f in queries:
+                stage(f)
+            times.append(time.perf_counter() - start)
+        return min(times)
+    # Several times faster here, a generous bound for slow machines
+    assert best(validate) * 2 < best(lambda f: tuple(Lexer(f, Lexer.Engine.Regex)))
+
+def test_missing_leading_str_matches_parser():
+    position, message = validate("userName pr")
+    assert parse_error("userName pr")[1] == f"{message} {position}"